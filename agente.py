@@ -0,0 +1,272 @@
+import sys
+import time
+
+from plataforma import obtener_backend
+from sentinelas import SENTINELAS
+from normalizacion import normalizar_atributos, canonicar, calcular_his, plan_normalizacion
+
+# ==================================================
+# AGENTE LIGERO
+# ==================================================
+
+# Punto de entrada para ejecuciones cortas (calcular el HIS y salir). Al importar
+# este módulo solo se cargan la plataforma y la normalización: el backend, WMI,
+# la caché, la recolección concurrente, json o argparse se importan cuando se usan.
+# test_arranque.py comprueba el tiempo de importación con -X importtime.
+
+
+# Obtiene los atributos en crudo con el backend pedido (por defecto, el del sistema)
+def recoger(backend=None, concurrente=False, cache=None, timeout=None):
+    modulo = obtener_backend(backend)
+    colectores = modulo.COLECTORES
+
+    if cache is not None:
+        from cache_atributos import colectores_con_cache
+        colectores = colectores_con_cache(colectores, cache)
+
+    if concurrente:
+        from recoleccion import recoger_concurrente, TIMEOUT_POR_DEFECTO
+        # WMI necesita inicializar COM en cada hilo; el resto de backends no lo definen
+        raw, _ = recoger_concurrente(colectores, timeout or TIMEOUT_POR_DEFECTO,
+                                     inicializador=getattr(modulo, "inicializar_com", None))
+    else:
+        raw = {attr: colector() for attr, colector in colectores.items()}
+
+    if cache is not None:
+        cache.guardar()
+    return raw
+
+
+# HIS de unos atributos en crudo
+def his_de(raw):
+    return calcular_his(canonicar(normalizar_atributos(raw)))
+
+
+# =============================
+# MODO DEMONIO
+# =============================
+
+# Esperas (segundos) entre ciclos del demonio
+INTERVALO = 60.0
+INTERVALO_MAXIMO = 900.0
+INTERVALO_MINIMO = 1.0
+
+
+class AgenteContinuo:
+    """
+    Recalcula el HIS periódicamente sin volver a recoger lo que no hace falta:
+    en cada ciclo solo se llama a los colectores cuya entrada en la caché ha
+    caducado o cuya señal de invalidación ha cambiado, solo se normalizan los
+    valores que han cambiado y solo se avisa (al_cambiar) si el HIS es distinto.
+
+    Mientras el HIS no cambia, la espera entre ciclos se duplica hasta
+    'intervalo_maximo'; nunca supera lo que falta para que caduque un atributo
+    de la caché, y tras un cambio vuelve a 'intervalo'.
+    """
+
+    def __init__(self, colectores, cache=None, intervalo=INTERVALO, intervalo_maximo=INTERVALO_MAXIMO,
+                 intervalo_minimo=INTERVALO_MINIMO, al_cambiar=None, reloj=time.time, dormir=None,
+                 inicializador=None):
+        import threading
+
+        if cache is None:
+            from cache_atributos import CacheAtributos
+            # Sin ruta la caché solo vive en memoria y no se escribe en disco
+            cache = CacheAtributos(ruta=None, reloj=reloj)
+        self.colectores = colectores
+        self.cache = cache
+        self.intervalo = intervalo
+        self.intervalo_maximo = max(intervalo_maximo, intervalo)
+        self.intervalo_minimo = min(intervalo_minimo, intervalo)
+        self.al_cambiar = al_cambiar
+        self.reloj = reloj
+        self._parada = threading.Event()
+        self._dormir = dormir or self._parada.wait
+        self._inicializador = inicializador
+
+        self._normalizadores = dict(plan_normalizacion())
+        self._raw = {}
+        self.normalizados = {attr: normalizador("") for attr, normalizador in plan_normalizacion()}
+        self.his = None
+        self._intervalo_actual = intervalo
+
+        self.ciclos = 0
+        self.cambios = 0
+        self.recogidos = 0
+        self.omitidos = 0
+        self.segundos_ultimo_ciclo = 0.0
+        self.segundos_ciclos = 0.0
+        self.segundos_maximo_ciclo = 0.0
+        self.espera = 0.0
+        self._cache_modificada = False
+
+    def _valor(self, attr, colector):
+        entrada = self.cache.vigente(attr)
+        if entrada is not None:
+            self.omitidos += 1
+            return entrada["valor"]
+
+        self.recogidos += 1
+        t0 = time.perf_counter()
+        try:
+            valor = colector()
+        except Exception:
+            valor = SENTINELAS.get(attr, "")
+        if self.cache.almacenar(attr, valor, time.perf_counter() - t0):
+            self._cache_modificada = True
+        return valor
+
+    # Un ciclo completo. Devuelve el evento de cambio, o None si el HIS no ha cambiado
+    def ciclo(self):
+        t0 = time.perf_counter()
+        cambiados = []
+        for attr, colector in self.colectores.items():
+            valor = self._valor(attr, colector)
+            if attr in self._raw and self._raw[attr] == valor:
+                continue
+            self._raw[attr] = valor
+            normalizador = self._normalizadores.get(attr)
+            if normalizador is None:
+                continue
+            normalizado = normalizador(valor)
+            if normalizado != self.normalizados[attr]:
+                self.normalizados[attr] = normalizado
+                cambiados.append(attr)
+
+        evento = None
+        his = calcular_his(canonicar(self.normalizados)) if cambiados or self.his is None else self.his
+        if his != self.his:
+            evento = {"marca": self.reloj(), "his_anterior": self.his, "his": his, "atributos": cambiados}
+            self.his = his
+            self.cambios += 1
+            self._intervalo_actual = self.intervalo
+        else:
+            self._intervalo_actual = min(self._intervalo_actual * 2, self.intervalo_maximo)
+
+        # La caché en disco solo se reescribe si ha cambiado alguna entrada: los
+        # atributos con TTL 0 se recogen en cada ciclo pero no se guardan
+        if self._cache_modificada:
+            self.cache.guardar()
+            self._cache_modificada = False
+
+        self.ciclos += 1
+        self.segundos_ultimo_ciclo = time.perf_counter() - t0
+        self.segundos_ciclos += self.segundos_ultimo_ciclo
+        self.segundos_maximo_ciclo = max(self.segundos_maximo_ciclo, self.segundos_ultimo_ciclo)
+
+        if evento is not None and self.al_cambiar is not None:
+            self.al_cambiar(evento)
+        return evento
+
+    # Segundos hasta el próximo ciclo
+    def proxima_espera(self):
+        ahora = self.reloj()
+        espera = self._intervalo_actual
+        for attr in self.colectores:
+            entrada = self.cache.entradas.get(attr)
+            ttl = self.cache.ttl.get(attr, 0)
+            if entrada is not None and ttl > 0:
+                espera = min(espera, entrada["guardado"] + ttl - ahora)
+        return max(espera, self.intervalo_minimo)
+
+    # Ejecuta ciclos hasta que se llame a detener() (o hasta 'ciclos' ciclos)
+    def ejecutar(self, ciclos=None):
+        if self._inicializador is not None:
+            self._inicializador()
+        hechos = 0
+        while not self._parada.is_set():
+            self.ciclo()
+            hechos += 1
+            if ciclos is not None and hechos >= ciclos:
+                break
+            self.espera = self.proxima_espera()
+            self._dormir(self.espera)
+
+    def detener(self):
+        self._parada.set()
+
+    def estadisticas(self):
+        consultas = self.recogidos + self.omitidos
+        return {
+            "ciclos": self.ciclos,
+            "cambios": self.cambios,
+            "recogidos": self.recogidos,
+            "omitidos": self.omitidos,
+            "tasa_omitidos": self.omitidos / consultas if consultas else 0.0,
+            "segundos_ultimo_ciclo": self.segundos_ultimo_ciclo,
+            "segundos_medio_ciclo": self.segundos_ciclos / self.ciclos if self.ciclos else 0.0,
+            "segundos_maximo_ciclo": self.segundos_maximo_ciclo,
+            "espera": self.espera,
+            "his": self.his,
+        }
+
+
+# Ejecuta el agente en modo demonio: escribe una línea JSON por cada cambio del HIS
+# y, al terminar (SIGTERM o Ctrl+C), las estadísticas en stderr
+def ejecutar_demonio(args):
+    import json
+    import signal
+    from cache_atributos import CacheAtributos, RUTA_POR_DEFECTO
+
+    modulo = obtener_backend(args.backend)
+    cache = CacheAtributos(ruta=RUTA_POR_DEFECTO if args.cache else None,
+                           archivos_vigilados={"public_key_fingerprint": modulo.ruta_clave_publica()})
+
+    def emitir(evento):
+        print(json.dumps(evento), flush=True)
+
+    agente = AgenteContinuo(modulo.COLECTORES, cache, args.intervalo, args.intervalo_maximo,
+                            al_cambiar=emitir, inicializador=getattr(modulo, "inicializar_com", None))
+    # Se restauran los manejadores anteriores al terminar, para que llamar a
+    # main desde otro programa (o desde los tests) no le cambie las señales
+    anteriores = {senal: signal.getsignal(senal) for senal in (signal.SIGINT, signal.SIGTERM)}
+    for senal in anteriores:
+        signal.signal(senal, lambda *_: agente.detener())
+    try:
+        agente.ejecutar(args.ciclos)
+    finally:
+        for senal, manejador in anteriores.items():
+            signal.signal(senal, manejador)
+    print(json.dumps(agente.estadisticas()), file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Calcula el HIS de este dispositivo")
+    parser.add_argument("--backend", help="Backend de recolección (por defecto, el del sistema)")
+    parser.add_argument("--concurrente", action="store_true", help="Ejecuta los colectores en paralelo")
+    parser.add_argument("--timeout", type=float, help="Plazo por colector con --concurrente (s)")
+    parser.add_argument("--cache", action="store_true", help="Usa la caché de atributos en disco")
+    parser.add_argument("--json", action="store_true", help="Muestra también los atributos, en JSON")
+    parser.add_argument("--demonio", action="store_true",
+                        help="Recalcula el HIS periódicamente y muestra cada cambio (una línea JSON)")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO, help="Espera inicial entre ciclos (s)")
+    parser.add_argument("--intervalo-maximo", type=float, default=INTERVALO_MAXIMO,
+                        help="Espera máxima entre ciclos cuando el HIS no cambia (s)")
+    parser.add_argument("--ciclos", type=int, help="Termina tras este número de ciclos")
+    args = parser.parse_args(argv)
+
+    if args.demonio:
+        return ejecutar_demonio(args)
+
+    cache = None
+    if args.cache:
+        from cache_atributos import CacheAtributos
+        ruta = obtener_backend(args.backend).ruta_clave_publica()
+        cache = CacheAtributos(archivos_vigilados={"public_key_fingerprint": ruta})
+
+    raw = recoger(args.backend, args.concurrente, cache, args.timeout)
+    his = his_de(raw)
+
+    if args.json:
+        import json
+        print(json.dumps({"his": his, "atributos": raw}, ensure_ascii=False))
+    else:
+        print(his)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+import os
+import csv
+import sys
+import time
+import base64
+import struct
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from cryptography.exceptions import InvalidSignature, UnsupportedAlgorithm
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+
+# ==================================================
+# ATESTACIONES FIRMADAS DEL HIS
+# ==================================================
+
+# Una atestación es el HIS firmado junto con un nonce aleatorio y la marca de
+# tiempo, para que un HIS capturado no se pueda reenviar:
+#
+#   {"dispositivo": ..., "his": ..., "nonce": hex, "marca": ms, "firma": base64}
+#
+# Lo firmado es ETIQUETA + cada campo precedido de su longitud (uint32 big endian).
+# El algoritmo de firma lo decide la clave pública enrolada, no la atestación.
+
+ETIQUETA = b"IOTZT-ATESTACION\x00\x01"
+_LONGITUD = struct.Struct(">I").pack
+
+# Antigüedad máxima (y adelanto máximo del reloj del dispositivo), en segundos
+VENTANA = 300
+
+# Resultados de la verificación
+VALIDA = "valida"
+FIRMA_INVALIDA = "firma_invalida"
+REPETIDA = "repetida"
+CADUCADA = "caducada"
+DESCONOCIDO = "dispositivo_desconocido"
+MAL_FORMADA = "mal_formada"
+CLAVE_INVALIDA = "clave_enrolada_invalida"
+
+
+# Mensaje que se firma
+def mensaje(dispositivo, his, nonce, marca):
+    partes = [ETIQUETA]
+    for campo in (dispositivo, his, nonce, str(marca)):
+        datos = campo.encode("utf-8")
+        partes += (_LONGITUD(len(datos)), datos)
+    return b"".join(partes)
+
+
+# =============================
+# FIRMA (DISPOSITIVO)
+# =============================
+
+# Clave privada PEM sin contraseña, como la crea genera_clave_publica.py
+def cargar_clave_privada(ruta):
+    with open(ruta, "rb") as archivo:
+        return serialization.load_pem_private_key(archivo.read(), password=None)
+
+
+# Ruta de la clave privada junto a la pública ('mi_clave_privada.pem')
+def ruta_clave_privada(ruta_publica):
+    return os.path.join(os.path.dirname(ruta_publica), "mi_clave_privada.pem")
+
+
+def _firmar(clave_privada, datos):
+    if isinstance(clave_privada, ed25519.Ed25519PrivateKey):
+        return clave_privada.sign(datos)
+    if isinstance(clave_privada, rsa.RSAPrivateKey):
+        return clave_privada.sign(datos, padding.PSS(mgf=padding.MGF1(hashes.SHA256()),
+                                                     salt_length=padding.PSS.DIGEST_LENGTH), hashes.SHA256())
+    if isinstance(clave_privada, ec.EllipticCurvePrivateKey):
+        return clave_privada.sign(datos, ec.ECDSA(hashes.SHA256()))
+    raise TypeError(f"Tipo de clave no soportado: {type(clave_privada).__name__}")
+
+
+# Crea la atestación de un HIS con un nonce nuevo y la hora actual
+def crear_atestacion(clave_privada, dispositivo, his, nonce=None, marca=None):
+    nonce = nonce or os.urandom(16).hex()
+    marca = int(time.time() * 1000) if marca is None else marca
+    firma = _firmar(clave_privada, mensaje(dispositivo, his, nonce, marca))
+    return {
+        "dispositivo": dispositivo,
+        "his": his,
+        "nonce": nonce,
+        "marca": marca,
+        "firma": base64.b64encode(firma).decode("ascii"),
+    }
+
+
+# =============================
+# VERIFICACIÓN DE FIRMAS
+# =============================
+
+# Claves públicas ya interpretadas, por SHA-256 del PEM. Cada proceso del pool
+# tiene la suya, así que cada clave se interpreta una vez por proceso.
+_CLAVES = {}
+MAX_CLAVES = 100_000
+
+
+def clave_publica(pem):
+    huella = hashlib.sha256(pem).digest()
+    clave = _CLAVES.get(huella)
+    if clave is None:
+        if len(_CLAVES) >= MAX_CLAVES:
+            _CLAVES.clear()
+        clave = _CLAVES[huella] = serialization.load_pem_public_key(pem)
+    return clave
+
+
+def comprobar_firma(pem, datos, firma):
+    clave = clave_publica(pem)
+    try:
+        if isinstance(clave, ed25519.Ed25519PublicKey):
+            clave.verify(firma, datos)
+        elif isinstance(clave, rsa.RSAPublicKey):
+            clave.verify(firma, datos, padding.PSS(mgf=padding.MGF1(hashes.SHA256()),
+                                                   salt_length=padding.PSS.AUTO), hashes.SHA256())
+        elif isinstance(clave, ec.EllipticCurvePublicKey):
+            clave.verify(firma, datos, ec.ECDSA(hashes.SHA256()))
+        else:
+            return False
+    except InvalidSignature:
+        return False
+    return True
+
+
+# Comprueba las firmas de un bloque [(pem, mensaje, firma)] (se ejecuta en cada proceso)
+def _comprobar_bloque(bloque):
+    return [comprobar_firma(pem, datos, firma) for pem, datos, firma in bloque]
+
+
+class VerificadorAtestaciones:
+    """
+    Verifica atestaciones con la clave pública enrolada de cada dispositivo
+    ({dispositivo: PEM}). Rechaza las que están fuera de la ventana de tiempo
+    y los nonces ya vistos. Cada nonce se recuerda hasta que su marca caduca,
+    también cuando la marca viene adelantada respecto al reloj del verificador.
+    """
+
+    def __init__(self, claves, ventana=VENTANA, reloj=time.time):
+        self.claves = claves
+        self.ventana = ventana
+        self.reloj = reloj
+        # nonce -> instante (s) a partir del cual se puede olvidar
+        self._nonces = {}
+        self._proxima_limpieza = 0.0
+
+    def _olvidar_nonces(self, ahora):
+        if ahora < self._proxima_limpieza:
+            return
+        self._nonces = {n: caduca for n, caduca in self._nonces.items() if caduca > ahora}
+        self._proxima_limpieza = ahora + self.ventana / 10
+
+    # Comprobaciones que no necesitan la firma. Devuelve (resultado, trabajo de firma)
+    def _preparar(self, atestacion, ahora):
+        try:
+            dispositivo = atestacion["dispositivo"]
+            his = atestacion["his"]
+            nonce = atestacion["nonce"]
+            # Del JSON pueden llegar números, listas... donde se esperan textos
+            if not all(isinstance(campo, str) for campo in (dispositivo, his, nonce)):
+                raise TypeError("dispositivo, his y nonce deben ser textos")
+            marca = int(atestacion["marca"])
+            datos = mensaje(dispositivo, his, nonce, marca)
+            firma = base64.b64decode(atestacion["firma"], validate=True)
+        except (KeyError, TypeError, ValueError, OverflowError):
+            return MAL_FORMADA, None
+
+        pem = self.claves.get(dispositivo)
+        if pem is None:
+            return DESCONOCIDO, None
+        if abs(ahora - marca / 1000) > self.ventana:
+            return CADUCADA, None
+        clave_nonce = (dispositivo, nonce)
+        if clave_nonce in self._nonces:
+            return REPETIDA, None
+        # Una clave enrolada que no se puede interpretar solo afecta a su dispositivo
+        try:
+            clave_publica(pem)
+        except (TypeError, ValueError, UnsupportedAlgorithm):
+            return CLAVE_INVALIDA, None
+        # La atestación se acepta mientras ahora <= marca + ventana: el nonce se
+        # recuerda al menos hasta entonces
+        caduca = max(ahora, marca / 1000) + self.ventana
+        return None, (clave_nonce, caduca, (pem, datos, firma))
+
+    def verificar(self, atestacion):
+        return self.verificar_lote([atestacion])[0]
+
+    # Verifica un lote. Las firmas se comprueban en 'procesos' procesos
+    # (en 'pool' si se pasa uno ya creado, para no arrancarlo en cada lote).
+    def verificar_lote(self, atestaciones, procesos=1, pool=None, tamano_bloque=256):
+        ahora = self.reloj()
+        self._olvidar_nonces(ahora)
+
+        resultados = [None] * len(atestaciones)
+        pendientes = []
+        for i, atestacion in enumerate(atestaciones):
+            resultado, trabajo = self._preparar(atestacion, ahora)
+            if trabajo is None:
+                resultados[i] = resultado
+            else:
+                pendientes.append((i, trabajo))
+
+        firmas = [trabajo for _, (_, _, trabajo) in pendientes]
+        if pool is None and procesos > 1 and len(firmas) > tamano_bloque:
+            with ProcessPoolExecutor(max_workers=procesos) as pool_local:
+                correctas = self._comprobar(firmas, pool_local, tamano_bloque)
+        else:
+            correctas = self._comprobar(firmas, pool, tamano_bloque)
+
+        # Las repeticiones dentro del lote se resuelven después de comprobar las
+        # firmas y en orden: vale la primera firma correcta de cada nonce, así
+        # que una falsa que llegue antes no bloquea a la legítima
+        for (i, (clave_nonce, caduca, _)), correcta in zip(pendientes, correctas):
+            if correcta and clave_nonce in self._nonces:
+                resultados[i] = REPETIDA
+            elif correcta:
+                # Solo se recuerda el nonce de las atestaciones válidas, para que
+                # una firma falsa no pueda bloquear un nonce legítimo
+                self._nonces[clave_nonce] = caduca
+                resultados[i] = VALIDA
+            else:
+                resultados[i] = FIRMA_INVALIDA
+        return resultados
+
+    @staticmethod
+    def _comprobar(firmas, pool, tamano_bloque):
+        if pool is None:
+            return _comprobar_bloque(firmas)
+        bloques = [firmas[i:i + tamano_bloque] for i in range(0, len(firmas), tamano_bloque)]
+        return [ok for bloque in pool.map(_comprobar_bloque, bloques) for ok in bloque]
+
+
+# Claves públicas de un directorio aprovisionado con genera_clave_publica.py
+# (lee el manifiesto): {dispositivo: PEM}
+def claves_desde_manifiesto(directorio, nombre="manifiesto.csv"):
+    claves = {}
+    with open(os.path.join(directorio, nombre), encoding="utf-8", newline="") as archivo:
+        for fila in csv.DictReader(archivo):
+            with open(os.path.join(directorio, fila["clave_publica"]), "rb") as clave:
+                claves[fila["dispositivo"]] = clave.read()
+    return claves
+
+
+# =============================
+# BANCO DE PRUEBAS
+# =============================
+
+# Verificaciones/s de cada algoritmo con 'n' atestaciones de 'dispositivos' dispositivos
+def medir_verificacion(algoritmos=("rsa2048", "ed25519", "p256"), n=2000, dispositivos=20, procesos=1):
+    from genera_clave_publica import ALGORITMOS
+
+    resultados = []
+    for algoritmo in algoritmos:
+        privadas = {f"disp-{i}": ALGORITMOS[algoritmo]() for i in range(dispositivos)}
+        claves = {d: k.public_key().public_bytes(serialization.Encoding.PEM,
+                                                 serialization.PublicFormat.SubjectPublicKeyInfo)
+                  for d, k in privadas.items()}
+        nombres = list(privadas)
+        atestaciones = [crear_atestacion(privadas[nombres[i % dispositivos]], nombres[i % dispositivos], "AB" * 32)
+                        for i in range(n)]
+
+        _CLAVES.clear()
+        verificador = VerificadorAtestaciones(claves)
+        t0 = time.perf_counter()
+        validas = verificador.verificar_lote(atestaciones, procesos).count(VALIDA)
+        segundos = time.perf_counter() - t0
+        assert validas == n
+        resultados.append({"algoritmo": algoritmo, "procesos": procesos, "verificaciones_s": n / segundos})
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rendimiento de la verificación de atestaciones")
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--procesos", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    for procesos in range(1, max(args.procesos, 1) + 1):
+        for r in medir_verificacion(n=args.n, procesos=procesos):
+            print(f"{r['algoritmo']:8s} procesos={r['procesos']} verificaciones/s={r['verificaciones_s']:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
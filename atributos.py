@@ -1,9 +1,7 @@
-import wmi
-import json
+import sys
 import hashlib
-import platform
 import os
-import winreg
+from functools import partial
 
 # Módulo de normalización y canonicalización
 from normalizacion import (
@@ -11,17 +9,42 @@ from normalizacion import (
     canonicar,
     calcular_his
 )
+# Hash del inventario de software (v1 original y v2 incremental)
+from inventario import (
+    VERSION_V1,
+    VERSION_V2,
+    InventarioIncremental,
+    hash_inventario,
+    delta_hashes,
+    escanear_registro,
+    hashes_de_escaneo,
+    cargar_escaneo,
+    guardar_escaneo,
+    cargar_estado_y_escaneo,
+    guardar_estado_y_escaneo
+)
+# Huella de la clave pública con caché
+import huella_clave
+# Medición opcional de cada colector
+from metricas import instrumentar_colectores
 
 
 # =========================================
 # FUNCIONES PARA OBTENER ATRIBUTOS DEL PC
 # =========================================
 
+# Conexión con Windows Management Instrumentation (WMI). El módulo se importa
+# aquí para que atributos.py se pueda importar en sistemas sin WMI.
+def _conexion_wmi():
+    import wmi
+    return wmi.WMI()
+
+
 # Esta función obtiene el ID único del procesador
 def get_id_procesador():
     try:
         # Conexión con Windows Management Instrumentation (WMI)
-        conexion_wmi = wmi.WMI()
+        conexion_wmi = _conexion_wmi()
         # Buscamos el primer objeto de procesador
         for procesador in conexion_wmi.Win32_Processor():
             # Devuelve el ID del procesador
@@ -33,7 +56,7 @@ def get_id_procesador():
 # Esta función obtiene el número de serie de la BIOS
 def get_serie_bios():
     try:
-        conexion_wmi = wmi.WMI()
+        conexion_wmi = _conexion_wmi()
         # Buscamos el objeto de la BIOS
         for info_bios in conexion_wmi.Win32_BIOS():
             # Se devuelve el número de serie
@@ -46,7 +69,7 @@ def get_serie_bios():
 def get_mac_principal():
     mac_predeterminada = "MAC_DESCONOCIDA"
     try:
-        conexion_wmi = wmi.WMI()
+        conexion_wmi = _conexion_wmi()
         # Se itera sobre los adaptadores de red
         for tarjeta_red in conexion_wmi.Win32_NetworkAdapter():
             # Se comprueba que sea un adaptador físico y que tenga MAC
@@ -61,7 +84,7 @@ def get_mac_principal():
 # Esta función crea un hash del firmware
 def crear_hash_firmware():
     try:
-        conexion_wmi = wmi.WMI()
+        conexion_wmi = _conexion_wmi()
         # Diccionario para guardar los datos
         datos_hardware = {}
 
@@ -77,6 +100,7 @@ def crear_hash_firmware():
             datos_hardware["serie_envoltura"] = envoltura.SerialNumber
 
         # Se convierte el diccionario en un json ordenado
+        import json
         datos_crudos = json.dumps(datos_hardware, sort_keys=True)
         # Hash SHA256
         return hashlib.sha256(datos_crudos.encode()).hexdigest()
@@ -87,108 +111,165 @@ def crear_hash_firmware():
 # Devuelve la versión del sistema operativo
 def get_sistema_operativo():
     try:
+        import platform
         return platform.platform()
     except Exception:
         return "OS_NO_DETECTADO"
 
 
-# Lee y hashea la clave pública (almacenada en el archivo 'ArchivoClaves')
+# Ruta donde Windows guarda la clave pública del dispositivo
+# (se puede cambiar con la variable de entorno IOTZT_CLAVE_PUBLICA)
+def ruta_clave_publica():
+    return huella_clave.ruta_clave_publica(
+        os.path.join(os.environ.get("USERPROFILE", os.path.expanduser("~")), "ArchivoClaves", "mi_clave_publica.pub"))
+
+
+# Huella SHA256 de la clave pública (almacenada en el archivo 'ArchivoClaves').
+# Se guarda en caché mientras el archivo no cambie (inodo, tamaño y fecha).
 def huella_clave_publica():
-    # Ruta donde Windows guarda la clave de dispositivo
-    RUTA_CLAVE_PUB = os.path.join(os.environ["USERPROFILE"], "ArchivoClaves", "mi_clave_publica.pub")
-    
-    # Comprobamos si el archivo existe primero
-    if not os.path.exists(RUTA_CLAVE_PUB):
-        return "CLAVE_PUBLICA_NO_EXISTE"
+    return huella_clave.huella_clave_publica(ruta_clave_publica())
+
+
+# Esta función crea un hash del software instalado (por programas).
+# 'version' elige el algoritmo del hash de inventario (v1 por defecto para que
+# los valores enrolados sigan verificando). Con v2 y 'ruta_estado' se guarda
+# el estado incremental junto con el escaneo del que sale (un solo archivo
+# escrito de forma atómica) y la siguiente ejecución solo le aplica las altas
+# y bajas respecto a ese escaneo.
+# Con 'ruta_escaneo' se guarda la fecha de última escritura de cada clave del
+# Registro y solo se vuelven a leer los programas cuya clave ha cambiado.
+# 'registro' permite usar un proveedor distinto de winreg (p. ej. en pruebas).
+def crear_hash_software_instalado(debug=False, version=VERSION_V1, ruta_estado=None,
+                                  ruta_escaneo=None, registro=None):
+    if registro is None:
+        try:
+            import winreg as registro
+        except ImportError:
+            return "HASH_SOFTWARE_NO_CALCULADO"
 
     try:
-        # Abrimos la clave pública en modo lectura binaria
-        with open(RUTA_CLAVE_PUB, "rb") as archivo_clave:
-            contenido_clave = archivo_clave.read()
-            # Devolvemos el hash SHA256 del contenido
-            return hashlib.sha256(contenido_clave).hexdigest()
+        if version == VERSION_V2 and ruta_estado:
+            # El escaneo de referencia es el guardado con el estado, no el de
+            # 'ruta_escaneo', que las ejecuciones v1 también hacen avanzar
+            estado, escaneo_previo = cargar_estado_y_escaneo(ruta_estado)
+        else:
+            estado, escaneo_previo = None, cargar_escaneo(ruta_escaneo) if ruta_escaneo else {}
+
+        hashes_programas, escaneo, _ = escanear_registro(registro, escaneo_previo, debug=debug)
+        if ruta_escaneo:
+            guardar_escaneo(ruta_escaneo, escaneo)
+
+        if version == VERSION_V2 and ruta_estado:
+            if estado is None:
+                estado = InventarioIncremental.desde_hashes(hashes_programas)
+            else:
+                # Se actualiza el estado incremental solo con las altas y bajas
+                estado.aplicar_delta(*delta_hashes(hashes_de_escaneo(escaneo_previo), hashes_programas))
+            guardar_estado_y_escaneo(ruta_estado, estado, escaneo)
+            return estado.hash()
+
+        # Se genera el hash final del inventario con el algoritmo pedido
+        return hash_inventario(hashes_programas, version)
     except Exception:
-        return "ERROR_AL_LEER_CLAVE"
+        return "HASH_SOFTWARE_NO_CALCULADO"
 
+# ==================================
+# RECOGIDA DE TODOS LOS ATRIBUTOS
+# ==================================
 
-# Esta función crea un hash del software instalado (por programas)
-def crear_hash_software_instalado(debug=False):
-    hashes_programas = []
+# Estado del inventario de software entre ejecuciones, en el mismo directorio
+# que la caché de atributos (cache_atributos.RUTA_POR_DEFECTO)
+DIRECTORIO_ESTADO = os.path.join(os.path.expanduser("~"), ".iotzt")
+RUTA_ESTADO_INVENTARIO = os.path.join(DIRECTORIO_ESTADO, "inventario_v2.json")
+RUTA_ESCANEO_INVENTARIO = os.path.join(DIRECTORIO_ESTADO, "escaneo_registro.json")
 
-    # Se definen las rutas del Registro de Windows donde se lista el software instalado
-    rutas = [
-        (winreg.HKEY_LOCAL_MACHINE,
-         r"Software\Microsoft\Windows\CurrentVersion\Uninstall"),
-        (winreg.HKEY_LOCAL_MACHINE,
-         r"Software\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"),
-        (winreg.HKEY_CURRENT_USER,
-         r"Software\Microsoft\Windows\CurrentVersion\Uninstall"),
-    ]
+# Colector de cada atributo (medidos si las métricas están activas)
+COLECTORES = instrumentar_colectores({
+    "cpu_id": get_id_procesador,           # ID del procesador
+    "serial_number": get_serie_bios,       # Número de serie de la BIOS
+    "mac_original": get_mac_principal,     # Dirección MAC
+    "firmware_hash": crear_hash_firmware,  # Hash del firmware
+    "os_version": get_sistema_operativo,   # Versión del SO
+    "public_key_fingerprint": huella_clave_publica, # Huella de la clave pública
+    "software_inventory_hash": partial(crear_hash_software_instalado, # Hash del software instalado
+                                       ruta_estado=RUTA_ESTADO_INVENTARIO,
+                                       ruta_escaneo=RUTA_ESCANEO_INVENTARIO)
+})
+
+
+# Obtiene todos los atributos en crudo, opcionalmente a través de una caché
+def recoger_atributos(cache=None):
+    if cache is None:
+        return {attr: colector() for attr, colector in COLECTORES.items()}
+
+    from cache_atributos import recoger_con_cache
+    return recoger_con_cache(COLECTORES, cache)
+
+
+# Cada hilo que use WMI tiene que inicializar COM por su cuenta
+def inicializar_com():
+    import pythoncom
+    pythoncom.CoInitialize()
+
+
+# Obtiene todos los atributos a la vez, con un plazo máximo por colector.
+# Devuelve (atributos en crudo, informe de recoleccion.recoger_concurrente)
+def recoger_atributos_concurrente(cache=None, timeout=None):
+    from recoleccion import recoger_concurrente, TIMEOUT_POR_DEFECTO
+
+    colectores = COLECTORES
+    if cache is not None:
+        from cache_atributos import colectores_con_cache
+        colectores = colectores_con_cache(COLECTORES, cache)
+
+    raw, informe = recoger_concurrente(colectores, timeout or TIMEOUT_POR_DEFECTO,
+                                       inicializador=inicializar_com)
+    if cache is not None:
+        cache.guardar()
+    return raw, informe
 
-    try:
-        for root, path in rutas:
-            try:
-                # Se abre la clave de registro principal para lectura
-                with winreg.OpenKey(root, path) as key:
-                    # Se itera sobre todas las subclaves que representan un programa
-                    for i in range(winreg.QueryInfoKey(key)[0]):
-                        try:
-                            # Se obtiene el nombre de la subclave
-                            subkey_name = winreg.EnumKey(key, i)
-                            with winreg.OpenKey(key, subkey_name) as subkey:
-                                # Se extrae el nombre y la versión del programa
-                                nombre = winreg.QueryValueEx(subkey, "DisplayName")[0]
-                                version = winreg.QueryValueEx(subkey, "DisplayVersion")[0]
-                                # Se limpia de espacios en blanco y se manejan posibles valores nulos
-                                nombre = (nombre or "").strip()
-                                version = (version or "").strip()
-
-                                # Si no hay nombre, el registro no es útil para identificar software
-                                if not nombre:
-                                    continue
-                                # Se formatea la entrada para que el hash sea consistente
-                                entrada = f"{nombre}:{version}"
-
-                                if debug:
-                                    print(f"[SOFTWARE] '{entrada}'")
-
-                                # Se crea un hash SHA256 individual para cada programa detectado
-                                h = hashlib.sha256(entrada.encode("utf-8")).hexdigest()
-                                hashes_programas.append(h)
-
-                        except FileNotFoundError:
-                            # Si una subclave no tiene los valores buscados o no se puede leer, se salta
-                            continue
-                        except OSError:
-                            continue
-            except FileNotFoundError:
-                continue
-
-        # Se ordenan los hashes para que el resultado final sea el mismo
-        hashes_programas.sort()
-        # Se unen todos los hashes individuales con un separador y se genera el hash final del inventario
-        inventario = "|".join(hashes_programas)
-        return hashlib.sha256(inventario.encode("utf-8")).hexdigest()
-    except Exception:
-        return "HASH_SOFTWARE_NO_CALCULADO"
 
 # ==================================
 # EJECUCIÓN PRINCIPAL DEL PROGRAMA
 # ==================================
 
 if __name__ == "__main__":
-    
+
+    # --cache: usa la caché en disco; --vaciar-cache: la invalida antes de empezar
+    # --concurrente: ejecuta los colectores en paralelo con un plazo por colector
+    # --metricas: mide cada etapa y muestra las métricas en formato Prometheus al final
+    # --atestar DISPOSITIVO: firma el HIS con la clave privada del dispositivo
+    dispositivo = None
+    if "--atestar" in sys.argv:
+        # Se comprueba antes de recoger nada para no fallar al final de la ejecución
+        posicion = sys.argv.index("--atestar") + 1
+        if posicion >= len(sys.argv) or sys.argv[posicion].startswith("--"):
+            print("uso: atributos.py [--cache] [--vaciar-cache] [--concurrente] [--metricas] "
+                  "[--atestar DISPOSITIVO]", file=sys.stderr)
+            print("error: --atestar necesita el identificador del dispositivo", file=sys.stderr)
+            sys.exit(2)
+        dispositivo = sys.argv[posicion]
+
+    if "--metricas" in sys.argv:
+        import metricas
+        metricas.activar()
+
+    cache = None
+    if "--cache" in sys.argv or "--vaciar-cache" in sys.argv:
+        from cache_atributos import CacheAtributos
+        cache = CacheAtributos(archivos_vigilados={"public_key_fingerprint": ruta_clave_publica()})
+        if "--vaciar-cache" in sys.argv:
+            cache.vaciar()
+
     print("\n--- ATRIBUTOS DEL ORDENADOR EN CRUDO ---\n")
     
-    raw_attrs = {
-        "cpu_id": get_id_procesador(),           # ID del procesador
-        "serial_number": get_serie_bios(),       # Número de serie de la BIOS
-        "mac_original": get_mac_principal(),     # Dirección MAC
-        "firmware_hash": crear_hash_firmware(),  # Hash del firmware
-        "os_version": get_sistema_operativo(),   # Versión del SO
-        "public_key_fingerprint": huella_clave_publica(), # Huella de la clave pública
-        "software_inventory_hash": crear_hash_software_instalado() # Hash del software instalado
-    }
+    if "--concurrente" in sys.argv:
+        raw_attrs, informe = recoger_atributos_concurrente(cache)
+        for k, datos in informe.items():
+            if datos["estado"] != "ok":
+                print(f"[{datos['estado'].upper()}] {k}: se usa '{datos['reserva']}'")
+    else:
+        raw_attrs = recoger_atributos(cache)
 
     # Muestra los datos "en crudo"
     for k, v in raw_attrs.items():
@@ -221,6 +302,21 @@ if __name__ == "__main__":
     
     print("El HIS es:", his) 
 
+    if dispositivo is not None:
+        import json
+        from atestacion import cargar_clave_privada, crear_atestacion, ruta_clave_privada
+        clave = cargar_clave_privada(ruta_clave_privada(ruta_clave_publica()))
+        print("\nAtestación:", json.dumps(crear_atestacion(clave, dispositivo, his)))
+
+    if cache is not None:
+        stats = cache.estadisticas()
+        print(f"\nCaché: {stats['aciertos']} aciertos, {stats['fallos']} fallos, "
+              f"{stats['segundos_ahorrados']:.3f} s ahorrados")
+
+    if "--metricas" in sys.argv:
+        print("\n--- MÉTRICAS ---\n")
+        print(metricas.exportar_prometheus())
+
     print("\n--- FIN ---\n")
 
 
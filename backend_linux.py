@@ -0,0 +1,327 @@
+import os
+import re
+import struct
+import hashlib
+
+from inventario import (
+    VERSION_V1,
+    hash_entrada,
+    hash_inventario,
+    cargar_escaneo,
+    guardar_escaneo
+)
+import huella_clave
+from metricas import instrumentar_colectores
+
+# ==========================================================
+# COLECTORES PARA LINUX (LECTURA DIRECTA DE /sys, /proc...)
+# ==========================================================
+
+# Todas las funciones aceptan 'raiz' para poder leer un árbol de ficheros
+# de prueba en lugar del sistema real.
+RAIZ = "/"
+
+DMI = "sys/class/dmi/id"
+CPUINFO = "proc/cpuinfo"
+RED = "sys/class/net"
+DPKG_STATUS = "var/lib/dpkg/status"
+APK_INSTALLED = "lib/apk/db/installed"
+RPM_SQLITE = "var/lib/rpm/rpmdb.sqlite"
+
+# Campos de /var/lib/dpkg/status que se usan para el inventario
+_CAMPOS_DPKG = re.compile(r"^(Package|Status|Version):[ \t]*(.*?)[ \t]*$", re.M)
+
+# Nombre en /proc/cpuinfo de cada bit de CPUID.1:EDX (None = reservado)
+_BITS_EDX = (
+    "fpu", "vme", "de", "pse", "tsc", "msr", "pae", "mce",
+    "cx8", "apic", None, "sep", "mtrr", "pge", "mca", "cmov",
+    "pat", "pse36", "pn", "clflush", None, "dts", "acpi", "mmx",
+    "fxsr", "sse", "sse2", "ss", "ht", "tm", "ia64", "pbe",
+)
+
+
+# Lee un fichero de texto pequeño; None si no existe o no hay permiso
+def _leer(raiz, *partes):
+    try:
+        with open(os.path.join(raiz, *partes), encoding="utf-8", errors="replace") as archivo:
+            return archivo.read().strip()
+    except OSError:
+        return None
+
+
+# Campos 'clave : valor' del primer procesador de /proc/cpuinfo (y los globales, como 'Serial')
+def _campos_cpuinfo(raiz):
+    campos = {}
+    texto = _leer(raiz, CPUINFO) or ""
+    for linea in texto.splitlines():
+        clave, sep, valor = linea.partition(":")
+        if sep:
+            campos.setdefault(clave.strip(), valor.strip())
+    return campos
+
+
+# =============================
+# ATRIBUTOS DE HARDWARE
+# =============================
+
+# ID del procesador. En x86 se reconstruye el mismo formato que Win32_Processor.ProcessorId
+# (EDX y EAX de CPUID hoja 1); en placas ARM se usa el número de serie del SoC.
+def get_id_procesador(raiz=RAIZ):
+    try:
+        campos = _campos_cpuinfo(raiz)
+        serie = campos.get("Serial", "").strip("0")
+        if serie:
+            return campos["Serial"].upper()
+
+        familia = int(campos["cpu family"])
+        modelo = int(campos["model"])
+        stepping = int(campos["stepping"])
+
+        familia_base = min(familia, 0xF)
+        familia_ext = familia - 0xF if familia >= 0xF else 0
+        eax = (stepping & 0xF) | ((modelo & 0xF) << 4) | (familia_base << 8) \
+            | ((modelo >> 4) << 16) | (familia_ext << 20)
+
+        flags = set(campos.get("flags", "").split())
+        edx = 0
+        for bit, nombre in enumerate(_BITS_EDX):
+            if nombre in flags:
+                edx |= 1 << bit
+        return f"{edx:08X}{eax:08X}"
+    except (KeyError, ValueError):
+        return "ID_CPU_NO_ENCONTRADO"
+
+
+# Número de serie del sistema (el mismo dato SMBIOS que Win32_BIOS.SerialNumber)
+def get_serie_bios(raiz=RAIZ):
+    for nombre in ("product_serial", "board_serial"):
+        valor = _leer(raiz, DMI, nombre)
+        if valor:
+            return valor
+    return "NUMERO_SERIE_NO_ENCONTRADA"
+
+
+# Primera MAC de un adaptador físico (los que tienen 'device' en sysfs), por orden de nombre
+def get_mac_principal(raiz=RAIZ):
+    try:
+        interfaces = sorted(os.listdir(os.path.join(raiz, RED)))
+    except OSError:
+        return "MAC_DESCONOCIDA"
+
+    for interfaz in interfaces:
+        if not os.path.exists(os.path.join(raiz, RED, interfaz, "device")):
+            continue
+        mac = _leer(raiz, RED, interfaz, "address")
+        if mac and mac.strip("0:"):
+            return mac
+    return "MAC_DESCONOCIDA"
+
+
+# Hash del firmware con los mismos campos que en Windows (BIOS y envoltura).
+# En placas sin DMI se usa el modelo del device tree.
+def crear_hash_firmware(raiz=RAIZ):
+    campos = {
+        "ver_bios": "bios_version",
+        "fecha_bios": "bios_date",
+        "fabricante_envoltura": "chassis_vendor",
+        "ver_envoltura": "chassis_version",
+        "serie_envoltura": "chassis_serial",
+    }
+    datos_hardware = {}
+    for clave, archivo in campos.items():
+        valor = _leer(raiz, DMI, archivo)
+        if valor is not None:
+            datos_hardware[clave] = valor
+
+    if not datos_hardware:
+        modelo = _leer(raiz, "proc/device-tree/model")
+        if not modelo:
+            return "HASH_FW_NO_CALCULADO"
+        datos_hardware["modelo_dt"] = modelo.rstrip("\x00")
+
+    import json
+    datos_crudos = json.dumps(datos_hardware, sort_keys=True)
+    return hashlib.sha256(datos_crudos.encode()).hexdigest()
+
+
+# =============================
+# SISTEMA Y CLAVE
+# =============================
+
+# Versión del sistema operativo (igual que en Windows)
+def get_sistema_operativo():
+    try:
+        import platform
+        return platform.platform()
+    except Exception:
+        return "OS_NO_DETECTADO"
+
+
+# Ruta de la clave pública del dispositivo en Linux
+# (se puede cambiar con la variable de entorno IOTZT_CLAVE_PUBLICA)
+def ruta_clave_publica():
+    return huella_clave.ruta_clave_publica(
+        os.path.join(os.path.expanduser("~"), "ArchivoClaves", "mi_clave_publica.pub"))
+
+
+def huella_clave_publica():
+    return huella_clave.huella_clave_publica(ruta_clave_publica())
+
+
+# =============================
+# INVENTARIO DE PAQUETES
+# =============================
+
+# Paquetes instalados según /var/lib/dpkg/status (Debian, Ubuntu, Raspberry Pi OS).
+# Solo interesan tres campos de cada párrafo, así que se buscan con una única
+# expresión regular sobre todo el fichero en lugar de recorrerlo línea a línea.
+def paquetes_dpkg(raiz=RAIZ):
+    texto = _leer(raiz, DPKG_STATUS)
+    if texto is None:
+        return None
+    paquetes = []
+    nombre = None
+    for campo, valor in _CAMPOS_DPKG.findall(texto):
+        if campo == "Package":
+            if nombre and instalado:
+                paquetes.append((nombre, version))
+            nombre, version, instalado = valor, "", False
+        elif campo == "Status":
+            instalado = valor.split()[-1:] == ["installed"]
+        else:
+            version = valor
+    if nombre and instalado:
+        paquetes.append((nombre, version))
+    return paquetes
+
+
+# Paquetes instalados según la base de datos de apk (Alpine)
+def paquetes_apk(raiz=RAIZ):
+    texto = _leer(raiz, APK_INSTALLED)
+    if texto is None:
+        return None
+    paquetes = []
+    for parrafo in texto.split("\n\n"):
+        nombre = version = None
+        for linea in parrafo.splitlines():
+            if linea.startswith("P:"):
+                nombre = linea[2:]
+            elif linea.startswith("V:"):
+                version = linea[2:]
+        if nombre:
+            paquetes.append((nombre, version or ""))
+    return paquetes
+
+
+# Extrae etiquetas de texto de una cabecera RPM (formato de rpmdb.sqlite)
+def _etiquetas_rpm(blob, etiquetas):
+    n_indices, _ = struct.unpack_from(">II", blob, 0)
+    inicio_datos = 8 + 16 * n_indices
+    valores = {}
+    for i in range(n_indices):
+        etiqueta, tipo, desplazamiento, _ = struct.unpack_from(">IIII", blob, 8 + 16 * i)
+        if etiqueta not in etiquetas:
+            continue
+        posicion = inicio_datos + desplazamiento
+        if tipo == 6:  # STRING
+            fin = blob.index(b"\x00", posicion)
+            valores[etiqueta] = blob[posicion:fin].decode("utf-8", "replace")
+        elif tipo == 4:  # INT32
+            valores[etiqueta] = struct.unpack_from(">I", blob, posicion)[0]
+    return valores
+
+
+# Paquetes instalados según rpmdb.sqlite (Fedora, RHEL 9+, openSUSE)
+def paquetes_rpm(raiz=RAIZ):
+    ruta = os.path.join(raiz, RPM_SQLITE)
+    if not os.path.exists(ruta):
+        return None
+    import sqlite3
+    conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    try:
+        paquetes = []
+        for (blob,) in conexion.execute("SELECT blob FROM Packages"):
+            v = _etiquetas_rpm(bytes(blob), {1000, 1001, 1002, 1003})
+            if 1000 not in v:
+                continue
+            version = f"{v.get(1001, '')}-{v.get(1002, '')}"
+            if 1003 in v:
+                version = f"{v[1003]}:{version}"
+            paquetes.append((v[1000], version))
+        return paquetes
+    finally:
+        conexion.close()
+
+
+# Bases de datos de paquetes en orden de preferencia
+GESTORES_PAQUETES = (paquetes_dpkg, paquetes_rpm, paquetes_apk)
+
+
+# Paquetes instalados del primer gestor que se encuentre (None si no hay ninguno)
+def paquetes_instalados(raiz=RAIZ):
+    for gestor in GESTORES_PAQUETES:
+        paquetes = gestor(raiz)
+        if paquetes is not None:
+            return paquetes
+    return None
+
+
+# Firma de las bases de datos de paquetes (tamaño y fecha de modificación).
+# Si no cambia, el inventario tampoco ha cambiado.
+def firma_paquetes(raiz=RAIZ):
+    firma = []
+    for ruta in (DPKG_STATUS, RPM_SQLITE, RPM_SQLITE + "-wal", APK_INSTALLED):
+        try:
+            st = os.stat(os.path.join(raiz, ruta))
+            firma.append([ruta, st.st_size, st.st_mtime_ns])
+        except OSError:
+            pass
+    return firma
+
+
+# Último escaneo de paquetes por raíz: {"firma": [...], "hashes": [...]}
+_ESCANEOS = {}
+
+
+# Hashes de entrada de los paquetes instalados, reutilizando el último escaneo
+# (en memoria o en 'ruta_escaneo') si la firma de la base de datos no ha cambiado
+def hashes_paquetes(raiz=RAIZ, ruta_escaneo=None):
+    firma = firma_paquetes(raiz)
+    previo = _ESCANEOS.get(raiz)
+    if previo is None and ruta_escaneo:
+        previo = cargar_escaneo(ruta_escaneo) or None
+    if previo is not None and previo.get("firma") == firma:
+        _ESCANEOS[raiz] = previo
+        return previo["hashes"]
+
+    paquetes = paquetes_instalados(raiz)
+    if paquetes is None:
+        return None
+    escaneo = {"firma": firma, "hashes": [hash_entrada(n, v) for n, v in paquetes]}
+    _ESCANEOS[raiz] = escaneo
+    if ruta_escaneo:
+        guardar_escaneo(ruta_escaneo, escaneo)
+    return escaneo["hashes"]
+
+
+# Hash del software instalado con el mismo formato de entrada 'nombre:version'
+def crear_hash_software_instalado(raiz=RAIZ, version=VERSION_V1, ruta_escaneo=None):
+    try:
+        hashes = hashes_paquetes(raiz, ruta_escaneo)
+        if hashes is None:
+            return "HASH_SOFTWARE_NO_CALCULADO"
+        return hash_inventario(hashes, version)
+    except Exception:
+        return "HASH_SOFTWARE_NO_CALCULADO"
+
+
+# Colector de cada atributo (medidos si las métricas están activas)
+COLECTORES = instrumentar_colectores({
+    "cpu_id": get_id_procesador,
+    "serial_number": get_serie_bios,
+    "mac_original": get_mac_principal,
+    "firmware_hash": crear_hash_firmware,
+    "os_version": get_sistema_operativo,
+    "public_key_fingerprint": huella_clave_publica,
+    "software_inventory_hash": crear_hash_software_instalado,
+})
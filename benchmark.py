@@ -0,0 +1,379 @@
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import platform
+import argparse
+import tempfile
+
+from normalizacion import (
+    normalizar_atributos,
+    canonicar,
+    calcular_his,
+    calcular_his_v2
+)
+from lotes import registros_sinteticos, registros_flota, calcular_his_lote
+
+# ==================================================
+# BANCO DE PRUEBAS DE TODAS LAS ETAPAS DEL HIS
+# ==================================================
+
+# Etapas registradas: nombre -> función que prepara la medición y devuelve
+# (función a medir, número de operaciones que hace cada llamada)
+ETAPAS = {}
+
+# Tolerancia por defecto al comparar con una base: +20 % en la mediana
+TOLERANCIA = 0.20
+
+
+# Decorador para registrar una etapa
+def etapa(nombre):
+    def registrar(preparar):
+        ETAPAS[nombre] = preparar
+        return preparar
+    return registrar
+
+
+# =============================
+# ESTADÍSTICAS
+# =============================
+
+# Percentil con interpolación lineal entre los dos valores más cercanos
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+# Ejecuta la función 'calentamiento' veces sin medir y después 'repeticiones' veces midiendo
+def medir(funcion, repeticiones, calentamiento):
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    reloj = time.perf_counter
+    for _ in range(repeticiones):
+        t0 = reloj()
+        funcion()
+        tiempos.append(reloj() - t0)
+    return tiempos
+
+
+# Resumen de una etapa (tiempos por operación en microsegundos)
+def resumir(tiempos, operaciones):
+    por_op = sorted(t / operaciones * 1e6 for t in tiempos)
+    return {
+        "muestras": len(por_op),
+        "operaciones_por_muestra": operaciones,
+        "media_us": sum(por_op) / len(por_op),
+        "p50_us": percentil(por_op, 50),
+        "p95_us": percentil(por_op, 95),
+        "p99_us": percentil(por_op, 99),
+        "min_us": por_op[0],
+        "max_us": por_op[-1],
+        "ops_s": 1e6 / percentil(por_op, 50) if por_op[0] > 0 else 0.0,
+    }
+
+
+# =============================
+# BACKENDS SIMULADOS
+# =============================
+
+# Crea un árbol de ficheros de Linux simulado (cpuinfo, DMI, red, dpkg) con 'paquetes' paquetes
+def crear_arbol_linux(raiz, paquetes=1000):
+    ficheros = {
+        "proc/cpuinfo": "vendor_id\t: GenuineIntel\ncpu family\t: 6\nmodel\t\t: 140\nstepping\t: 1\n"
+                        "flags\t\t: fpu vme de pse tsc msr pae mce cx8 apic sep mtrr pge mca cmov\n",
+        "sys/class/dmi/id/product_serial": "NXA0MEB00A1160D9C73400\n",
+        "sys/class/dmi/id/bios_version": "V1.12\n",
+        "sys/class/dmi/id/bios_date": "03/15/2023\n",
+        "sys/class/dmi/id/chassis_vendor": "Acer\n",
+        "sys/class/dmi/id/chassis_version": "V1.12\n",
+        "sys/class/net/eth0/address": "0a:00:27:00:00:0e\n",
+        "var/lib/dpkg/status": "".join(
+            f"Package: paquete{i}\nStatus: install ok installed\nVersion: 1.{i}-1\n"
+            f"Description: paquete de prueba {i}\n descripción larga\n\n"
+            for i in range(paquetes)
+        ),
+    }
+    for ruta, contenido in ficheros.items():
+        destino = os.path.join(raiz, ruta)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, "w", encoding="utf-8") as archivo:
+            archivo.write(contenido)
+    os.makedirs(os.path.join(raiz, "sys/class/net/eth0/device"), exist_ok=True)
+
+
+class _ClaveSimulada:
+    def __init__(self, valores=None, subclaves=None):
+        self.valores = valores or {}
+        self.subclaves = subclaves or {}
+        self.nombres = list(self.subclaves)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class RegistroSimulado:
+    """
+    Registro de Windows en memoria con la interfaz de winreg y 'programas' entradas.
+    """
+    HKEY_LOCAL_MACHINE = "HKLM"
+    HKEY_CURRENT_USER = "HKCU"
+
+    def __init__(self, programas=1000):
+        self.uninstall = _ClaveSimulada(subclaves={
+            f"{{PROG-{i}}}": _ClaveSimulada(valores={"DisplayName": f"Programa {i}", "DisplayVersion": f"1.{i}"})
+            for i in range(programas)
+        })
+
+    def OpenKey(self, padre, ruta):
+        if isinstance(padre, _ClaveSimulada):
+            return padre.subclaves[ruta]
+        if padre == "HKLM" and ruta.startswith("Software\\Microsoft"):
+            return self.uninstall
+        raise FileNotFoundError(ruta)
+
+    def QueryInfoKey(self, clave):
+        return len(clave.subclaves), len(clave.valores), 1
+
+    def EnumKey(self, clave, i):
+        return clave.nombres[i]
+
+    def QueryValueEx(self, clave, nombre):
+        try:
+            return clave.valores[nombre], 1
+        except KeyError:
+            raise FileNotFoundError(nombre)
+
+
+# =============================
+# ETAPAS
+# =============================
+
+_RAW = next(iter(registros_sinteticos(1)))
+_LOTE = 1000
+
+
+@etapa("normalizacion")
+def _preparar_normalizacion():
+    registros = list(registros_sinteticos(_LOTE))
+    return (lambda: [normalizar_atributos(r) for r in registros]), _LOTE
+
+
+# Normalización con memoización sobre una flota con valores repetidos (cada
+# repetición empieza con las cachés vacías)
+@etapa("normalizacion_memoizada")
+def _preparar_normalizacion_memoizada():
+    from normalizacion import activar_memoizacion, desactivar_memoizacion
+    registros = list(registros_flota(_LOTE))
+
+    def ejecutar_con_memoizacion():
+        activar_memoizacion()
+        try:
+            return [normalizar_atributos(r) for r in registros]
+        finally:
+            desactivar_memoizacion()
+    return ejecutar_con_memoizacion, _LOTE
+
+
+@etapa("canonicalizacion")
+def _preparar_canonicalizacion():
+    normalizados = [normalizar_atributos(r) for r in registros_sinteticos(_LOTE)]
+    return (lambda: [canonicar(n) for n in normalizados]), _LOTE
+
+
+@etapa("his")
+def _preparar_his():
+    canonicas = [canonicar(normalizar_atributos(r)) for r in registros_sinteticos(_LOTE)]
+    return (lambda: [calcular_his(c) for c in canonicas]), _LOTE
+
+
+@etapa("his_v2")
+def _preparar_his_v2():
+    normalizados = [normalizar_atributos(r) for r in registros_sinteticos(_LOTE)]
+    return (lambda: [calcular_his_v2(n) for n in normalizados]), _LOTE
+
+
+@etapa("pipeline")
+def _preparar_pipeline():
+    registros = list(registros_sinteticos(_LOTE))
+    return (lambda: [calcular_his(canonicar(normalizar_atributos(r))) for r in registros]), _LOTE
+
+
+# Mismo pipeline con las métricas activas, para ver el coste de la instrumentación
+@etapa("pipeline_con_metricas")
+def _preparar_pipeline_con_metricas():
+    import metricas
+    registros = list(registros_sinteticos(_LOTE))
+
+    def ejecutar_con_metricas():
+        metricas.activar()
+        try:
+            return [calcular_his(canonicar(normalizar_atributos(r))) for r in registros]
+        finally:
+            metricas.desactivar()
+            metricas.reiniciar()
+    return ejecutar_con_metricas, _LOTE
+
+
+@etapa("lote")
+def _preparar_lote():
+    registros = list(registros_sinteticos(10 * _LOTE))
+    return (lambda: list(calcular_his_lote(registros))), 10 * _LOTE
+
+
+@etapa("columnar")
+def _preparar_columnar():
+    try:
+        import numpy as np
+        from normalizacion_columnar import generar_his_columnas
+    except ImportError:
+        return None
+    registros = list(registros_sinteticos(10 * _LOTE))
+    columnas = {attr: np.array([r[attr] for r in registros]) for attr in _RAW}
+    return (lambda: generar_his_columnas(columnas)), 10 * _LOTE
+
+
+@etapa("inventario_registro")
+def _preparar_inventario_registro():
+    from inventario import escanear_registro, hash_inventario
+    registro = RegistroSimulado()
+    return (lambda: hash_inventario(escanear_registro(registro)[0])), 1
+
+
+@etapa("inventario_registro_sin_cambios")
+def _preparar_inventario_registro_sin_cambios():
+    from inventario import escanear_registro, hash_inventario
+    registro = RegistroSimulado()
+    estado = escanear_registro(registro)[1]
+    return (lambda: hash_inventario(escanear_registro(registro, estado)[0])), 1
+
+
+# Una etapa por colector del backend de Linux, leyendo un árbol simulado
+def _registrar_colectores_linux():
+    import backend_linux
+    raiz = None
+
+    def preparar_colector(nombre):
+        def preparar():
+            nonlocal raiz
+            if raiz is None:
+                raiz = tempfile.mkdtemp(prefix="iotzt_bench_")
+                atexit.register(shutil.rmtree, raiz, True)
+                crear_arbol_linux(raiz)
+            colector = getattr(backend_linux, nombre)
+            if nombre == "crear_hash_software_instalado":
+                # Se mide el escaneo completo, sin reutilizar el anterior
+                return (lambda: (backend_linux._ESCANEOS.clear(), colector(raiz))), 1
+            return (lambda: colector(raiz)), 1
+        return preparar
+
+    for nombre in ("get_id_procesador", "get_serie_bios", "get_mac_principal",
+                   "crear_hash_firmware", "crear_hash_software_instalado"):
+        etapa(f"colector_linux_{nombre}")(preparar_colector(nombre))
+
+
+_registrar_colectores_linux()
+
+
+# En Windows se miden también los colectores reales (WMI y Registro)
+if sys.platform == "win32":
+    def _preparar_colector_windows(attr):
+        def preparar():
+            from atributos import COLECTORES
+            return COLECTORES[attr], 1
+        return preparar
+
+    for _attr in ("cpu_id", "serial_number", "mac_original", "firmware_hash", "software_inventory_hash"):
+        etapa(f"colector_windows_{_attr}")(_preparar_colector_windows(_attr))
+
+
+# =============================
+# EJECUCIÓN Y COMPARACIÓN
+# =============================
+
+# Ejecuta las etapas pedidas (todas por defecto) y devuelve el informe completo
+def ejecutar(nombres=None, repeticiones=50, calentamiento=5):
+    resultados = {}
+    for nombre in nombres or ETAPAS:
+        preparado = ETAPAS[nombre]()
+        if preparado is None:
+            # Etapa no disponible en este entorno (p. ej. sin numpy)
+            continue
+        funcion, operaciones = preparado
+        resultados[nombre] = resumir(medir(funcion, repeticiones, calentamiento), operaciones)
+    return {
+        "maquina": {
+            "python": platform.python_version(),
+            "sistema": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "repeticiones": repeticiones,
+        "calentamiento": calentamiento,
+        "etapas": resultados,
+    }
+
+
+# Etapas cuya mediana ha empeorado más que 'tolerancia' respecto a la base
+def comparar(actual, base, tolerancia=TOLERANCIA):
+    regresiones = []
+    for nombre, datos in actual["etapas"].items():
+        previo = base.get("etapas", {}).get(nombre)
+        if not previo or previo["p50_us"] <= 0:
+            continue
+        cambio = datos["p50_us"] / previo["p50_us"] - 1
+        if cambio > tolerancia:
+            regresiones.append({"etapa": nombre, "base_p50_us": previo["p50_us"],
+                                "actual_p50_us": datos["p50_us"], "cambio": cambio})
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de las etapas del HIS")
+    parser.add_argument("--etapas", help="Lista separada por comas (por defecto, todas)")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--calentamiento", type=int, default=5)
+    parser.add_argument("--salida", help="Fichero JSON donde guardar los resultados")
+    parser.add_argument("--base", help="Resultados JSON anteriores con los que comparar")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--listar", action="store_true", help="Muestra las etapas disponibles")
+    args = parser.parse_args(argv)
+
+    if args.listar:
+        print("\n".join(ETAPAS))
+        return 0
+
+    nombres = args.etapas.split(",") if args.etapas else None
+    informe = ejecutar(nombres, args.repeticiones, args.calentamiento)
+
+    for nombre, datos in informe["etapas"].items():
+        print(f"{nombre:45s} p50={datos['p50_us']:10.2f} us  p95={datos['p95_us']:10.2f} us  "
+              f"p99={datos['p99_us']:10.2f} us  ({datos['ops_s']:.0f} ops/s)")
+
+    codigo = 0
+    if args.base:
+        with open(args.base, encoding="utf-8") as archivo:
+            regresiones = comparar(informe, json.load(archivo), args.tolerancia)
+        informe["regresiones"] = regresiones
+        for r in regresiones:
+            print(f"[REGRESIÓN] {r['etapa']}: {r['base_p50_us']:.2f} -> {r['actual_p50_us']:.2f} us "
+                  f"(+{r['cambio'] * 100:.0f} %)")
+        codigo = 1 if regresiones else 0
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(informe, archivo, indent=2)
+
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import timeit
+import tracemalloc
+
+from normalizacion import (
+    normalizar_atributos,
+    canonicar,
+    calcular_his,
+    calcular_his_v2
+)
+from lotes import registros_sinteticos
+
+
+# ==========================================
+# FORMA CANÓNICA V1 (TEXTO) FRENTE A V2 (BINARIA)
+# ==========================================
+
+def _his_v1(normalizados):
+    return calcular_his(canonicar(normalizados))
+
+
+# Memoria temporal (bytes) que necesita calcular el HIS de un registro:
+# pico de tracemalloc por encima de lo que ya estaba reservado
+def memoria_por_registro(funcion, normalizados):
+    picos = []
+    tracemalloc.start()
+    try:
+        for n in normalizados:
+            antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            resultado = funcion(n)
+            picos.append(tracemalloc.get_traced_memory()[1] - antes)
+            del resultado
+    finally:
+        tracemalloc.stop()
+    return sum(picos) / len(picos)
+
+
+# Devuelve el coste medio por registro de cada versión (microsegundos y bytes)
+def ejecutar_benchmark(n=10000, repeticiones=15):
+    normalizados = [normalizar_atributos(r) for r in registros_sinteticos(n)]
+
+    versiones = (("v1", _his_v1), ("v2", calcular_his_v2))
+    # Las repeticiones de ambas versiones se alternan para que el ruido de la máquina afecte a las dos por igual
+    tiempos = {nombre: [] for nombre, _ in versiones}
+    for _ in range(repeticiones):
+        for nombre, funcion in versiones:
+            tiempos[nombre].append(timeit.timeit(lambda: [funcion(d) for d in normalizados], number=1))
+
+    return {
+        nombre: {
+            "us": min(tiempos[nombre]) / n * 1e6,
+            "bytes": memoria_por_registro(funcion, normalizados[:1000]),
+        }
+        for nombre, funcion in versiones
+    }
+
+
+if __name__ == "__main__":
+    res = ejecutar_benchmark()
+    for nombre in ("v1", "v2"):
+        print(f"{nombre}: {res[nombre]['us']:.2f} us/registro, {res[nombre]['bytes']:.0f} bytes temporales/registro")
+    print(f"Mejora: {res['v1']['us'] / res['v2']['us']:.2f}x en tiempo, "
+          f"{res['v1']['bytes'] / res['v2']['bytes']:.1f}x en memoria")
@@ -0,0 +1,113 @@
+import re
+import timeit
+
+from normalizacion import (
+    ATTRIBUTE_POLICY,
+    activar_memoizacion,
+    desactivar_memoizacion,
+    estadisticas_memoizacion,
+    normalizar_atributos,
+    normalizar_case,
+    normalizar_version,
+    limpiar_basico,
+    HEX_CHARS_RE
+)
+from lotes import registros_sinteticos, registros_flota
+
+
+# ==========================================
+# IMPLEMENTACIÓN ANTERIOR (REFERENCIA)
+# ==========================================
+
+# Versión original con dos expresiones regulares por campo hexadecimal
+def _normalizar_mac_referencia(mac):
+    s = limpiar_basico(mac)
+    s = HEX_CHARS_RE.sub('', s)
+    return s.upper()
+
+
+def _normalizar_hash_hex_referencia(h):
+    s = limpiar_basico(h)
+    if s.lower().startswith("0x"):
+        s = s[2:]
+    s = re.sub(r'[\s:-]', '', s)
+    s = HEX_CHARS_RE.sub('', s)
+    return s.upper()
+
+
+# Versión original con copia de claves y cadena if/elif por atributo
+def normalizar_atributos_referencia(raw):
+    rd = {k.lower(): v for k, v in raw.items()}
+    norm = {}
+    for attr, policy in ATTRIBUTE_POLICY.items():
+        val = rd.get(attr, "")
+        if attr == "mac_original":
+            norm[attr] = _normalizar_mac_referencia(val)
+        elif attr in {
+            "firmware_hash",
+            "public_key_fingerprint",
+            "software_inventory_hash"
+        }:
+            norm[attr] = _normalizar_hash_hex_referencia(val)
+        elif attr == "os_version":
+            norm[attr] = normalizar_version(val)
+        else:
+            norm[attr] = normalizar_case(val, policy)
+    return norm
+
+
+# ==========================================
+# MICRO-BENCHMARK
+# ==========================================
+
+# Devuelve el coste medio por registro (en microsegundos) de cada implementación
+def ejecutar_benchmark(n=10000, repeticiones=5):
+    registros = list(registros_sinteticos(n))
+
+    # Ambas implementaciones deben dar exactamente el mismo resultado
+    for raw in registros:
+        assert normalizar_atributos(raw) == normalizar_atributos_referencia(raw)
+
+    resultados = {}
+    for nombre, funcion in (("anterior", normalizar_atributos_referencia),
+                            ("compilada", normalizar_atributos)):
+        tiempos = timeit.repeat(lambda: [funcion(r) for r in registros], number=1, repeat=repeticiones)
+        resultados[nombre] = min(tiempos) / n * 1e6
+    return resultados
+
+
+# Coste por registro con y sin memoización sobre una flota con valores repetidos,
+# junto con la tasa de aciertos de cada caché
+def ejecutar_benchmark_memoizacion(n=20000, repeticiones=5, maximo=4096):
+    registros = list(registros_flota(n))
+    esperados = [normalizar_atributos(r) for r in registros]
+
+    sin_memoizacion = timeit.repeat(lambda: [normalizar_atributos(r) for r in registros],
+                                    number=1, repeat=repeticiones)
+    activar_memoizacion(maximo)
+    try:
+        assert [normalizar_atributos(r) for r in registros] == esperados
+        con_memoizacion = timeit.repeat(lambda: [normalizar_atributos(r) for r in registros],
+                                        number=1, repeat=repeticiones)
+        estadisticas = estadisticas_memoizacion()
+    finally:
+        desactivar_memoizacion()
+    return {
+        "sin_memoizacion": min(sin_memoizacion) / n * 1e6,
+        "con_memoizacion": min(con_memoizacion) / n * 1e6,
+        "estadisticas": estadisticas,
+    }
+
+
+if __name__ == "__main__":
+    res = ejecutar_benchmark()
+    print(f"Anterior:  {res['anterior']:.2f} us/registro")
+    print(f"Compilada: {res['compilada']:.2f} us/registro")
+    print(f"Mejora:    {res['anterior'] / res['compilada']:.2f}x")
+
+    res = ejecutar_benchmark_memoizacion()
+    print(f"\nFlota, sin memoización: {res['sin_memoizacion']:.2f} us/registro")
+    print(f"Flota, con memoización: {res['con_memoizacion']:.2f} us/registro "
+          f"({res['sin_memoizacion'] / res['con_memoizacion']:.2f}x)")
+    for attr, e in res["estadisticas"].items():
+        print(f"  {attr}: {e['tasa_aciertos'] * 100:.2f} % aciertos, {e['tamano']}/{e['maximo']} entradas")
@@ -1,15 +1,16 @@
+import sys
 import time
 import hashlib
-import wmi
-import winreg
-import pandas as pd
-import matplotlib.pyplot as plt
+
+# wmi y winreg se importan en cada método y pandas/matplotlib solo para el
+# informe, así que medir (o importar este módulo) no arrastra esas dependencias
 
 # --- Funciones de obtención de datos ---
 
 # Usa WMI para obtener el inventario de software instalado
 def crear1_hash_software_instalado():
     try:
+        import wmi
         conexion_wmi = wmi.WMI()
         hashes_programas = []
         for app in conexion_wmi.Win32_Product():
@@ -26,6 +27,7 @@ def crear1_hash_software_instalado():
 
 # Usa el Registro de Windows para obtener el inventario de software instalado
 def crear_hash_software_instalado():
+    import winreg
     hashes_programas = []
     rutas = [
         (winreg.HKEY_LOCAL_MACHINE, r"Software\Microsoft\Windows\CurrentVersion\Uninstall"),
@@ -54,8 +56,8 @@ def crear_hash_software_instalado():
         return "HASH_SOFTWARE_NO_CALCULADO"
 
 
-# Función para ejecutar el benchmark y comparar el rendimiento de dos métodos
-def ejecutar_benchmark(iteraciones=20):
+# Mide los dos métodos y devuelve una lista con los tiempos de cada iteración
+def medir(iteraciones=20):
     resultados = []
     print(f"Iniciando benchmark: {iteraciones} iteraciones por método.")
     
@@ -80,9 +82,34 @@ def ejecutar_benchmark(iteraciones=20):
             "Diferencia (x)": t_wmi / t_reg if t_reg > 0 else 0
         })
 
-    return pd.DataFrame(resultados)
+    return resultados
+
+
+# Función para ejecutar el benchmark y comparar el rendimiento de dos métodos
+def ejecutar_benchmark(iteraciones=20):
+    import pandas as pd
+    return pd.DataFrame(medir(iteraciones))
+
+
+# Solo los números (media de cada método), sin pandas ni matplotlib
+def resumen_rapido(iteraciones=20):
+    resultados = medir(iteraciones)
+    return {
+        clave: sum(r[clave] for r in resultados) / len(resultados)
+        for clave in ("WMI (s)", "Registro (s)", "Diferencia (x)")
+    }
+
 
 if __name__ == "__main__":
+    # --resumen: muestra las medias en la consola sin generar el Excel ni el gráfico
+    if "--resumen" in sys.argv:
+        for clave, valor in resumen_rapido(iteraciones=20).items():
+            print(f"{clave}: {valor:.3f}")
+        sys.exit(0)
+
+    import pandas as pd
+    import matplotlib.pyplot as plt
+
     df_detalle = ejecutar_benchmark(iteraciones=20)
 
     # Calcular estadísticas
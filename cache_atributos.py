@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import threading
+from functools import partial
+
+from sentinelas import es_sentinela
+
+# =============================
+# CONFIGURACIÓN DE LA CACHÉ
+# =============================
+
+DIA = 24 * 3600
+
+# Tiempo de vida (segundos) de cada atributo en caché. 0 = no se cachea.
+TTL_POR_DEFECTO = {
+    "cpu_id": 30 * DIA,
+    "serial_number": 30 * DIA,
+    "firmware_hash": 7 * DIA,
+    "public_key_fingerprint": 30 * DIA,
+    "mac_original": 3600,
+    "os_version": 3600,
+    "software_inventory_hash": 0,
+}
+
+# Eventos que invalidan cada atributo aunque no haya caducado:
+# - "arranque": el equipo se ha reiniciado (cambio de firmware, hardware...)
+# - "archivo": ha cambiado el archivo vigilado (tamaño o fecha de modificación)
+INVALIDACION_POR_DEFECTO = {
+    "cpu_id": ("arranque",),
+    "serial_number": ("arranque",),
+    "firmware_hash": ("arranque",),
+    "mac_original": ("arranque",),
+    "os_version": ("arranque",),
+    "public_key_fingerprint": ("archivo",),
+}
+
+RUTA_POR_DEFECTO = os.path.join(os.path.expanduser("~"), ".iotzt", "cache_atributos.json")
+
+
+# =============================
+# SEÑALES DE INVALIDACIÓN
+# =============================
+
+# Identificador del arranque actual del sistema
+def identificador_arranque():
+    try:
+        # Linux: identificador aleatorio que cambia en cada arranque
+        with open("/proc/sys/kernel/random/boot_id", encoding="ascii") as archivo:
+            return archivo.read().strip()
+    except OSError:
+        pass
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            # Windows: instante del arranque redondeado al minuto
+            milisegundos = ctypes.windll.kernel32.GetTickCount64
+            milisegundos.restype = ctypes.c_ulonglong
+            return str(round((time.time() - milisegundos() / 1000) / 60))
+    except Exception:
+        pass
+    return ""
+
+
+# Firma de un archivo: si cambia su contenido cambia el tamaño o la fecha
+def firma_archivo(ruta):
+    try:
+        st = os.stat(ruta)
+        return [st.st_size, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+# =============================
+# CACHÉ EN DISCO
+# =============================
+
+# Una entrada leída del disco es utilizable si tiene todos los campos que
+# escribe CacheAtributos.almacenar y con el tipo esperado
+def _entrada_valida(entrada):
+    if not isinstance(entrada, dict) or "valor" not in entrada:
+        return False
+    numeros = [entrada.get("guardado"), entrada.get("duracion")]
+    if not all(isinstance(n, (int, float)) and not isinstance(n, bool) for n in numeros):
+        return False
+    return isinstance(entrada.get("senales"), dict)
+
+
+class CacheAtributos:
+    """
+    Caché en disco de los valores en crudo devueltos por los colectores.
+    Cada entrada guarda el valor, cuándo se obtuvo, cuánto costó obtenerlo
+    y las señales de invalidación vigentes en ese momento.
+
+    Se puede usar desde varios hilos (recoleccion.recoger_concurrente): un
+    colector abandonado por timeout puede seguir almacenando mientras otro
+    hilo guarda la caché. Los colectores se ejecutan fuera del cerrojo.
+    """
+
+    def __init__(self, ruta=RUTA_POR_DEFECTO, ttl=None, invalidacion=None,
+                 archivos_vigilados=None, reloj=time.time, arranque=identificador_arranque):
+        self.ruta = ruta
+        self.ttl = dict(TTL_POR_DEFECTO if ttl is None else ttl)
+        self.invalidacion = dict(INVALIDACION_POR_DEFECTO if invalidacion is None else invalidacion)
+        # {atributo: ruta del archivo del que depende}
+        self.archivos_vigilados = dict(archivos_vigilados or {})
+        self.reloj = reloj
+        self._arranque = arranque() if callable(arranque) else arranque
+
+        self._cerrojo = threading.RLock()
+        self.entradas = self._cargar()
+        self.aciertos = {}
+        self.fallos = {}
+        self.segundos_ahorrados = 0.0
+
+    def _cargar(self):
+        if not self.ruta:
+            return {}
+        try:
+            with open(self.ruta, encoding="utf-8") as archivo:
+                datos = json.load(archivo)
+        except (OSError, ValueError):
+            return {}
+        # Un archivo editado a mano o de otra versión no debe romper la recogida:
+        # se descartan las entradas que no tengan la forma esperada
+        if not isinstance(datos, dict):
+            return {}
+        return {attr: entrada for attr, entrada in datos.items() if _entrada_valida(entrada)}
+
+    # Se escribe en un archivo temporal y se renombra para no dejar la caché a medias
+    def guardar(self):
+        if not self.ruta:
+            return
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        # Las entradas no se modifican tras crearse: basta copiar el diccionario
+        with self._cerrojo:
+            entradas = dict(self.entradas)
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(entradas, archivo)
+        os.replace(temporal, self.ruta)
+
+    def _senales(self, attr):
+        senales = {}
+        for tipo in self.invalidacion.get(attr, ()):
+            if tipo == "arranque":
+                senales["arranque"] = self._arranque
+            elif tipo == "archivo":
+                senales["archivo"] = firma_archivo(self.archivos_vigilados.get(attr, ""))
+        return senales
+
+    # Devuelve la entrada de un atributo si sigue siendo válida
+    def vigente(self, attr):
+        with self._cerrojo:
+            entrada = self.entradas.get(attr)
+        ttl = self.ttl.get(attr, 0)
+        if entrada is None or ttl <= 0:
+            return None
+        if self.reloj() - entrada["guardado"] >= ttl:
+            return None
+        if entrada.get("senales") != self._senales(attr):
+            return None
+        return entrada
+
+    # Devuelve el valor del atributo desde la caché o llamando al colector
+    def obtener(self, attr, colector):
+        entrada = self.vigente(attr)
+        with self._cerrojo:
+            if entrada is not None:
+                self.aciertos[attr] = self.aciertos.get(attr, 0) + 1
+                self.segundos_ahorrados += entrada["duracion"]
+                return entrada["valor"]
+            self.fallos[attr] = self.fallos.get(attr, 0) + 1
+
+        t0 = time.perf_counter()
+        valor = colector()
+        duracion = time.perf_counter() - t0
+        self.almacenar(attr, valor, duracion)
+        return valor
+
+    # Guarda un valor recién obtenido (los valores de error no se cachean).
+    # Devuelve si han cambiado las entradas, es decir, si hay algo que guardar:
+    # un atributo con TTL 0 que no estaba en la caché no la modifica.
+    def almacenar(self, attr, valor, duracion=0.0):
+        if self.ttl.get(attr, 0) <= 0 or es_sentinela(valor):
+            with self._cerrojo:
+                return self.entradas.pop(attr, None) is not None
+        entrada = {
+            "valor": valor,
+            "guardado": self.reloj(),
+            "duracion": duracion,
+            "senales": self._senales(attr),
+        }
+        with self._cerrojo:
+            self.entradas[attr] = entrada
+        return True
+
+    # Invalida un atributo concreto o toda la caché
+    def vaciar(self, attr=None):
+        with self._cerrojo:
+            if attr is None:
+                self.entradas.clear()
+            else:
+                self.entradas.pop(attr, None)
+
+    def estadisticas(self):
+        with self._cerrojo:
+            return self._estadisticas()
+
+    def _estadisticas(self):
+        aciertos = sum(self.aciertos.values())
+        fallos = sum(self.fallos.values())
+        return {
+            "aciertos": aciertos,
+            "fallos": fallos,
+            "tasa_aciertos": aciertos / (aciertos + fallos) if aciertos + fallos else 0.0,
+            "segundos_ahorrados": self.segundos_ahorrados,
+            "por_atributo": {
+                attr: {"aciertos": self.aciertos.get(attr, 0), "fallos": self.fallos.get(attr, 0)}
+                for attr in sorted(set(self.aciertos) | set(self.fallos))
+            },
+        }
+
+
+# Envuelve cada colector {atributo: colector} para que pase por la caché
+def colectores_con_cache(colectores, cache):
+    return {attr: partial(cache.obtener, attr, colector) for attr, colector in colectores.items()}
+
+
+# Obtiene todos los atributos {atributo: colector} pasando por la caché y la guarda
+def recoger_con_cache(colectores, cache):
+    raw = {attr: colector() for attr, colector in colectores_con_cache(colectores, cache).items()}
+    cache.guardar()
+    return raw
@@ -0,0 +1,140 @@
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from lotes import registros_sinteticos
+from benchmark import percentil
+from servidor_verificacion import (
+    PUERTO_POR_DEFECTO,
+    MAX_LINEA,
+    ServidorVerificacion,
+    registro_sintetico
+)
+
+# ==================================================
+# CLIENTE DE CARGA PARA EL SERVIDOR DE VERIFICACIÓN
+# ==================================================
+
+# Cada dispositivo simulado abre su propia conexión y envía 'peticiones'
+# informes, con hasta 'ventana' peticiones en vuelo a la vez.
+
+
+async def _conectar(host, puerto, unix):
+    if unix:
+        return await asyncio.open_unix_connection(unix, limit=MAX_LINEA)
+    return await asyncio.open_connection(host, puerto, limit=MAX_LINEA)
+
+
+# Simula un dispositivo: devuelve las latencias (s) y los resultados recibidos
+async def _dispositivo(i, atributos, peticiones, ventana, host, puerto, unix, alterados):
+    lector, escritor = await _conectar(host, puerto, unix)
+    latencias = []
+    resultados = {}
+    enviados = []
+
+    # Una parte de los dispositivos envía un atributo cambiado (no debe coincidir)
+    if i in alterados:
+        atributos = dict(atributos, mac_original="00:00:00:00:00:01")
+    linea = json.dumps({"dispositivo": f"disp-{i}", "atributos": atributos}).encode("utf-8") + b"\n"
+
+    async def recibir():
+        respuesta = json.loads(await lector.readline())
+        latencias.append(time.perf_counter() - enviados.pop(0))
+        resultados[respuesta["resultado"]] = resultados.get(respuesta["resultado"], 0) + 1
+
+    try:
+        for _ in range(peticiones):
+            if len(enviados) >= ventana:
+                await recibir()
+            enviados.append(time.perf_counter())
+            escritor.write(linea)
+            await escritor.drain()
+        while enviados:
+            await recibir()
+    finally:
+        escritor.close()
+        await escritor.wait_closed()
+    return latencias, resultados
+
+
+# Lanza la carga y devuelve el informe (peticiones/s y latencias en ms)
+async def ejecutar_carga(dispositivos=100, peticiones=100, ventana=1, host="127.0.0.1",
+                         puerto=PUERTO_POR_DEFECTO, unix=None, alterados=0.0, semilla=0):
+    informes = list(registros_sinteticos(dispositivos))
+    alterados = set(random.Random(semilla).sample(range(dispositivos), int(dispositivos * alterados)))
+
+    t0 = time.perf_counter()
+    salidas = await asyncio.gather(*(
+        _dispositivo(i, raw, peticiones, ventana, host, puerto, unix, alterados)
+        for i, raw in enumerate(informes)
+    ))
+    segundos = time.perf_counter() - t0
+
+    latencias = sorted(l for lat, _ in salidas for l in lat)
+    resultados = {}
+    for _, res in salidas:
+        for clave, n in res.items():
+            resultados[clave] = resultados.get(clave, 0) + n
+    return {
+        "dispositivos": dispositivos,
+        "peticiones": len(latencias),
+        "ventana": ventana,
+        "segundos": segundos,
+        "peticiones_s": len(latencias) / segundos if segundos > 0 else 0.0,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p95_ms": percentil(latencias, 95) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "max_ms": latencias[-1] * 1000 if latencias else 0.0,
+        "resultados": resultados,
+    }
+
+
+# Arranca un servidor en el mismo proceso con los dispositivos sintéticos y lanza la carga contra él
+async def carga_local(dispositivos=100, peticiones=100, ventana=1, alterados=0.0):
+    servidor = ServidorVerificacion(registro_sintetico(dispositivos))
+    await servidor.iniciar("127.0.0.1", 0)
+    try:
+        _, puerto = servidor.direccion()[:2]
+        return await ejecutar_carga(dispositivos, peticiones, ventana, puerto=puerto, alterados=alterados)
+    finally:
+        await servidor.cerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor de verificación")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO)
+    parser.add_argument("--unix", help="Ruta del socket Unix del servidor")
+    parser.add_argument("--dispositivos", type=int, default=100, help="Conexiones simultáneas")
+    parser.add_argument("--peticiones", type=int, default=100, help="Peticiones por dispositivo")
+    parser.add_argument("--ventana", type=int, default=1, help="Peticiones en vuelo por conexión")
+    parser.add_argument("--alterados", type=float, default=0.0,
+                        help="Fracción de dispositivos que envían un atributo cambiado")
+    parser.add_argument("--local", action="store_true",
+                        help="Arranca el servidor en este proceso con --dispositivos sintéticos")
+    parser.add_argument("--salida", help="Fichero JSON donde guardar el informe")
+    args = parser.parse_args(argv)
+
+    if args.local:
+        informe = asyncio.run(carga_local(args.dispositivos, args.peticiones, args.ventana, args.alterados))
+    else:
+        informe = asyncio.run(ejecutar_carga(args.dispositivos, args.peticiones, args.ventana,
+                                             args.host, args.puerto, args.unix, args.alterados))
+
+    print(f"{informe['peticiones']} peticiones de {informe['dispositivos']} dispositivos en "
+          f"{informe['segundos']:.2f} s ({informe['peticiones_s']:.0f} peticiones/s)")
+    print(f"latencia p50={informe['p50_ms']:.2f} ms  p95={informe['p95_ms']:.2f} ms  "
+          f"p99={informe['p99_ms']:.2f} ms  max={informe['max_ms']:.2f} ms")
+    print(f"resultados: {informe['resultados']}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(informe, archivo, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
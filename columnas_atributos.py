@@ -0,0 +1,190 @@
+import sys
+import time
+import hashlib
+import tracemalloc
+
+from normalizacion import (
+    CAMPOS,
+    Atributos,
+    normalizar_atributos,
+    canonicar,
+    calcular_his,
+    limpiar_valor_canonico,
+    plan_normalizacion
+)
+
+# ==================================================
+# ALMACÉN POR COLUMNAS
+# ==================================================
+
+class ColumnasAtributos:
+    """
+    Colección de registros guardada por columnas: una lista por atributo en
+    lugar de un diccionario (o un Atributos) por dispositivo. Cada dispositivo
+    cuesta una referencia por atributo, y la normalización y la forma canónica
+    se calculan columna a columna, llamando a cada normalizador sobre toda la
+    columna sin buscarlo por registro.
+
+    Las filas se leen como Atributos (columnas[i]); normalizar() devuelve otra
+    ColumnasAtributos y his() el HIS de cada fila, igual que el pipeline por
+    registro.
+    """
+
+    def __init__(self, columnas=None, campos=CAMPOS):
+        self.campos = tuple(campos)
+        columnas = columnas or {}
+        self.columnas = {campo: list(columnas.get(campo, ())) for campo in self.campos}
+        longitudes = {len(col) for col in self.columnas.values()}
+        if len(longitudes) > 1:
+            raise ValueError("Todas las columnas deben tener la misma longitud")
+
+    # Crea el almacén a partir de diccionarios o Atributos
+    @classmethod
+    def desde_registros(cls, registros, campos=CAMPOS):
+        almacen = cls(campos=campos)
+        almacen.extender(registros)
+        return almacen
+
+    # Añade un registro (diccionario, con claves en cualquier case, o Atributos)
+    def anadir(self, registro):
+        if type(registro) is not Atributos and not all(map(str.islower, registro)):
+            registro = {k.lower(): v for k, v in registro.items()}
+        for campo, columna in self.columnas.items():
+            columna.append(registro.get(campo, ""))
+
+    def extender(self, registros):
+        for registro in registros:
+            self.anadir(registro)
+
+    def columna(self, campo):
+        return self.columnas[campo]
+
+    def __len__(self):
+        return len(self.columnas[self.campos[0]]) if self.campos else 0
+
+    def __getitem__(self, i):
+        fila = [self.columnas[campo][i] for campo in self.campos]
+        if self.campos == CAMPOS:
+            return Atributos(*fila)
+        return dict(zip(self.campos, fila))
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    # Normaliza columna a columna con el plan de normalizacion.py
+    def normalizar(self):
+        n = len(self)
+        vacia = [""] * n
+        columnas = {attr: list(map(normalizador, self.columnas.get(attr, vacia)))
+                    for attr, normalizador in plan_normalizacion()}
+        return ColumnasAtributos(columnas, campos=columnas)
+
+    # Forma canónica de cada fila (la misma cadena que canonicar sobre el registro)
+    def canonicas(self, sep='|', kvsep='='):
+        partes = []
+        for campo in sorted(self.campos):
+            prefijo = f"{campo}{kvsep}"
+            partes.append([prefijo + limpiar_valor_canonico(v) for v in self.columnas[campo]])
+        return [sep.join(fila) for fila in zip(*partes)]
+
+    # HIS de cada fila de un almacén ya normalizado. Se usa hashlib directamente
+    # para no registrar una métrica por fila; el resultado es el de calcular_his.
+    def his(self):
+        sha256 = hashlib.sha256
+        return [sha256(c.encode("utf-8")).hexdigest().upper() for c in self.canonicas()]
+
+    # HIS de cada fila de un almacén en crudo
+    def generar_his(self):
+        return self.normalizar().his()
+
+
+# ==========================================
+# MEMORIA Y TIEMPO FRENTE A DICCIONARIOS
+# ==========================================
+
+# Bytes reservados (según tracemalloc) para construir el resultado de 'funcion'.
+# Se devuelve también el resultado para que el llamador lo libere cuando quiera.
+def _memoria(funcion):
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        resultado = funcion()
+        despues = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return despues - antes, resultado
+
+
+def _his_filas(registros):
+    return [calcular_his(canonicar(normalizar_atributos(r))) for r in registros]
+
+
+# Compara diccionarios, Atributos y columnas sobre 'n' registros de flota:
+#  - bytes por dispositivo del contenedor en crudo (los textos se comparten entre
+#    las tres representaciones, así que solo cuenta la estructura) y del
+#    contenedor ya normalizado (aquí sí cuentan los textos nuevos)
+#  - microsegundos por dispositivo de crudo a HIS
+def ejecutar_benchmark(n=1_000_000, registros=None):
+    from lotes import registros_flota
+
+    registros = registros if registros is not None else list(registros_flota(n))
+    n = len(registros)
+
+    constructores = {
+        "dict": lambda: [dict(r) for r in registros],
+        "atributos": lambda: [Atributos.desde_dict(r) for r in registros],
+        "columnas": lambda: ColumnasAtributos.desde_registros(registros),
+    }
+    normalizaciones = {
+        "dict": lambda datos: [normalizar_atributos(r) for r in datos],
+        "atributos": lambda datos: [normalizar_atributos(r) for r in datos],
+        "columnas": lambda datos: datos.normalizar(),
+    }
+    cadenas = {
+        "dict": _his_filas,
+        "atributos": _his_filas,
+        "columnas": lambda datos: datos.generar_his(),
+    }
+
+    resultados = {}
+    referencia = None
+    for nombre, construir in constructores.items():
+        bytes_crudo, datos = _memoria(construir)
+        bytes_normalizado, normalizados = _memoria(lambda: normalizaciones[nombre](datos))
+        del normalizados
+
+        t0 = time.perf_counter()
+        his = cadenas[nombre](datos)
+        segundos = time.perf_counter() - t0
+
+        # Las tres representaciones deben dar exactamente los mismos HIS
+        if referencia is None:
+            referencia = his
+        elif his != referencia:
+            raise AssertionError(f"{nombre}: HIS distintos de los de 'dict'")
+        del datos, his
+
+        resultados[nombre] = {
+            "bytes_crudo": bytes_crudo / n,
+            "bytes_normalizado": bytes_normalizado / n,
+            "us_his": segundos / n * 1e6,
+        }
+    return resultados
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Memoria y tiempo de diccionarios, Atributos y columnas")
+    parser.add_argument("-n", type=int, default=1_000_000, help="Número de registros")
+    args = parser.parse_args(argv)
+
+    res = ejecutar_benchmark(args.n)
+    print(f"{'representación':<15}{'crudo B/disp':>14}{'normalizado B/disp':>20}{'crudo->HIS us/disp':>20}")
+    for nombre, r in res.items():
+        print(f"{nombre:<15}{r['bytes_crudo']:>14.1f}{r['bytes_normalizado']:>20.1f}{r['us_his']:>20.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,15 @@
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
 from cryptography.hazmat.primitives import serialization
 import os
+import sys
+import csv
+import time
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from lotes import trocear
 
 
 # ==================================================
@@ -70,5 +79,166 @@ def crear_par_de_claves_seguras():
     print("\n--- Proceso terminado ---\n")
 
 
+# ==================================================
+# APROVISIONAMIENTO DE CLAVES EN LOTE
+# ==================================================
+
+# Algoritmos disponibles y cómo generar la clave privada de cada uno.
+# Ed25519 y P-256 son órdenes de magnitud más rápidos de generar que RSA.
+ALGORITMOS = {
+    "rsa2048": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "rsa3072": lambda: rsa.generate_private_key(public_exponent=65537, key_size=3072),
+    "ed25519": ed25519.Ed25519PrivateKey.generate,
+    "p256": lambda: ec.generate_private_key(ec.SECP256R1()),
+}
+
+# Rutas de cada dispositivo dentro de la carpeta de salida ({dispositivo} se sustituye)
+PLANTILLA_PUBLICA = os.path.join("{dispositivo}", "mi_clave_publica.pub")
+PLANTILLA_PRIVADA = os.path.join("{dispositivo}", "mi_clave_privada.pem")
+
+NOMBRE_MANIFIESTO = "manifiesto.csv"
+
+
+# Genera un par de claves y lo devuelve en PEM (privada PKCS8, pública SubjectPublicKeyInfo)
+def generar_par(algoritmo="rsa2048"):
+    clave_privada = ALGORITMOS[algoritmo]()
+    datos_privados = clave_privada.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    datos_publicos = clave_privada.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return datos_privados, datos_publicos
+
+
+# Huella de la clave pública: SHA-256 del fichero .pub, igual que la calcula
+# huella_clave_publica en el dispositivo (atributo public_key_fingerprint)
+def huella_publica(datos_publicos):
+    return hashlib.sha256(datos_publicos).hexdigest()
+
+
+# Comprueba que un identificador de dispositivo se puede usar como nombre de
+# fichero: sin separadores, unidad ni '.'/'..' que lleven fuera de la salida
+def validar_dispositivo(dispositivo):
+    if (not dispositivo or dispositivo in (".", "..") or "/" in dispositivo or "\\" in dispositivo
+            or "\0" in dispositivo or os.path.isabs(dispositivo) or os.path.splitdrive(dispositivo)[0]):
+        raise ValueError(f"Identificador de dispositivo no válido: {dispositivo!r}")
+    return dispositivo
+
+
+def _escribir(ruta, datos, privado=False):
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    # La clave privada solo la puede leer el propietario. El modo de os.open solo
+    # se aplica al crear el fichero, así que al reaprovisionar se fija otra vez.
+    modo = 0o600 if privado else 0o644
+    descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), modo)
+    if hasattr(os, "fchmod"):
+        os.fchmod(descriptor, modo)
+    with os.fdopen(descriptor, "wb") as archivo:
+        archivo.write(datos)
+
+
+# Genera y guarda las claves de un bloque de dispositivos (se ejecuta en cada proceso).
+# Solo vuelven al proceso principal las filas del manifiesto, no las claves.
+def _provisionar_bloque(trabajo):
+    dispositivos, salida, algoritmo, plantilla_publica, plantilla_privada = trabajo
+    filas = []
+    for dispositivo in dispositivos:
+        privada, publica = generar_par(algoritmo)
+        ruta_publica = plantilla_publica.format(dispositivo=dispositivo)
+        ruta_privada = plantilla_privada.format(dispositivo=dispositivo)
+        if salida is not None:
+            _escribir(os.path.join(salida, ruta_privada), privada, privado=True)
+            _escribir(os.path.join(salida, ruta_publica), publica)
+        filas.append((dispositivo, algoritmo, huella_publica(publica), ruta_publica))
+    return filas
+
+
+# Genera las claves de todos los dispositivos repartidas entre 'procesos' procesos
+# y escribe el manifiesto (dispositivo, algoritmo, huella, ruta de la clave pública).
+# Con salida=None solo se generan (para medir). Devuelve las filas del manifiesto.
+def provisionar(dispositivos, salida, algoritmo="ed25519", procesos=1, tamano_bloque=32,
+                plantilla_publica=PLANTILLA_PUBLICA, plantilla_privada=PLANTILLA_PRIVADA):
+    if algoritmo not in ALGORITMOS:
+        raise ValueError(f"Algoritmo desconocido: {algoritmo} (disponibles: {', '.join(ALGORITMOS)})")
+    dispositivos = [validar_dispositivo(d) for d in dispositivos]
+    trabajos = ((bloque, salida, algoritmo, plantilla_publica, plantilla_privada)
+                for bloque in trocear(dispositivos, tamano_bloque))
+
+    if procesos <= 1:
+        filas = [fila for trabajo in trabajos for fila in _provisionar_bloque(trabajo)]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            filas = [fila for bloque in pool.map(_provisionar_bloque, trabajos) for fila in bloque]
+
+    if salida is not None:
+        os.makedirs(salida, exist_ok=True)
+        with open(os.path.join(salida, NOMBRE_MANIFIESTO), "w", encoding="utf-8", newline="") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(("dispositivo", "algoritmo", "huella_sha256", "clave_publica"))
+            escritor.writerows(filas)
+    return filas
+
+
+# Identificadores de dispositivo 'prefijo000000', 'prefijo000001'...
+def identificadores(n, prefijo="disp-"):
+    return [f"{prefijo}{i:06d}" for i in range(n)]
+
+
+# Claves/s de cada algoritmo con 1..procesos procesos (escribiendo en una carpeta temporal)
+def medir_rendimiento(algoritmos=tuple(ALGORITMOS), procesos=1, n=200):
+    resultados = []
+    for algoritmo in algoritmos:
+        for p in range(1, max(procesos, 1) + 1):
+            with tempfile.TemporaryDirectory(prefix="claves_") as salida:
+                t0 = time.perf_counter()
+                provisionar(identificadores(n), salida, algoritmo, p)
+                segundos = time.perf_counter() - t0
+            resultados.append({"algoritmo": algoritmo, "procesos": p, "claves_s": n / segundos})
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generación de claves del dispositivo")
+    parser.add_argument("--lote", type=int, metavar="N",
+                        help="Genera N pares de claves en --salida en lugar de la clave de este equipo")
+    parser.add_argument("--dispositivos", help="Fichero con un identificador de dispositivo por línea")
+    parser.add_argument("--prefijo", default="disp-")
+    parser.add_argument("--salida", default="claves")
+    parser.add_argument("--algoritmo", choices=tuple(ALGORITMOS), default="ed25519")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--plantilla-publica", default=PLANTILLA_PUBLICA)
+    parser.add_argument("--plantilla-privada", default=PLANTILLA_PRIVADA)
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="Mide claves/s de cada algoritmo con N claves y de 1 a --procesos procesos")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        for r in medir_rendimiento(procesos=args.procesos, n=args.benchmark):
+            print(f"{r['algoritmo']:8s} procesos={r['procesos']} claves/s={r['claves_s']:.0f}")
+        return 0
+
+    if args.lote is None and not args.dispositivos:
+        crear_par_de_claves_seguras()
+        return 0
+
+    if args.dispositivos:
+        with open(args.dispositivos, encoding="utf-8") as archivo:
+            dispositivos = [linea.strip() for linea in archivo if linea.strip()]
+    else:
+        dispositivos = identificadores(args.lote, args.prefijo)
+
+    t0 = time.perf_counter()
+    filas = provisionar(dispositivos, args.salida, args.algoritmo, args.procesos,
+                        plantilla_publica=args.plantilla_publica, plantilla_privada=args.plantilla_privada)
+    segundos = time.perf_counter() - t0
+    print(f"{len(filas)} pares {args.algoritmo} en {segundos:.2f} s ({len(filas) / segundos:.0f} claves/s)")
+    print(f"Manifiesto: {os.path.join(args.salida, NOMBRE_MANIFIESTO)}")
+    return 0
+
+
 if __name__ == "__main__":
-    crear_par_de_claves_seguras()
\ No newline at end of file
+    sys.exit(main())
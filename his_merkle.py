@@ -0,0 +1,209 @@
+import struct
+import hashlib
+
+from normalizacion import ATTRIBUTE_POLICY, normalizar_atributos
+
+# ==================================================
+# HIS EN ÁRBOL DE MERKLE (UNA HOJA POR ATRIBUTO)
+# ==================================================
+
+# Cada atributo normalizado de ATTRIBUTE_POLICY es una hoja, en orden de nombre,
+# y la raíz es la identidad del dispositivo. Cuando cambian algunos atributos,
+# el dispositivo envía solo esas hojas y los hashes hermanos necesarios para
+# llegar a la raíz, y el verificador sabe exactamente qué atributo ha cambiado.
+#
+#   hoja  = SHA-256(0x00 + longitud(clave) + clave + longitud(valor) + valor)
+#   nodo  = SHA-256(0x01 + izquierdo + derecho)
+#
+# Los prefijos 0x00/0x01 impiden hacer pasar un nodo interno por una hoja.
+# Si un nivel tiene un número impar de nodos, el último sube sin cambios.
+
+_PREFIJO_HOJA = b"\x00"
+_PREFIJO_NODO = b"\x01"
+_LONGITUD = struct.Struct(">I").pack
+
+
+# Atributos del árbol en el orden de sus hojas
+def orden_atributos():
+    return tuple(sorted(ATTRIBUTE_POLICY))
+
+
+def hash_hoja(attr, valor):
+    clave = attr.encode("utf-8")
+    valor = str(valor).encode("utf-8")
+    return hashlib.sha256(_PREFIJO_HOJA + _LONGITUD(len(clave)) + clave + _LONGITUD(len(valor)) + valor).digest()
+
+
+def hash_nodo(izquierdo, derecho):
+    return hashlib.sha256(_PREFIJO_NODO + izquierdo + derecho).digest()
+
+
+# Número de nodos de cada nivel, de las hojas a la raíz
+def tamanos_niveles(n):
+    tamanos = [n]
+    while tamanos[-1] > 1:
+        tamanos.append((tamanos[-1] + 1) // 2)
+    return tamanos
+
+
+# Hermanos (nivel, índice) que hacen falta para subir desde las hojas 'indices' hasta la raíz
+def posiciones_hermanos(indices, n):
+    posiciones = []
+    conocidos = set(indices)
+    for nivel, tamano in enumerate(tamanos_niveles(n)[:-1]):
+        for i in sorted(conocidos):
+            hermano = i ^ 1
+            if hermano < tamano and hermano not in conocidos:
+                posiciones.append((nivel, hermano))
+        conocidos = {i // 2 for i in conocidos}
+    return posiciones
+
+
+class ArbolHIS:
+    """
+    Árbol de Merkle completo de un dispositivo. 'niveles[0]' son las hojas
+    y 'niveles[-1][0]' la raíz.
+    """
+
+    def __init__(self, normalizados=None, atributos=None, hojas=None):
+        self.atributos = tuple(atributos or orden_atributos())
+        self.posicion = {attr: i for i, attr in enumerate(self.atributos)}
+        if hojas is None:
+            normalizados = normalizados or {}
+            hojas = [hash_hoja(attr, normalizados.get(attr, "")) for attr in self.atributos]
+        self.niveles = [list(hojas)]
+        while len(self.niveles[-1]) > 1:
+            anterior = self.niveles[-1]
+            self.niveles.append([
+                hash_nodo(anterior[i], anterior[i + 1]) if i + 1 < len(anterior) else anterior[i]
+                for i in range(0, len(anterior), 2)
+            ])
+
+    # Árbol a partir de atributos en crudo (se normalizan como para el HIS)
+    @classmethod
+    def desde_raw(cls, raw, atributos=None):
+        return cls(normalizar_atributos(raw), atributos)
+
+    @property
+    def raiz(self):
+        return self.niveles[-1][0]
+
+    def raiz_hex(self):
+        return self.raiz.hex().upper()
+
+    def hoja(self, attr):
+        return self.niveles[0][self.posicion[attr]]
+
+    # Cambia el valor de algunos atributos recalculando solo sus caminos hasta la raíz
+    def actualizar(self, cambios):
+        pendientes = set()
+        for attr, valor in cambios.items():
+            i = self.posicion[attr]
+            self.niveles[0][i] = hash_hoja(attr, valor)
+            pendientes.add(i // 2)
+        for nivel in range(1, len(self.niveles)):
+            inferior = self.niveles[nivel - 1]
+            for i in pendientes:
+                izquierdo = 2 * i
+                self.niveles[nivel][i] = (hash_nodo(inferior[izquierdo], inferior[izquierdo + 1])
+                                          if izquierdo + 1 < len(inferior) else inferior[izquierdo])
+            pendientes = {i // 2 for i in pendientes}
+
+    # Atributos cuya hoja es distinta en 'otro'
+    def diferencias(self, otro):
+        return [attr for attr in self.atributos if self.hoja(attr) != otro.hoja(attr)]
+
+    # Prueba de un subconjunto de atributos: sus valores normalizados y los
+    # hashes hermanos necesarios para reconstruir la raíz
+    def prueba(self, valores):
+        indices = sorted(self.posicion[attr] for attr in valores)
+        return {
+            "raiz": self.raiz_hex(),
+            "hojas": {attr: str(valores[attr]) for attr in valores},
+            "hermanos": [[nivel, i, self.niveles[nivel][i].hex()]
+                         for nivel, i in posiciones_hermanos(indices, len(self.atributos))],
+        }
+
+    # Para guardar el árbol enrolado basta con las hojas
+    def a_dict(self):
+        return {"atributos": list(self.atributos), "hojas": [h.hex() for h in self.niveles[0]]}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(atributos=datos["atributos"], hojas=[bytes.fromhex(h) for h in datos["hojas"]])
+
+
+# =============================
+# LADO DEL DISPOSITIVO
+# =============================
+
+# Prueba con los atributos que han cambiado respecto al árbol enrolado
+def prueba_de_cambios(enrolado, normalizados):
+    actual = ArbolHIS(normalizados, enrolado.atributos)
+    cambiados = actual.diferencias(enrolado)
+    return actual.prueba({attr: normalizados.get(attr, "") for attr in cambiados})
+
+
+# =============================
+# LADO DEL VERIFICADOR
+# =============================
+
+# Comprueba una prueba contra el árbol enrolado. El coste es proporcional al
+# número de hojas enviadas (por la altura del árbol), no al total de atributos.
+# Devuelve:
+#   valido:       la raíz declarada coincide con la enrolada (nada ha cambiado)
+#   integra:      las hojas y los hermanos enviados llevan a la raíz declarada
+#   cambiados:    atributos enviados cuyo valor es distinto del enrolado
+#   sin_declarar: atributos de subárboles cuyo hash hermano no coincide con el
+#                 enrolado (han cambiado pero el dispositivo no los ha enviado)
+def verificar_prueba(enrolado, prueba):
+    n = len(enrolado.atributos)
+    try:
+        raiz_declarada = bytes.fromhex(prueba["raiz"])
+        actuales = {enrolado.posicion[attr]: (attr, hash_hoja(attr, valor))
+                    for attr, valor in prueba["hojas"].items()}
+        hermanos = {(nivel, i): bytes.fromhex(h) for nivel, i, h in prueba["hermanos"]}
+    except (KeyError, ValueError, TypeError):
+        return {"valido": False, "integra": False, "cambiados": [], "sin_declarar": []}
+
+    # Los hermanos tienen que ser exactamente los que corresponden a las hojas enviadas
+    if set(hermanos) != set(posiciones_hermanos(actuales, n)):
+        return {"valido": False, "integra": False, "cambiados": [], "sin_declarar": []}
+
+    cambiados = sorted(attr for i, (attr, h) in actuales.items() if h != enrolado.niveles[0][i])
+
+    sin_declarar = []
+    for (nivel, i), h in hermanos.items():
+        if h != enrolado.niveles[nivel][i]:
+            # Hojas que cuelgan del nodo (nivel, i)
+            inicio = i << nivel
+            sin_declarar.extend(enrolado.atributos[inicio:min(inicio + (1 << nivel), n)])
+
+    # Se sube hasta la raíz con las hojas enviadas y los hermanos
+    conocidos = {i: h for i, (_, h) in actuales.items()}
+    if not conocidos:
+        raiz = enrolado.raiz
+    else:
+        for nivel, tamano in enumerate(tamanos_niveles(n)[:-1]):
+            siguientes = {}
+            for i, h in conocidos.items():
+                padre = i // 2
+                if padre in siguientes:
+                    continue
+                izquierdo, derecho = 2 * padre, 2 * padre + 1
+                if derecho >= tamano:
+                    siguientes[padre] = h
+                    continue
+                h_izq = conocidos.get(izquierdo) or hermanos[(nivel, izquierdo)]
+                h_der = conocidos.get(derecho) or hermanos[(nivel, derecho)]
+                siguientes[padre] = hash_nodo(h_izq, h_der)
+            conocidos = siguientes
+        raiz = conocidos[0]
+
+    integra = raiz == raiz_declarada
+    return {
+        "valido": integra and raiz_declarada == enrolado.raiz,
+        "integra": integra,
+        "cambiados": cambiados if integra else [],
+        "sin_declarar": sorted(sin_declarar) if integra else [],
+    }
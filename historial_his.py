@@ -0,0 +1,482 @@
+import os
+import sys
+import mmap
+import time
+import zlib
+import struct
+
+# ==================================================
+# HISTORIAL DE HIS (REGISTRO BINARIO DE SOLO AÑADIR)
+# ==================================================
+
+# Serie temporal del HIS y de los atributos normalizados de cada dispositivo.
+#
+# Formato del fichero:
+#   cabecera: MAGIA (8 bytes) + longitud (uint32) + nombres de los atributos
+#             separados por '\n' (UTF-8), en el orden de los registros
+#   bloques, uno detrás de otro:
+#     cabecera del bloque (40 bytes, ver _BLOQUE)
+#     dispositivos del bloque: ids (uint32) ordenados y sin repetir, sin comprimir
+#     cadenas nuevas del diccionario (zlib): longitud (uint32) + UTF-8 de cada una
+#     registros (zlib), de tamaño fijo: marca en ms (int64), id del dispositivo
+#       (uint32), HIS (32 bytes) e id del valor de cada atributo (uint32).
+#       Antes de comprimirlos se trasponen por bytes (primero el byte 0 de todos
+#       los registros, luego el byte 1...): los bytes altos de las marcas y de los
+#       ids son casi siempre iguales y así zlib los comprime mucho mejor.
+#
+# Todas las cadenas (identificadores de dispositivo y valores de atributo) se
+# guardan una sola vez en el diccionario; cada bloque añade las que aparecen por
+# primera vez en él y los registros solo llevan sus ids. Los valores se repiten
+# mucho en una flota (os_version, firmware_hash...), así que cada entrada ocupa
+# poco más que su HIS.
+#
+# El lector abre el fichero con mmap y solo recorre las cabeceras de los bloques
+# (y sus cadenas nuevas). Para buscar un dispositivo se hace una búsqueda binaria
+# en la lista de dispositivos de cada bloque directamente sobre el mmap, y solo
+# se descomprimen los bloques que lo contienen y están en el intervalo de tiempo.
+# Todo es little endian.
+
+MAGIA = b"HISLOG1\x00"
+MARCA_BLOQUE = b"BLQ1"
+_CABECERA = struct.Struct("<8sI")
+# marca, registros, dispositivos, bytes del diccionario, bytes de los registros,
+# marca mínima, marca máxima, CRC32 de todo lo que sigue a la cabecera del bloque
+_BLOQUE = struct.Struct("<4sIIIIqqI")
+_U32 = struct.Struct("<I")
+TAMANO_HIS = 32
+
+# Registros por bloque y nivel de zlib por defecto. Con los registros traspuestos
+# el nivel 1 comprime prácticamente igual que el 6 y es bastante más rápido.
+REGISTROS_POR_BLOQUE = 4096
+NIVEL_COMPRESION = 1
+
+
+class FormatoHistorialError(ValueError):
+    pass
+
+
+def _estructura_registro(n_atributos):
+    return struct.Struct(f"<qI{TAMANO_HIS}s{n_atributos}I")
+
+
+def _digest(his):
+    digest = bytes.fromhex(his) if isinstance(his, str) else bytes(his)
+    if len(digest) != TAMANO_HIS:
+        raise ValueError(f"Un HIS tiene {TAMANO_HIS} bytes, no {len(digest)}")
+    return digest
+
+
+# Trasposición por bytes de 'datos', formado por registros de 'tamano' bytes, y su inversa
+def _trasponer(datos, tamano):
+    return b"".join(datos[j::tamano] for j in range(tamano))
+
+
+def _destrasponer(datos, tamano):
+    n = len(datos) // tamano
+    registros = bytearray(len(datos))
+    for j in range(tamano):
+        registros[j::tamano] = datos[j * n:(j + 1) * n]
+    return registros
+
+
+def _empaquetar_cadenas(cadenas):
+    partes = []
+    for cadena in cadenas:
+        datos = cadena.encode("utf-8")
+        partes += (_U32.pack(len(datos)), datos)
+    return b"".join(partes)
+
+
+def _desempaquetar_cadenas(datos):
+    cadenas = []
+    i = 0
+    while i < len(datos):
+        n = _U32.unpack_from(datos, i)[0]
+        cadenas.append(datos[i + 4:i + 4 + n].decode("utf-8"))
+        i += 4 + n
+    return cadenas
+
+
+# =============================
+# LECTURA
+# =============================
+
+class LectorHistorial:
+    """
+    Lector de solo lectura sobre el mmap del fichero. Abrirlo solo cuesta
+    recorrer las cabeceras de los bloques; un bloque a medio escribir al
+    final (p. ej. por un corte de luz) se ignora, y un fichero vacío o con
+    la cabecera a medias se lee como un historial vacío.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._archivo = open(ruta, "rb")
+        tamano = os.fstat(self._archivo.fileno()).st_size
+        self._mm = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ) if tamano else b""
+        try:
+            self._leer_estructura()
+        except Exception:
+            self.cerrar()
+            raise
+
+    def _leer_estructura(self):
+        mm = self._mm
+        self.bloques = []
+        self.cadenas = []
+        self.registros = 0
+        self.fin_valido = 0
+        self._ids = None
+        if bytes(mm[:len(MAGIA)]) != MAGIA[:len(mm)]:
+            raise FormatoHistorialError(f"{self.ruta}: no es un historial de HIS")
+        longitud = _CABECERA.unpack_from(mm, 0)[1] if len(mm) >= _CABECERA.size else 0
+        if len(mm) < _CABECERA.size or len(mm) < _CABECERA.size + longitud:
+            # Cabecera a medias (el escritor se cortó al crear el fichero)
+            self.atributos = ()
+            self._registro = _estructura_registro(0)
+            return
+        nombres = bytes(mm[_CABECERA.size:_CABECERA.size + longitud]).decode("utf-8")
+        self.atributos = tuple(nombres.split("\n")) if nombres else ()
+        self._registro = _estructura_registro(len(self.atributos))
+
+        # Cada bloque: (inicio de los dispositivos, nº dispositivos, inicio y
+        # longitud de los registros comprimidos, registros, marca mínima, máxima)
+        posicion = _CABECERA.size + longitud
+        while posicion + _BLOQUE.size <= len(mm):
+            marca, n, n_disp, len_dic, len_reg, minima, maxima, crc = _BLOQUE.unpack_from(mm, posicion)
+            inicio = posicion + _BLOQUE.size
+            fin = inicio + 4 * n_disp + len_dic + len_reg
+            if marca != MARCA_BLOQUE or fin > len(mm):
+                break
+            # Solo se comprueba entero el último bloque, el único que puede estar a medias
+            if fin + _BLOQUE.size > len(mm) and zlib.crc32(mm[inicio:fin]) != crc:
+                break
+            dic = inicio + 4 * n_disp
+            self.cadenas += _desempaquetar_cadenas(zlib.decompress(mm[dic:dic + len_dic]))
+            self.bloques.append((inicio, n_disp, dic + len_dic, len_reg, n, minima, maxima))
+            self.registros += n
+            posicion = fin
+        # Hasta aquí el fichero es válido; el escritor trunca lo que sobre
+        self.fin_valido = posicion
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+        return False
+
+    def cerrar(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._mm = b""
+        self._archivo.close()
+
+    def __len__(self):
+        return self.registros
+
+    # Id de una cadena del diccionario (o None si no aparece en el historial)
+    def id_cadena(self, cadena):
+        if self._ids is None:
+            self._ids = {c: i for i, c in enumerate(self.cadenas)}
+        return self._ids.get(cadena)
+
+    # Búsqueda binaria del id en la lista ordenada de dispositivos del bloque
+    def _contiene(self, bloque, id_disp):
+        inicio, n_disp = bloque[0], bloque[1]
+        lo, hi = 0, n_disp
+        while lo < hi:
+            medio = (lo + hi) // 2
+            if _U32.unpack_from(self._mm, inicio + 4 * medio)[0] < id_disp:
+                lo = medio + 1
+            else:
+                hi = medio
+        return lo < n_disp and _U32.unpack_from(self._mm, inicio + 4 * lo)[0] == id_disp
+
+    # Bloques que pueden tener registros del dispositivo en el intervalo [desde, hasta]
+    def _bloques(self, id_disp=None, desde=None, hasta=None):
+        for bloque in self.bloques:
+            if desde is not None and bloque[6] < desde:
+                continue
+            if hasta is not None and bloque[5] > hasta:
+                continue
+            if id_disp is not None and not self._contiene(bloque, id_disp):
+                continue
+            yield bloque
+
+    def _registros(self, bloque):
+        inicio, longitud = bloque[2], bloque[3]
+        datos = _destrasponer(zlib.decompress(self._mm[inicio:inicio + longitud]), self._registro.size)
+        return self._registro.iter_unpack(datos)
+
+    # Registros sin decodificar: (marca, id del dispositivo, HIS en binario, ids de los valores...)
+    def recorrer_registros(self, dispositivo=None, desde=None, hasta=None):
+        id_disp = None
+        if dispositivo is not None:
+            id_disp = self.id_cadena(dispositivo)
+            if id_disp is None:
+                return
+        for bloque in self._bloques(id_disp, desde, hasta):
+            for registro in self._registros(bloque):
+                if id_disp is not None and registro[1] != id_disp:
+                    continue
+                if (desde is not None and registro[0] < desde) or (hasta is not None and registro[0] > hasta):
+                    continue
+                yield registro
+
+    # Entradas (marca, dispositivo, HIS en hex, {atributo: valor}) en orden de escritura,
+    # opcionalmente de un solo dispositivo y entre dos marcas de tiempo (ms, incluidas)
+    def recorrer(self, dispositivo=None, desde=None, hasta=None):
+        cadenas = self.cadenas
+        atributos = self.atributos
+        for registro in self.recorrer_registros(dispositivo, desde, hasta):
+            yield (registro[0], cadenas[registro[1]], registro[2].hex().upper(),
+                   dict(zip(atributos, [cadenas[i] for i in registro[3:]])))
+
+    # Última entrada escrita del dispositivo (o None)
+    def ultima(self, dispositivo):
+        id_disp = self.id_cadena(dispositivo)
+        if id_disp is None:
+            return None
+        for bloque in reversed(list(self._bloques(id_disp))):
+            for registro in reversed(list(self._registros(bloque))):
+                if registro[1] == id_disp:
+                    return (registro[0], dispositivo, registro[2].hex().upper(),
+                            dict(zip(self.atributos, [self.cadenas[i] for i in registro[3:]])))
+        return None
+
+
+# =============================
+# ESCRITURA
+# =============================
+
+class EscritorHistorial:
+    """
+    Añade entradas al historial. Se acumulan en memoria y se escriben por
+    bloques de 'registros_por_bloque'; cerrar() (o vaciar()) escribe el
+    último bloque. Si el fichero ya existe se sigue añadiendo a él, con los
+    mismos atributos y el mismo diccionario.
+    """
+
+    def __init__(self, ruta, atributos=None, registros_por_bloque=REGISTROS_POR_BLOQUE,
+                 nivel=NIVEL_COMPRESION):
+        self.ruta = ruta
+        self.registros_por_bloque = registros_por_bloque
+        self.nivel = nivel
+
+        # fin = 0 si el fichero no existe, está vacío o tiene la cabecera a medias
+        fin = 0
+        if os.path.exists(ruta):
+            with LectorHistorial(ruta) as lector:
+                existentes, cadenas, fin = lector.atributos, lector.cadenas, lector.fin_valido
+        if fin:
+            if atributos is not None and tuple(atributos) != existentes:
+                raise FormatoHistorialError(f"{ruta}: el historial tiene otros atributos ({', '.join(existentes)})")
+            self.atributos = existentes
+            self._ids = {c: i for i, c in enumerate(cadenas)}
+            self._archivo = open(ruta, "r+b")
+            # Se descarta un bloque que hubiera quedado a medias
+            self._archivo.truncate(fin)
+            self._archivo.seek(fin)
+        else:
+            if atributos is None:
+                from normalizacion import plan_normalizacion
+                atributos = [attr for attr, _ in plan_normalizacion()]
+            self.atributos = tuple(atributos)
+            self._ids = {}
+            nombres = "\n".join(self.atributos).encode("utf-8")
+            self._archivo = open(ruta, "wb")
+            self._archivo.write(_CABECERA.pack(MAGIA, len(nombres)) + nombres)
+            # La cabecera se escribe ya, no con el primer bloque
+            self._archivo.flush()
+
+        self._registro = _estructura_registro(len(self.atributos))
+        self._pendientes = []
+        self._nuevas = []
+        self._dispositivos = set()
+        self._minima = self._maxima = None
+        self.escritos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+        return False
+
+    def _id(self, cadena):
+        cadena = str(cadena)
+        i = self._ids.get(cadena)
+        if i is None:
+            i = self._ids[cadena] = len(self._ids)
+            self._nuevas.append(cadena)
+        return i
+
+    # Añade una entrada. 'marca' en milisegundos (por defecto, ahora)
+    def anadir(self, dispositivo, his, normalizados, marca=None):
+        if marca is None:
+            marca = int(time.time() * 1000)
+        ids = self._ids
+        obtener = normalizados.get
+        valores = [ids.get(obtener(attr, "")) for attr in self.atributos]
+        if None in valores:
+            valores = [self._id(obtener(attr, "")) if i is None else i for attr, i in zip(self.atributos, valores)]
+        id_disp = ids.get(dispositivo)
+        if id_disp is None:
+            id_disp = self._id(dispositivo)
+        if type(his) is not bytes or len(his) != TAMANO_HIS:
+            his = _digest(his)
+
+        self._pendientes.append(self._registro.pack(marca, id_disp, his, *valores))
+        self._dispositivos.add(id_disp)
+        if self._minima is None:
+            self._minima = self._maxima = marca
+        elif marca < self._minima:
+            self._minima = marca
+        elif marca > self._maxima:
+            self._maxima = marca
+        if len(self._pendientes) >= self.registros_por_bloque:
+            self.vaciar()
+
+    # Escribe las entradas pendientes como un bloque
+    def vaciar(self):
+        if not self._pendientes:
+            return
+        ids_disp = sorted(self._dispositivos)
+        cuerpo = (struct.pack(f"<{len(ids_disp)}I", *ids_disp)
+                  + zlib.compress(_empaquetar_cadenas(self._nuevas), self.nivel))
+        len_dic = len(cuerpo) - 4 * len(ids_disp)
+        comprimidos = zlib.compress(_trasponer(b"".join(self._pendientes), self._registro.size), self.nivel)
+        cuerpo += comprimidos
+
+        self._archivo.write(_BLOQUE.pack(MARCA_BLOQUE, len(self._pendientes), len(ids_disp), len_dic,
+                                         len(comprimidos), self._minima, self._maxima, zlib.crc32(cuerpo)))
+        self._archivo.write(cuerpo)
+        self._archivo.flush()
+        self.escritos += len(self._pendientes)
+        self._pendientes = []
+        self._nuevas = []
+        self._dispositivos = set()
+        self._minima = self._maxima = None
+
+    def cerrar(self):
+        if self._archivo.closed:
+            return
+        self.vaciar()
+        self._archivo.close()
+
+
+# =============================
+# BANCO DE PRUEBAS
+# =============================
+
+# Flota sintética: cada dispositivo tiene sus atributos y unas pocas versiones
+# de SO y de firmware compartidas con el resto, que cambian de vez en cuando
+def entradas_sinteticas(n, dispositivos=100_000, semilla=0):
+    import random
+    from normalizacion import plan_normalizacion, calcular_his_v2
+
+    aleatorio = random.Random(semilla)
+    atributos = [attr for attr, _ in plan_normalizacion()]
+    versiones = [f"10-0.{26000 + i}" for i in range(20)]
+    firmwares = [aleatorio.randbytes(32).hex().upper() for _ in range(50)]
+    marca = 1_700_000_000_000
+    for i in range(n):
+        d = i % dispositivos
+        normalizados = {
+            "cpu_id": f"BFEBFBFF{d:08X}",
+            "serial_number": f"NXA0MEB00A{d:012d}",
+            "mac_original": f"0A0027{d:06X}",
+            "firmware_hash": firmwares[(d + i // (dispositivos * 50)) % len(firmwares)],
+            "os_version": versiones[(d + i // (dispositivos * 10)) % len(versiones)],
+            "public_key_fingerprint": f"{d * 7919:064X}",
+            "software_inventory_hash": f"{(d * 104729 + i // (dispositivos * 5)):064X}",
+        }
+        normalizados = {attr: normalizados.get(attr, "") for attr in atributos}
+        yield f"disp-{d}", calcular_his_v2(normalizados), normalizados, marca + i
+
+
+# Escritura, tamaño, recorrido completo y búsqueda por dispositivo con 'n' entradas
+def ejecutar_benchmark(n=10_000_000, dispositivos=100_000, directorio=None, busquedas=20):
+    import json
+    import tempfile
+
+    directorio = directorio or tempfile.mkdtemp(prefix="bench_historial_")
+    ruta = os.path.join(directorio, "historial.bin")
+    entradas = list(entradas_sinteticas(min(n, 200_000), dispositivos))
+    # Una línea JSON por comprobación, que es lo que se guardaba hasta ahora
+    bytes_json = sum(len(json.dumps({"dispositivo": d, "marca": m, "his": h.hex().upper(), "atributos": a}))
+                     + 1 for d, h, a, m in entradas) / len(entradas)
+
+    try:
+        t0 = time.perf_counter()
+        with EscritorHistorial(ruta) as escritor:
+            for i in range(n):
+                d, h, a, m = entradas[i % len(entradas)]
+                escritor.anadir(d, h, a, m + i - i % len(entradas))
+        escritura = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        lector = LectorHistorial(ruta)
+        apertura = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        total = sum(1 for _ in lector.recorrer_registros())
+        recorrido = time.perf_counter() - t0
+        assert total == n
+
+        t0 = time.perf_counter()
+        for k in range(busquedas):
+            lector.ultima(f"disp-{(k * 7919) % dispositivos}")
+        busqueda = (time.perf_counter() - t0) / busquedas
+        lector.cerrar()
+
+        tamano = os.path.getsize(ruta)
+        return {
+            "entradas": n,
+            "escritura_s": n / escritura,
+            "bytes_por_entrada": tamano / n,
+            "bytes_por_entrada_json": bytes_json,
+            "apertura_ms": apertura * 1000,
+            "recorrido_s": n / recorrido,
+            "ultima_ms": busqueda * 1000,
+        }
+    finally:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Historial binario de HIS")
+    sub = parser.add_subparsers(dest="orden", required=True)
+
+    p = sub.add_parser("ver", help="Muestra las entradas (de un dispositivo y/o intervalo)")
+    p.add_argument("historial")
+    p.add_argument("--dispositivo")
+    p.add_argument("--desde", type=int, help="Marca mínima (ms)")
+    p.add_argument("--hasta", type=int, help="Marca máxima (ms)")
+
+    p = sub.add_parser("benchmark", help="Mide escritura, tamaño y lectura con entradas sintéticas")
+    p.add_argument("--n", type=int, default=10_000_000)
+    p.add_argument("--dispositivos", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    if args.orden == "ver":
+        with LectorHistorial(args.historial) as lector:
+            for marca, dispositivo, his, normalizados in lector.recorrer(args.dispositivo, args.desde, args.hasta):
+                valores = " ".join(f"{k}={v}" for k, v in normalizados.items())
+                print(f"{marca} {dispositivo} {his} {valores}")
+        return 0
+
+    r = ejecutar_benchmark(args.n, args.dispositivos)
+    print(f"{r['entradas']} entradas: {r['bytes_por_entrada']:.1f} bytes/entrada "
+          f"(JSON: {r['bytes_por_entrada_json']:.0f})")
+    print(f"escritura: {r['escritura_s']:.0f} entradas/s, recorrido: {r['recorrido_s']:.0f} entradas/s")
+    print(f"apertura: {r['apertura_ms']:.1f} ms, última entrada de un dispositivo: {r['ultima_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
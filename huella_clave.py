@@ -0,0 +1,221 @@
+import os
+import sys
+import mmap
+import base64
+import hashlib
+import binascii
+from collections import OrderedDict
+
+# ==================================================
+# HUELLA DE CLAVES PÚBLICAS
+# ==================================================
+
+# Modos de huella:
+# - "bruto": SHA-256 de los bytes del fichero, como siempre (es lo que se enrola)
+# - "spki":  SHA-256 del DER SubjectPublicKeyInfo, igual aunque cambie el formato
+#            del PEM (saltos de línea, CRLF, texto alrededor...) o sea un DER
+MODO_BRUTO = "bruto"
+MODO_SPKI = "spki"
+
+# Variables de entorno para cambiar la ruta de la clave y el modo de huella
+VARIABLE_RUTA = "IOTZT_CLAVE_PUBLICA"
+VARIABLE_MODO = "IOTZT_HUELLA_MODO"
+
+# Ficheros a partir de este tamaño se hashean sobre un mmap en lugar de leerlos
+UMBRAL_MMAP = 1 << 20
+
+# Entradas de la caché en memoria
+MAX_CACHE = 4096
+
+_INICIO_PEM = b"-----BEGIN PUBLIC KEY-----"
+_FIN_PEM = b"-----END PUBLIC KEY-----"
+
+
+class ErrorClave(ValueError):
+    pass
+
+
+# Ruta de la clave pública: la de la variable de entorno o la de siempre
+def ruta_clave_publica(ruta_por_defecto):
+    return os.environ.get(VARIABLE_RUTA) or ruta_por_defecto
+
+
+def modo_por_defecto():
+    return os.environ.get(VARIABLE_MODO) or MODO_BRUTO
+
+
+# =============================
+# CÁLCULO
+# =============================
+
+# SHA-256 del contenido del fichero; los grandes se recorren con mmap sin copiarlos
+def _sha256_archivo(archivo, tamano):
+    if tamano >= UMBRAL_MMAP:
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+    return hashlib.sha256(archivo.read()).hexdigest()
+
+
+# DER SubjectPublicKeyInfo de una clave en PEM o DER. El PEM estándar se decodifica
+# directamente; el DER y otros formatos (PKCS#1, OpenSSH) se analizan con cryptography.
+def spki_der(datos):
+    inicio = datos.find(_INICIO_PEM)
+    if inicio >= 0:
+        fin = datos.find(_FIN_PEM, inicio)
+        if fin < 0:
+            raise ErrorClave("PEM sin línea END")
+        try:
+            return base64.b64decode(b"".join(datos[inicio + len(_INICIO_PEM):fin].split()), validate=True)
+        except binascii.Error as e:
+            raise ErrorClave(f"PEM con base64 no válido: {e}")
+
+    from cryptography.hazmat.primitives import serialization
+    # Solo se acepta como DER lo que cryptography analiza como clave pública:
+    # un fichero de texto que empiece por '0' (0x30) no es DER
+    try:
+        clave = serialization.load_der_public_key(bytes(datos))
+    except (ValueError, TypeError):
+        clave = None
+    if clave is not None:
+        return clave.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+
+    try:
+        if datos.lstrip().startswith(b"-----BEGIN"):
+            clave = serialization.load_pem_public_key(bytes(datos))
+        else:
+            clave = serialization.load_ssh_public_key(bytes(datos).strip())
+    except (ValueError, TypeError) as e:
+        raise ErrorClave(str(e))
+    return clave.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+
+
+# Huella sin caché
+def calcular_huella(ruta, modo=MODO_BRUTO):
+    with open(ruta, "rb") as archivo:
+        if modo == MODO_BRUTO:
+            return _sha256_archivo(archivo, os.fstat(archivo.fileno()).st_size)
+        if modo == MODO_SPKI:
+            return hashlib.sha256(spki_der(archivo.read())).hexdigest()
+    raise ValueError(f"Modo de huella desconocido: {modo}")
+
+
+# =============================
+# CACHÉ
+# =============================
+
+class CacheHuellas:
+    """
+    Huellas ya calculadas, indexadas por (ruta, inodo, tamaño, fecha de
+    modificación, modo): si el fichero se reemplaza o se modifica cambia la
+    clave y se vuelve a calcular.
+    """
+
+    def __init__(self, maximo=MAX_CACHE):
+        self.maximo = maximo
+        self.entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def huella(self, ruta, modo=MODO_BRUTO):
+        st = os.stat(ruta)
+        clave = (os.path.abspath(ruta), st.st_ino, st.st_size, st.st_mtime_ns, modo)
+        huella = self.entradas.get(clave)
+        if huella is not None:
+            self.entradas.move_to_end(clave)
+            self.aciertos += 1
+            return huella
+
+        self.fallos += 1
+        huella = calcular_huella(ruta, modo)
+        self.entradas[clave] = huella
+        if len(self.entradas) > self.maximo:
+            self.entradas.popitem(last=False)
+        return huella
+
+    def vaciar(self):
+        self.entradas.clear()
+
+
+_CACHE = CacheHuellas()
+
+
+# Huella de la clave pública del dispositivo con los valores de reserva de los colectores
+def huella_clave_publica(ruta, modo=None, cache=_CACHE):
+    if not os.path.exists(ruta):
+        return "CLAVE_PUBLICA_NO_EXISTE"
+    try:
+        return cache.huella(ruta, modo or modo_por_defecto())
+    except Exception:
+        return "ERROR_AL_LEER_CLAVE"
+
+
+# =============================
+# DIRECTORIOS DE CLAVES
+# =============================
+
+# Ficheros de clave bajo 'directorio' (recursivo), con las extensiones indicadas
+def buscar_claves(directorio, extensiones=(".pub", ".pem", ".der")):
+    encontrados = []
+    for actual, _, archivos in os.walk(directorio):
+        for nombre in archivos:
+            if nombre.lower().endswith(extensiones):
+                encontrados.append(os.path.join(actual, nombre))
+    encontrados.sort()
+    return encontrados
+
+
+def _huellas_bloque(trabajo):
+    rutas, modo = trabajo
+    resultado = []
+    for ruta in rutas:
+        try:
+            resultado.append((ruta, calcular_huella(ruta, modo), None))
+        except Exception as e:
+            resultado.append((ruta, None, str(e)))
+    return resultado
+
+
+# Huella de todas las claves de un directorio repartidas entre 'procesos' procesos.
+# Devuelve [(ruta, huella o None, error o None)] en orden de ruta.
+def huellas_directorio(directorio, modo=MODO_BRUTO, procesos=1, tamano_bloque=256,
+                       extensiones=(".pub", ".pem", ".der")):
+    from lotes import trocear
+    from concurrent.futures import ProcessPoolExecutor
+
+    rutas = buscar_claves(directorio, extensiones)
+    trabajos = [(bloque, modo) for bloque in trocear(rutas, tamano_bloque)]
+    if procesos <= 1 or len(trabajos) <= 1:
+        return [fila for trabajo in trabajos for fila in _huellas_bloque(trabajo)]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return [fila for bloque in pool.map(_huellas_bloque, trabajos) for fila in bloque]
+
+
+def main(argv=None):
+    import csv
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Huellas de un directorio de claves públicas para el enrolamiento")
+    parser.add_argument("directorio")
+    parser.add_argument("--modo", choices=(MODO_BRUTO, MODO_SPKI), default=MODO_BRUTO)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--salida", default="-", help="CSV de salida ('-' para stdout)")
+    args = parser.parse_args(argv)
+
+    filas = huellas_directorio(args.directorio, args.modo, args.procesos)
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8", newline="")
+    try:
+        escritor = csv.writer(salida)
+        escritor.writerow(("clave", "huella_sha256", "error"))
+        for ruta, huella, error in filas:
+            escritor.writerow((os.path.relpath(ruta, args.directorio), huella or "", error or ""))
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+    errores = sum(1 for _, huella, _ in filas if huella is None)
+    print(f"{len(filas) - errores} huellas, {errores} errores", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import sys
+import time
+import argparse
+
+from normalizacion import ATTRIBUTE_POLICY, normalizar_atributos
+
+# ==================================================
+# ÍNDICE INVERTIDO POR ATRIBUTO PARA REIDENTIFICAR DISPOSITIVOS
+# ==================================================
+
+# Cuando el HIS de un dispositivo deja de coincidir (actualización del SO, cambio
+# de tarjeta de red...), se buscan los dispositivos enrolados que comparten al
+# menos k de sus atributos normalizados sin recorrer todo el registro.
+
+# Peso de cada atributo al puntuar candidatos. Los identificadores de hardware
+# y la clave pesan más que lo que cambia con frecuencia o comparten muchos equipos.
+PESOS_POR_DEFECTO = {
+    "cpu_id": 2.0,
+    "serial_number": 3.0,
+    "mac_original": 2.0,
+    "firmware_hash": 1.0,
+    "os_version": 0.5,
+    "public_key_fingerprint": 3.0,
+    "software_inventory_hash": 1.0,
+}
+
+# Valores compartidos por más dispositivos que esto no se usan para buscar
+# candidatos (sí para puntuarlos): p. ej. la misma versión del SO en miles de equipos
+MAX_FRECUENCIA = 1000
+
+
+class IndiceAtributos:
+    """
+    Índice {atributo: {valor normalizado: dispositivos}} con altas y bajas
+    incrementales. Internamente cada dispositivo es un entero y los valores
+    que solo tiene un dispositivo se guardan como ese entero en lugar de un set,
+    que es el caso habitual en cpu_id, serial_number, MAC o clave pública.
+    """
+
+    def __init__(self, pesos=None, max_frecuencia=MAX_FRECUENCIA, atributos=None):
+        self.atributos = tuple(atributos or ATTRIBUTE_POLICY)
+        self.pesos = dict(PESOS_POR_DEFECTO if pesos is None else pesos)
+        self.max_frecuencia = max_frecuencia
+        self._indice = {attr: {} for attr in self.atributos}
+        # Identificador externo <-> entero interno
+        self._internos = {}
+        self._externos = []
+        self._libres = []
+        # Valores de cada dispositivo (tupla en el orden de self.atributos)
+        self._valores = []
+
+    def __len__(self):
+        return len(self._internos)
+
+    def __contains__(self, dispositivo):
+        return dispositivo in self._internos
+
+    # Da de alta (o actualiza) un dispositivo con sus atributos normalizados
+    def insertar(self, dispositivo, normalizados):
+        if dispositivo in self._internos:
+            self.eliminar(dispositivo)
+
+        valores = tuple(str(normalizados.get(attr, "")) for attr in self.atributos)
+        if self._libres:
+            interno = self._libres.pop()
+            self._externos[interno] = dispositivo
+            self._valores[interno] = valores
+        else:
+            interno = len(self._externos)
+            self._externos.append(dispositivo)
+            self._valores.append(valores)
+        self._internos[dispositivo] = interno
+
+        for attr, valor in zip(self.atributos, valores):
+            if not valor:
+                continue
+            entradas = self._indice[attr]
+            actual = entradas.get(valor)
+            if actual is None:
+                entradas[valor] = interno
+            elif isinstance(actual, int):
+                entradas[valor] = {actual, interno}
+            else:
+                actual.add(interno)
+
+    # Da de alta un dispositivo a partir de sus atributos en crudo
+    def insertar_raw(self, dispositivo, raw):
+        self.insertar(dispositivo, normalizar_atributos(raw))
+
+    def eliminar(self, dispositivo):
+        interno = self._internos.pop(dispositivo, None)
+        if interno is None:
+            return False
+        for attr, valor in zip(self.atributos, self._valores[interno]):
+            if not valor:
+                continue
+            entradas = self._indice[attr]
+            actual = entradas.get(valor)
+            if isinstance(actual, int):
+                del entradas[valor]
+            else:
+                actual.discard(interno)
+                if len(actual) == 1:
+                    entradas[valor] = actual.pop()
+        self._externos[interno] = None
+        self._valores[interno] = None
+        self._libres.append(interno)
+        return True
+
+    # Número de dispositivos con ese valor del atributo
+    def frecuencia(self, attr, valor):
+        actual = self._indice[attr].get(valor)
+        if actual is None:
+            return 0
+        return 1 if isinstance(actual, int) else len(actual)
+
+    # Dispositivos que comparten al menos 'minimo' atributos con 'normalizados',
+    # ordenados por la suma de los pesos de los atributos coincidentes.
+    # Devuelve [(dispositivo, puntuación, [atributos coincidentes])].
+    def candidatos(self, normalizados, minimo=1, limite=10):
+        valores = [(j, attr, str(normalizados.get(attr, ""))) for j, attr in enumerate(self.atributos)]
+
+        # 1) Candidatos a partir de los valores poco frecuentes
+        coincidencias = {}
+        frecuentes = []
+        for j, attr, valor in valores:
+            if not valor or self.pesos.get(attr, 1.0) <= 0:
+                continue
+            actual = self._indice[attr].get(valor)
+            if actual is None:
+                continue
+            if isinstance(actual, int):
+                coincidencias.setdefault(actual, []).append(j)
+            elif len(actual) > self.max_frecuencia:
+                frecuentes.append((j, valor))
+            else:
+                for interno in actual:
+                    coincidencias.setdefault(interno, []).append(j)
+
+        # 2) Los valores frecuentes se comprueban directamente en cada candidato
+        if frecuentes:
+            for interno, atributos in coincidencias.items():
+                propios = self._valores[interno]
+                atributos.extend(j for j, valor in frecuentes if propios[j] == valor)
+
+        resultado = []
+        for interno, atributos in coincidencias.items():
+            if len(atributos) < minimo:
+                continue
+            nombres = sorted(self.atributos[j] for j in atributos)
+            puntuacion = sum(self.pesos.get(attr, 1.0) for attr in nombres)
+            resultado.append((self._externos[interno], puntuacion, nombres))
+        resultado.sort(key=lambda c: (-c[1], str(c[0])))
+        return resultado[:limite] if limite else resultado
+
+    def estadisticas(self):
+        return {
+            "dispositivos": len(self),
+            "valores_distintos": {attr: len(entradas) for attr, entradas in self._indice.items()},
+        }
+
+
+# =============================
+# BANCO DE PRUEBAS
+# =============================
+
+# Construye un índice con 'n' dispositivos sintéticos y mide cuánto cuesta
+# reidentificar dispositivos a los que les ha cambiado la MAC y la versión del SO,
+# comparado con recorrer todos los registros
+def ejecutar_benchmark(n=100_000, consultas=1000, lineal=True):
+    from lotes import registros_sinteticos
+
+    normalizados = [normalizar_atributos(r) for r in registros_sinteticos(n)]
+    indice = IndiceAtributos()
+    t0 = time.perf_counter()
+    for i, norm in enumerate(normalizados):
+        indice.insertar(f"disp-{i}", norm)
+    construccion = time.perf_counter() - t0
+
+    paso = max(n // consultas, 1)
+    derivados = [dict(normalizados[i], mac_original="000000000001", os_version="10-0.99999")
+                 for i in range(0, n, paso)][:consultas]
+
+    t0 = time.perf_counter()
+    aciertos = 0
+    for k, norm in enumerate(derivados):
+        mejores = indice.candidatos(norm, minimo=4, limite=1)
+        aciertos += bool(mejores) and mejores[0][0] == f"disp-{k * paso}"
+    segundos_indice = time.perf_counter() - t0
+
+    resultado = {
+        "dispositivos": n,
+        "construccion_s": construccion,
+        "consultas_s_indice": len(derivados) / segundos_indice,
+        "aciertos": aciertos / len(derivados),
+    }
+
+    if lineal:
+        # Recorrido completo, con pocas consultas para no eternizarse
+        muestra = derivados[:20]
+        t0 = time.perf_counter()
+        for norm in muestra:
+            max(range(n), key=lambda i: sum(normalizados[i][a] == v for a, v in norm.items()))
+        resultado["consultas_s_lineal"] = len(muestra) / (time.perf_counter() - t0)
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banco de pruebas del índice por atributo")
+    parser.add_argument("--n", type=int, default=100_000)
+    args = parser.parse_args()
+    r = ejecutar_benchmark(args.n)
+    print(f"{r['dispositivos']} dispositivos indexados en {r['construccion_s']:.2f} s")
+    print(f"reidentificación: {r['consultas_s_indice']:.0f} consultas/s con el índice, "
+          f"{r['consultas_s_lineal']:.1f} consultas/s recorriendo todo ({r['aciertos'] * 100:.0f} % aciertos)")
+    sys.exit(0)
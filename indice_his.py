@@ -0,0 +1,349 @@
+import os
+import sys
+import mmap
+import time
+import heapq
+import struct
+import shutil
+import argparse
+import tempfile
+
+# ==================================================
+# ÍNDICE BINARIO DE HIS ENROLADOS
+# ==================================================
+
+# Formato del fichero:
+#   cabecera (16 bytes): MAGIA (8 bytes) + número de HIS (uint64, little endian)
+#   registros: HIS en binario (32 bytes cada uno), ordenados y sin repetir
+#
+# Se abre con mmap, así que abrirlo no depende del tamaño, las búsquedas leen
+# directamente de las páginas del fichero y varios procesos que abren el mismo
+# índice comparten esas páginas en la caché del sistema.
+
+MAGIA = b"HISIDX1\x00"
+_CABECERA = struct.Struct("<8sQ")
+TAMANO_CABECERA = _CABECERA.size
+TAMANO_HIS = 32
+
+# Primeros 8 bytes del HIS como entero (la búsqueda por interpolación se hace sobre ellos)
+_PREFIJO = struct.Struct(">Q").unpack_from
+
+# Pasos de interpolación seguidos sin reducir el intervalo a la mitad antes de bisecar
+PASOS_SIN_BISECCION = 3
+
+# HIS que se ordenan en memoria antes de volcar cada tramo a disco (32 MB)
+TAMANO_TRAMO = 1_000_000
+
+
+class FormatoIndiceError(ValueError):
+    pass
+
+
+# HIS (64 caracteres hex, como devuelve calcular_his) o digest de 32 bytes -> 32 bytes
+def a_binario(his):
+    if isinstance(his, str):
+        digest = bytes.fromhex(his)
+    else:
+        digest = bytes(his)
+    if len(digest) != TAMANO_HIS:
+        raise ValueError(f"Un HIS tiene {TAMANO_HIS} bytes, no {len(digest)}")
+    return digest
+
+
+# =============================
+# LECTURA
+# =============================
+
+class IndiceHIS:
+    """
+    Índice de solo lectura sobre un fichero creado con construir_indice.
+    Admite 'his in indice' con el HIS en hexadecimal o en binario.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "rb") as archivo:
+            # mmap no admite ficheros vacíos: se comprueba el tamaño antes de mapear
+            if os.fstat(archivo.fileno()).st_size < TAMANO_CABECERA:
+                raise FormatoIndiceError(f"{ruta}: fichero demasiado corto")
+            self._mm = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, n = _CABECERA.unpack_from(self._mm, 0)
+        if magia != MAGIA or len(self._mm) != TAMANO_CABECERA + n * TAMANO_HIS:
+            self._mm.close()
+            raise FormatoIndiceError(f"{ruta}: no es un índice de HIS válido")
+        self._n = n
+        self._vista = memoryview(self._mm)
+
+    # Entre procesos se pasa la ruta y cada uno abre su propio mmap
+    def __reduce__(self):
+        return (IndiceHIS, (self.ruta,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+        return False
+
+    def cerrar(self):
+        if self._vista is not None:
+            self._vista.release()
+            self._vista = None
+            self._mm.close()
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, his):
+        try:
+            return self.posicion(his) >= 0
+        except ValueError:
+            return False
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self.digest(i).hex().upper()
+
+    # Digest i-ésimo (copia de 32 bytes)
+    def digest(self, i):
+        inicio = TAMANO_CABECERA + i * TAMANO_HIS
+        return self._mm[inicio:inicio + TAMANO_HIS]
+
+    def _prefijo(self, i):
+        return _PREFIJO(self._mm, TAMANO_CABECERA + i * TAMANO_HIS)[0]
+
+    # Primera posición cuyo prefijo es >= clave. Los HIS son uniformes, así que
+    # la interpolación llega en unos 7 accesos con un millón de HIS. Si varios
+    # pasos seguidos no reducen el intervalo a la mitad se hace uno de bisección,
+    # para que datos no uniformes no degraden la búsqueda a lineal.
+    def _primera_posicion(self, clave):
+        if self._n == 0:
+            return 0
+        lo, hi = 0, self._n - 1
+        p_lo, p_hi = self._prefijo(lo), self._prefijo(hi)
+        if clave <= p_lo:
+            return 0
+        if clave > p_hi:
+            return self._n
+        # Invariante: p_lo < clave <= p_hi, la respuesta está en (lo, hi]
+        lentos = 0
+        while hi - lo > 1:
+            anterior = hi - lo
+            if lentos < PASOS_SIN_BISECCION:
+                medio = lo + (clave - p_lo) * anterior // (p_hi - p_lo)
+                medio = min(max(medio, lo + 1), hi - 1)
+            else:
+                medio = (lo + hi) // 2
+            p_medio = self._prefijo(medio)
+            if p_medio < clave:
+                lo, p_lo = medio, p_medio
+            else:
+                hi, p_hi = medio, p_medio
+            lentos = lentos + 1 if (hi - lo) * 2 > anterior else 0
+        return hi
+
+    # Posición del HIS en el índice o -1 si no está. La comparación se hace
+    # sobre la vista del mmap, sin copiar los registros.
+    def posicion(self, his):
+        digest = a_binario(his)
+        clave = _PREFIJO(digest)[0]
+        i = self._primera_posicion(clave)
+        vista = self._vista
+        while i < self._n and self._prefijo(i) == clave:
+            inicio = TAMANO_CABECERA + i * TAMANO_HIS
+            if vista[inicio:inicio + TAMANO_HIS] == digest:
+                return i
+            i += 1
+        return -1
+
+
+# =============================
+# CONSTRUCCIÓN
+# =============================
+
+def _escribir_tramo(digests, directorio, numero):
+    digests.sort()
+    ruta = os.path.join(directorio, f"tramo_{numero:05d}.bin")
+    with open(ruta, "wb") as archivo:
+        archivo.write(b"".join(digests))
+    return ruta
+
+
+def _leer_tramo(ruta, registros_por_lectura=4096):
+    with open(ruta, "rb") as archivo:
+        while True:
+            bloque = archivo.read(TAMANO_HIS * registros_por_lectura)
+            if not bloque:
+                return
+            for inicio in range(0, len(bloque), TAMANO_HIS):
+                yield bloque[inicio:inicio + TAMANO_HIS]
+
+
+# Crea el índice a partir de un iterable de HIS (hex o binario) de cualquier tamaño.
+# Se ordenan tramos de 'tamano_tramo' HIS en memoria, se vuelcan a disco y se
+# mezclan al final (ordenación externa), eliminando los repetidos.
+# Devuelve el número de HIS distintos.
+def construir_indice(his, ruta, tamano_tramo=TAMANO_TRAMO):
+    directorio = tempfile.mkdtemp(prefix="indice_his_", dir=os.path.dirname(os.path.abspath(ruta)))
+    try:
+        tramos = []
+        pendientes = []
+        for valor in his:
+            pendientes.append(a_binario(valor))
+            if len(pendientes) >= tamano_tramo:
+                tramos.append(_escribir_tramo(pendientes, directorio, len(tramos)))
+                pendientes = []
+
+        temporal = os.path.join(directorio, "indice.tmp")
+        n = 0
+        with open(temporal, "wb") as salida:
+            salida.write(_CABECERA.pack(MAGIA, 0))
+            if tramos:
+                if pendientes:
+                    tramos.append(_escribir_tramo(pendientes, directorio, len(tramos)))
+                ordenados = heapq.merge(*(_leer_tramo(t) for t in tramos))
+            else:
+                # Todo cabe en un tramo: no hace falta pasar por disco
+                pendientes.sort()
+                ordenados = pendientes
+
+            anterior = None
+            bufer = []
+            for digest in ordenados:
+                if digest == anterior:
+                    continue
+                anterior = digest
+                bufer.append(digest)
+                if len(bufer) >= 4096:
+                    salida.write(b"".join(bufer))
+                    n += len(bufer)
+                    bufer = []
+            salida.write(b"".join(bufer))
+            n += len(bufer)
+
+            salida.seek(0)
+            salida.write(_CABECERA.pack(MAGIA, n))
+
+        os.replace(temporal, ruta)
+        return n
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+# Lee un HIS por línea (se ignoran las líneas vacías)
+def leer_his(archivo):
+    for linea in archivo:
+        linea = linea.strip()
+        if linea:
+            yield linea
+
+
+# =============================
+# BANCO DE PRUEBAS
+# =============================
+
+# Compara el índice con un set de cadenas hex: memoria, tiempo de carga y búsquedas/s
+def ejecutar_benchmark(n=1_000_000, busquedas=200_000, directorio=None):
+    import random
+    import tracemalloc
+
+    aleatorio = random.Random(0)
+    his = [aleatorio.randbytes(TAMANO_HIS).hex().upper() for _ in range(n)]
+    consultas = [his[aleatorio.randrange(n)] for _ in range(busquedas // 2)] + \
+        [aleatorio.randbytes(TAMANO_HIS).hex().upper() for _ in range(busquedas // 2)]
+
+    directorio = directorio or tempfile.mkdtemp(prefix="bench_indice_")
+    ruta = os.path.join(directorio, "enrolados.idx")
+    try:
+        t0 = time.perf_counter()
+        construir_indice(his, ruta)
+        construccion = time.perf_counter() - t0
+
+        # Lo que se haría sin índice: leer los HIS de un fichero de texto a un set
+        ruta_texto = os.path.join(directorio, "enrolados.txt")
+        with open(ruta_texto, "w", encoding="ascii") as archivo:
+            archivo.write("\n".join(his))
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        with open(ruta_texto, encoding="ascii") as archivo:
+            conjunto = set(leer_his(archivo))
+        carga_set = time.perf_counter() - t0
+        memoria_set = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        t0 = time.perf_counter()
+        indice = IndiceHIS(ruta)
+        carga_indice = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        encontrados = sum(1 for c in consultas if c in indice)
+        segundos_indice = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        esperados = sum(1 for c in consultas if c in conjunto)
+        segundos_set = time.perf_counter() - t0
+        assert encontrados == esperados
+        indice.cerrar()
+
+        return {
+            "his": n,
+            "construccion_s": construccion,
+            "tamano_indice_bytes": os.path.getsize(ruta),
+            "memoria_set_bytes": memoria_set,
+            "carga_indice_ms": carga_indice * 1000,
+            "carga_set_ms": carga_set * 1000,
+            "busquedas_s_indice": len(consultas) / segundos_indice,
+            "busquedas_s_set": len(consultas) / segundos_set,
+        }
+    finally:
+        for nombre in ("enrolados.idx", "enrolados.txt"):
+            if os.path.exists(os.path.join(directorio, nombre)):
+                os.remove(os.path.join(directorio, nombre))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Índice binario de HIS enrolados")
+    sub = parser.add_subparsers(dest="orden", required=True)
+
+    p = sub.add_parser("construir", help="Crea el índice a partir de un HIS por línea")
+    p.add_argument("entrada", help="Fichero de entrada ('-' para stdin)")
+    p.add_argument("indice")
+    p.add_argument("--tramo", type=int, default=TAMANO_TRAMO)
+
+    p = sub.add_parser("buscar", help="Comprueba si los HIS están en el índice")
+    p.add_argument("indice")
+    p.add_argument("his", nargs="+")
+
+    p = sub.add_parser("benchmark", help="Compara el índice con un set de Python")
+    p.add_argument("--n", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    if args.orden == "construir":
+        entrada = sys.stdin if args.entrada == "-" else open(args.entrada, encoding="utf-8")
+        try:
+            t0 = time.perf_counter()
+            n = construir_indice(leer_his(entrada), args.indice, args.tramo)
+        finally:
+            if entrada is not sys.stdin:
+                entrada.close()
+        print(f"{n} HIS distintos en {time.perf_counter() - t0:.2f} s", file=sys.stderr)
+        return 0
+
+    if args.orden == "buscar":
+        with IndiceHIS(args.indice) as indice:
+            encontrados = 0
+            for his in args.his:
+                presente = his in indice
+                encontrados += presente
+                print(f"{his}: {'ENROLADO' if presente else 'NO ENROLADO'}")
+        return 0 if encontrados == len(args.his) else 1
+
+    r = ejecutar_benchmark(args.n)
+    print(f"{r['his']} HIS: índice {r['tamano_indice_bytes'] / 2**20:.1f} MB en disco, "
+          f"set {r['memoria_set_bytes'] / 2**20:.1f} MB en memoria")
+    print(f"carga: índice {r['carga_indice_ms']:.3f} ms, set {r['carga_set_ms']:.1f} ms")
+    print(f"búsquedas/s: índice {r['busquedas_s_indice']:.0f}, set {r['busquedas_s_set']:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+import os
+import hashlib
+from collections import Counter
+
+# =============================
+# VERSIONES DEL HASH DE INVENTARIO
+# =============================
+
+# v1: hash de cada entrada, se ordenan, se unen con '|' y se vuelve a hashear.
+#     Es el algoritmo original; los valores ya enrolados siguen usándolo.
+# v2: multiconjunto aditivo (LtHash16). Cada entrada se expande con SHAKE128
+#     a 1024 carriles de 16 bits y se suma carril a carril módulo 2^16, así
+#     que añadir o quitar una entrada es O(1) y el orden no influye.
+#
+#     Una suma módulo un único entero de 512 bits cae ante el ataque del
+#     cumpleaños generalizado de Wagner (se encuentran multiconjuntos con la
+#     misma suma en mucho menos de 2^256 operaciones). Con 1024 x 16 bits
+#     encontrar una colisión equivale a un problema SIS en retículos de
+#     dimensión 1024, que el análisis de LtHash (Lewi et al., 2019) estima
+#     en unos 200 bits de seguridad.
+VERSION_V1 = 1
+VERSION_V2 = 2
+
+# Carriles del acumulador y bytes totales (1024 x 16 bits = 2048 bytes)
+_CARRILES = 1024
+_BYTES = _CARRILES * 2
+# Máscaras para sumar todos los carriles a la vez sobre un entero de Python:
+# bit alto de cada carril, resto de bits, todo el acumulador y un 1 por carril
+_ALTOS = int.from_bytes(b"\x80\x00" * _CARRILES, "big")
+_BAJOS = int.from_bytes(b"\x7f\xff" * _CARRILES, "big")
+_TODO = (1 << (8 * _BYTES)) - 1
+_UNOS = int.from_bytes(b"\x00\x01" * _CARRILES, "big")
+# Prefijo del hash final v2 para que nunca coincida con un valor v1
+_ETIQUETA_V2 = b"IoTZT-inventario-v2"
+
+
+# =============================
+# HASH DE CADA ENTRADA
+# =============================
+
+# Hash SHA256 (hex) de una entrada 'nombre:version', igual que en v1
+def hash_entrada(nombre, version):
+    entrada = f"{nombre}:{version}"
+    return hashlib.sha256(entrada.encode("utf-8")).hexdigest()
+
+
+# Elemento del multiconjunto v2 a partir del hash hex de una entrada
+def _elemento(h):
+    return int.from_bytes(hashlib.shake_128(h.encode("ascii")).digest(_BYTES), "big")
+
+
+# Suma carril a carril módulo 2^16: los 15 bits bajos se suman sin que el
+# acarreo salga del carril y el bit alto se resuelve con un XOR
+def _sumar(a, b):
+    return ((a & _BAJOS) + (b & _BAJOS)) ^ ((a ^ b) & _ALTOS)
+
+
+# Opuesto carril a carril módulo 2^16 (complemento a dos de cada carril)
+def _opuesto(a):
+    return _sumar(a ^ _TODO, _UNOS)
+
+
+# Escribe 'datos' como JSON en un temporal y lo renombra, para que un corte
+# a mitad de escritura nunca deje el archivo truncado
+def _guardar_json(ruta, datos):
+    import json
+    os.makedirs(os.path.dirname(os.fspath(ruta)) or ".", exist_ok=True)
+    temporal = os.fspath(ruta) + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo)
+    os.replace(temporal, ruta)
+
+
+# =============================
+# HASH v1 (COMPLETO)
+# =============================
+
+# Hash del inventario a partir de los hashes de cada entrada (algoritmo original)
+def hash_inventario_v1(hashes_entradas):
+    inventario = "|".join(sorted(hashes_entradas))
+    return hashlib.sha256(inventario.encode("utf-8")).hexdigest()
+
+
+# =============================
+# HASH v2 (INCREMENTAL)
+# =============================
+
+class InventarioIncremental:
+    """
+    Estado del hash de inventario v2. Solo guarda la suma acumulada (los
+    1024 carriles empaquetados en un entero) y el número de entradas, así que se puede persistir y actualizar a partir
+    de las altas y bajas sin volver a recorrer todo el inventario.
+    """
+
+    def __init__(self, acumulador=0, entradas=0):
+        self.acumulador = acumulador
+        self.entradas = entradas
+
+    # Crea el estado a partir de una lista completa de hashes de entrada
+    @classmethod
+    def desde_hashes(cls, hashes_entradas):
+        estado = cls()
+        for h in hashes_entradas:
+            estado.anadir(h)
+        return estado
+
+    def anadir(self, h):
+        self.acumulador = _sumar(self.acumulador, _elemento(h))
+        self.entradas += 1
+
+    def quitar(self, h):
+        if self.entradas == 0:
+            raise ValueError("No se puede quitar una entrada de un inventario vacío")
+        self.acumulador = _sumar(self.acumulador, _opuesto(_elemento(h)))
+        self.entradas -= 1
+
+    # Aplica un cambio de inventario (hashes añadidos y eliminados)
+    def aplicar_delta(self, anadidos=(), eliminados=()):
+        for h in eliminados:
+            self.quitar(h)
+        for h in anadidos:
+            self.anadir(h)
+
+    # Hash final del inventario (hex, mismo formato que v1)
+    def hash(self):
+        h = hashlib.sha256(_ETIQUETA_V2)
+        h.update(self.acumulador.to_bytes(_BYTES, "big"))
+        h.update(self.entradas.to_bytes(8, "big"))
+        return h.hexdigest()
+
+    # =============================
+    # PERSISTENCIA
+    # =============================
+
+    def a_dict(self):
+        return {
+            "version": VERSION_V2,
+            "acumulador": format(self.acumulador, f"0{2 * _BYTES}x"),
+            "entradas": self.entradas,
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        if datos.get("version") != VERSION_V2:
+            raise ValueError(f"Versión de estado de inventario no soportada: {datos.get('version')}")
+        # Un estado guardado con otro tamaño de acumulador no se puede continuar
+        if len(datos["acumulador"]) != 2 * _BYTES:
+            raise ValueError("Estado de inventario con un acumulador de tamaño no válido")
+        return cls(int(datos["acumulador"], 16), int(datos["entradas"]))
+
+    def guardar(self, ruta):
+        _guardar_json(ruta, self.a_dict())
+
+    @classmethod
+    def cargar(cls, ruta):
+        import json
+        with open(ruta, encoding="utf-8") as archivo:
+            return cls.desde_dict(json.load(archivo))
+
+
+# Hash del inventario con la versión indicada
+def hash_inventario(hashes_entradas, version=VERSION_V1):
+    if version == VERSION_V1:
+        return hash_inventario_v1(hashes_entradas)
+    if version == VERSION_V2:
+        return InventarioIncremental.desde_hashes(hashes_entradas).hash()
+    raise ValueError(f"Versión de hash de inventario desconocida: {version}")
+
+
+# Actualiza un estado v2 persistido con las altas y bajas y devuelve el nuevo hash
+def actualizar_estado(ruta_estado, anadidos=(), eliminados=()):
+    estado = InventarioIncremental.cargar(ruta_estado)
+    estado.aplicar_delta(anadidos, eliminados)
+    estado.guardar(ruta_estado)
+    return estado.hash()
+
+
+# Altas y bajas entre dos listas de hashes de entrada (como multiconjuntos)
+def delta_hashes(anteriores, nuevos):
+    antes, despues = Counter(anteriores), Counter(nuevos)
+    return list((despues - antes).elements()), list((antes - despues).elements())
+
+
+# ==========================================
+# ESCANEO DEL REGISTRO CON DETECCIÓN DE CAMBIOS
+# ==========================================
+
+# Rutas del Registro de Windows donde se lista el software instalado
+# (nombre de la raíz en el proveedor de registro, ruta)
+RUTAS_DESINSTALACION = (
+    ("HKEY_LOCAL_MACHINE", r"Software\Microsoft\Windows\CurrentVersion\Uninstall"),
+    ("HKEY_LOCAL_MACHINE", r"Software\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"),
+    ("HKEY_CURRENT_USER", r"Software\Microsoft\Windows\CurrentVersion\Uninstall"),
+)
+
+
+# Hash de la entrada de una subclave de desinstalación, o None si no identifica software
+def _hash_subclave(registro, subkey, debug):
+    try:
+        # Se extrae el nombre y la versión del programa
+        nombre = registro.QueryValueEx(subkey, "DisplayName")[0]
+        version_app = registro.QueryValueEx(subkey, "DisplayVersion")[0]
+    except FileNotFoundError:
+        # La subclave no tiene los valores buscados
+        return None
+    # Se limpia de espacios en blanco y se manejan posibles valores nulos
+    nombre = (nombre or "").strip()
+    version_app = (version_app or "").strip()
+
+    # Si no hay nombre, el registro no es útil para identificar software
+    if not nombre:
+        return None
+    if debug:
+        print(f"[SOFTWARE] '{nombre}:{version_app}'")
+    return hash_entrada(nombre, version_app)
+
+
+# Recorre las claves de desinstalación y devuelve (hashes de entrada, estado, estadísticas).
+#
+# 'registro' es el módulo winreg o cualquier objeto con la misma interfaz
+# (OpenKey, QueryInfoKey, EnumKey, QueryValueEx y las constantes HKEY_*).
+#
+# 'estado' es el devuelto por el escaneo anterior: guarda la fecha de última
+# escritura (QueryInfoKey) de cada ruta y de cada subclave junto al hash de su
+# entrada. Si una subclave no ha cambiado se reutiliza su hash sin leer sus valores.
+# Con 'confiar_en_raiz' tampoco se enumeran las subclaves de una ruta cuya fecha y
+# número de subclaves no han cambiado; es más rápido, pero no detecta programas
+# que actualizan DisplayVersion en su propia subclave sin tocar la clave padre.
+def escanear_registro(registro, estado=None, confiar_en_raiz=False, debug=False,
+                      rutas=RUTAS_DESINSTALACION):
+    estado = estado or {}
+    nuevo_estado = {}
+    hashes_programas = []
+    estadisticas = {"subclaves": 0, "leidas": 0, "reutilizadas": 0, "rutas_omitidas": 0}
+
+    for nombre_raiz, ruta in rutas:
+        clave_estado = f"{nombre_raiz}\\{ruta}"
+        previo = estado.get(clave_estado)
+        try:
+            # Se abre la clave de registro principal para lectura
+            with registro.OpenKey(getattr(registro, nombre_raiz), ruta) as key:
+                n_subclaves, _, marca = registro.QueryInfoKey(key)
+
+                if confiar_en_raiz and previo and previo["marca"] == marca and previo["n"] == n_subclaves:
+                    nuevo_estado[clave_estado] = previo
+                    hashes_programas.extend(h for _, h in previo["subclaves"].values() if h)
+                    estadisticas["rutas_omitidas"] += 1
+                    continue
+
+                subclaves_previas = previo["subclaves"] if previo else {}
+                subclaves = {}
+                # Se itera sobre todas las subclaves que representan un programa
+                for i in range(n_subclaves):
+                    try:
+                        subkey_name = registro.EnumKey(key, i)
+                        with registro.OpenKey(key, subkey_name) as subkey:
+                            marca_sub = registro.QueryInfoKey(subkey)[2]
+                            anterior = subclaves_previas.get(subkey_name)
+                            if anterior is not None and anterior[0] == marca_sub:
+                                h = anterior[1]
+                                estadisticas["reutilizadas"] += 1
+                            else:
+                                h = _hash_subclave(registro, subkey, debug)
+                                estadisticas["leidas"] += 1
+                    except OSError:
+                        # Si una subclave no se puede leer, se salta
+                        continue
+                    estadisticas["subclaves"] += 1
+                    subclaves[subkey_name] = [marca_sub, h]
+                    if h:
+                        hashes_programas.append(h)
+
+                nuevo_estado[clave_estado] = {"marca": marca, "n": n_subclaves, "subclaves": subclaves}
+        except FileNotFoundError:
+            continue
+
+    return hashes_programas, nuevo_estado, estadisticas
+
+
+# Hashes de entrada guardados en un estado de escaneo
+def hashes_de_escaneo(estado):
+    return [h for ruta in estado.values() for _, h in ruta["subclaves"].values() if h]
+
+
+# Estado de escaneo guardado en disco ({} si no existe o está dañado)
+def cargar_escaneo(ruta):
+    import json
+    try:
+        with open(ruta, encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return {}
+
+
+def guardar_escaneo(ruta, estado):
+    _guardar_json(ruta, estado)
+
+
+# Estado v2 y escaneo del que sale, guardados juntos en un único archivo: se
+# escriben con un solo renombrado, así que nunca queda uno sin el otro
+def guardar_estado_y_escaneo(ruta, estado, escaneo):
+    _guardar_json(ruta, dict(estado.a_dict(), escaneo=escaneo))
+
+
+# (estado v2, escaneo) guardados con guardar_estado_y_escaneo, o (None, {}) si
+# no existen, están dañados o el estado no corresponde al escaneo
+def cargar_estado_y_escaneo(ruta):
+    import json
+    try:
+        with open(ruta, encoding="utf-8") as archivo:
+            datos = json.load(archivo)
+        estado = InventarioIncremental.desde_dict(datos)
+        escaneo = datos["escaneo"]
+        if estado.entradas != len(hashes_de_escaneo(escaneo)):
+            return None, {}
+        return estado, escaneo
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None, {}
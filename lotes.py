@@ -0,0 +1,211 @@
+import sys
+import csv
+import json
+import time
+import argparse
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+from normalizacion import (
+    normalizar_atributos,
+    canonicar,
+    calcular_his
+)
+
+# Número de registros que se envían juntos a cada proceso
+TAMANO_BLOQUE = 1000
+
+
+# =============================
+# HIS DE UN REGISTRO
+# =============================
+
+# Cadena completa normalización -> canonicalización -> HIS para un único registro
+def generar_his(raw):
+    return calcular_his(canonicar(normalizar_atributos(raw)))
+
+
+# Calcula el HIS de todos los registros de un bloque (se ejecuta en los procesos hijos)
+def _his_bloque(bloque):
+    return [generar_his(raw) for raw in bloque]
+
+
+# =============================
+# PROCESAMIENTO POR LOTES
+# =============================
+
+# Divide un iterable en listas de como máximo 'tamano' elementos sin cargarlo entero
+def trocear(iterable, tamano=TAMANO_BLOQUE):
+    it = iter(iterable)
+    while True:
+        bloque = list(islice(it, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+# Genera el HIS de cada registro en el mismo orden de entrada.
+# Con procesos > 1 los bloques se reparten en un pool de procesos, pero
+# solo se mantienen en vuelo 2 bloques por proceso para acotar la memoria.
+def calcular_his_lote(registros, procesos=1, tamano_bloque=TAMANO_BLOQUE):
+    if procesos <= 1:
+        for raw in registros:
+            yield generar_his(raw)
+        return
+
+    max_en_vuelo = procesos * 2
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        pendientes = deque()
+        for bloque in trocear(registros, tamano_bloque):
+            pendientes.append(pool.submit(_his_bloque, bloque))
+            # Si hay demasiados bloques pendientes, se entrega el más antiguo antes de seguir leyendo
+            if len(pendientes) >= max_en_vuelo:
+                yield from pendientes.popleft().result()
+        while pendientes:
+            yield from pendientes.popleft().result()
+
+
+# =============================
+# LECTURA DE ENTRADA
+# =============================
+
+class ErrorEntrada(ValueError):
+    pass
+
+
+# Lee registros de un fichero JSONL (un diccionario de atributos por línea).
+# Como la salida tiene un HIS por registro, una línea no válida no se salta: se
+# lanza ErrorEntrada con su número de línea.
+def leer_jsonl(archivo):
+    for numero, linea in enumerate(archivo, 1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            registro = json.loads(linea)
+        except ValueError as e:
+            raise ErrorEntrada(f"línea {numero}: JSON no válido ({e})") from None
+        if not isinstance(registro, dict):
+            raise ErrorEntrada(f"línea {numero}: se esperaba un objeto JSON, no {type(registro).__name__}")
+        yield registro
+
+
+# Clave con la que csv.DictReader guarda los campos que sobran en una fila
+_SOBRANTES = object()
+
+
+# Lee registros de un CSV con cabecera (una columna por atributo). Una fila con
+# más campos que la cabecera lanza ErrorEntrada con su número de línea.
+def leer_csv(archivo):
+    lector = csv.DictReader(archivo, restkey=_SOBRANTES)
+    for fila in lector:
+        if _SOBRANTES in fila:
+            raise ErrorEntrada(f"línea {lector.line_num}: {len(fila[_SOBRANTES])} campos más que la cabecera")
+        yield fila
+
+
+# =============================
+# RENDIMIENTO
+# =============================
+
+# Registros sintéticos con valores distintos para medir el rendimiento
+def registros_sinteticos(n):
+    for i in range(n):
+        yield {
+            "cpu_id": f"BFEBFBFF{i:08X}",
+            "serial_number": f"NXA0MEB00A{i:012d}",
+            "mac_original": f"0a:00:27:{(i >> 16) & 0xFF:02x}:{(i >> 8) & 0xFF:02x}:{i & 0xFF:02x}",
+            "firmware_hash": f"{i:064x}",
+            "os_version": f"Windows-11-10.0.{26000 + i % 500}-SP0",
+            "public_key_fingerprint": f"{i * 7919:064x}",
+            "software_inventory_hash": f"0x{i * 104729:064X}",
+        }
+
+
+# Registros sintéticos con la repetición de una flota real: cada dispositivo tiene
+# su CPU, número de serie, MAC y clave, pero la versión de SO, el firmware y el
+# inventario salen de unos pocos valores compartidos por muchos dispositivos
+def registros_flota(n, versiones=20, firmwares=50, inventarios=500, semilla=0):
+    import random
+
+    aleatorio = random.Random(semilla)
+    valores_os = [f"Windows-11-10.0.{26000 + i}-SP0" for i in range(versiones)]
+    valores_fw = [f"0x{aleatorio.getrandbits(256):064x}" for _ in range(firmwares)]
+    valores_inv = [f"{aleatorio.getrandbits(256):064X}" for _ in range(inventarios)]
+    for raw in registros_sinteticos(n):
+        raw["os_version"] = aleatorio.choice(valores_os)
+        raw["firmware_hash"] = aleatorio.choice(valores_fw)
+        raw["software_inventory_hash"] = aleatorio.choice(valores_inv)
+        yield raw
+
+
+# Mide registros/s procesando 'n' registros sintéticos con el número de procesos indicado
+def medir_rendimiento(n, procesos=1, tamano_bloque=TAMANO_BLOQUE):
+    t0 = time.perf_counter()
+    total = 0
+    for _ in calcular_his_lote(registros_sinteticos(n), procesos, tamano_bloque):
+        total += 1
+    segundos = time.perf_counter() - t0
+    return {
+        "procesos": procesos,
+        "registros": total,
+        "segundos": segundos,
+        "registros_s": total / segundos if segundos > 0 else 0.0,
+        "registros_s_por_proceso": total / segundos / procesos if segundos > 0 else 0.0,
+    }
+
+
+# =============================
+# LÍNEA DE COMANDOS
+# =============================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cálculo de HIS por lotes sobre ficheros JSONL o CSV")
+    parser.add_argument("entrada", nargs="?", default="-", help="Fichero de entrada ('-' para stdin)")
+    parser.add_argument("--formato", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--salida", default="-", help="Fichero de salida ('-' para stdout)")
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE)
+    parser.add_argument("--escalado", type=int, metavar="N",
+                        help="En lugar de procesar la entrada, mide el rendimiento con N registros sintéticos de 1 a --procesos procesos")
+    args = parser.parse_args(argv)
+
+    if args.escalado:
+        base = None
+        for procesos in range(1, max(args.procesos, 1) + 1):
+            r = medir_rendimiento(args.escalado, procesos, args.bloque)
+            base = base or r["registros_s"]
+            print(f"procesos={procesos} registros/s={r['registros_s']:.0f} "
+                  f"por_proceso={r['registros_s_por_proceso']:.0f} escalado={r['registros_s'] / base:.2f}x")
+        return 0
+
+    entrada = sys.stdin if args.entrada == "-" else open(args.entrada, encoding="utf-8", newline="")
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+    lector = leer_csv if args.formato == "csv" else leer_jsonl
+
+    try:
+        t0 = time.perf_counter()
+        total = 0
+        for his in calcular_his_lote(lector(entrada), args.procesos, args.bloque):
+            salida.write(his + "\n")
+            total += 1
+        segundos = time.perf_counter() - t0
+    except ErrorEntrada as e:
+        print(f"{args.entrada}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if salida is not sys.stdout:
+            salida.close()
+
+    # El informe de rendimiento va a stderr para no mezclarse con los HIS
+    por_segundo = total / segundos if segundos > 0 else 0.0
+    print(f"{total} registros en {segundos:.3f} s ({por_segundo:.0f} registros/s, "
+          f"{por_segundo / max(args.procesos, 1):.0f} registros/s por proceso)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
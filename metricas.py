@@ -0,0 +1,181 @@
+import time
+import threading
+from functools import wraps
+
+from sentinelas import es_sentinela
+
+# ==========================================
+# MÉTRICAS DE LAS ETAPAS DEL HIS
+# ==========================================
+
+# Límites (segundos) de los cubos del histograma de duraciones
+CUBOS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+
+
+class _Estado:
+    # Desactivado por defecto: las funciones instrumentadas solo comprueban este flag
+    activo = False
+
+
+_estado = _Estado()
+_cerrojo = threading.Lock()
+# etapa -> {"llamadas", "errores", "segundos", "maximo", "cubos", "sentinelas"}
+_etapas = {}
+
+
+def activar():
+    _estado.activo = True
+
+
+def desactivar():
+    _estado.activo = False
+
+
+def activo():
+    return _estado.activo
+
+
+def reiniciar():
+    with _cerrojo:
+        _etapas.clear()
+
+
+# =============================
+# REGISTRO
+# =============================
+
+# Registra una ejecución de una etapa (duración, si falló y el valor devuelto)
+def registrar(etapa, segundos, resultado=None, error=False):
+    with _cerrojo:
+        datos = _etapas.get(etapa)
+        if datos is None:
+            datos = _etapas[etapa] = {
+                "llamadas": 0, "errores": 0, "segundos": 0.0, "maximo": 0.0,
+                "cubos": [0] * len(CUBOS), "sentinelas": {},
+            }
+        datos["llamadas"] += 1
+        datos["segundos"] += segundos
+        datos["maximo"] = max(datos["maximo"], segundos)
+        for i, limite in enumerate(CUBOS):
+            if segundos <= limite:
+                datos["cubos"][i] += 1
+                break
+        if error:
+            datos["errores"] += 1
+        elif es_sentinela(resultado):
+            datos["sentinelas"][resultado] = datos["sentinelas"].get(resultado, 0) + 1
+
+
+# Decorador que mide la función como la etapa 'etapa' cuando las métricas están activas.
+# Desactivadas, el único coste es la comprobación del flag.
+def instrumentar(etapa):
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _estado.activo:
+                return funcion(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                resultado = funcion(*args, **kwargs)
+            except Exception:
+                registrar(etapa, time.perf_counter() - t0, error=True)
+                raise
+            registrar(etapa, time.perf_counter() - t0, resultado)
+            return resultado
+        return envoltura
+    return decorador
+
+
+# Instrumenta todos los colectores {atributo: función} como etapas 'colector.<atributo>'
+def instrumentar_colectores(colectores):
+    return {attr: instrumentar(f"colector.{attr}")(colector) for attr, colector in colectores.items()}
+
+
+# =============================
+# EXPORTACIÓN
+# =============================
+
+# Copia de las métricas como diccionario serializable a JSON
+def exportar():
+    with _cerrojo:
+        return {
+            etapa: {
+                "llamadas": d["llamadas"],
+                "errores": d["errores"],
+                "segundos_total": d["segundos"],
+                "segundos_media": d["segundos"] / d["llamadas"] if d["llamadas"] else 0.0,
+                "segundos_max": d["maximo"],
+                "sentinelas": dict(d["sentinelas"]),
+            }
+            for etapa, d in sorted(_etapas.items())
+        }
+
+
+def exportar_json():
+    import json
+    return json.dumps(exportar(), indent=2, ensure_ascii=False)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Métricas en el formato de texto de Prometheus
+def exportar_prometheus(prefijo="iotzt"):
+    with _cerrojo:
+        etapas = {e: (d, list(d["cubos"]), dict(d["sentinelas"])) for e, d in sorted(_etapas.items())}
+
+    lineas = [
+        f"# HELP {prefijo}_etapa_segundos Duración de cada etapa del cálculo del HIS",
+        f"# TYPE {prefijo}_etapa_segundos histogram",
+    ]
+    for etapa, (d, cubos, _) in etapas.items():
+        e = _escapar(etapa)
+        acumulado = 0
+        for limite, n in zip(CUBOS, cubos):
+            acumulado += n
+            lineas.append(f'{prefijo}_etapa_segundos_bucket{{etapa="{e}",le="{limite:g}"}} {acumulado}')
+        lineas.append(f'{prefijo}_etapa_segundos_bucket{{etapa="{e}",le="+Inf"}} {d["llamadas"]}')
+        lineas.append(f'{prefijo}_etapa_segundos_sum{{etapa="{e}"}} {d["segundos"]!r}')
+        lineas.append(f'{prefijo}_etapa_segundos_count{{etapa="{e}"}} {d["llamadas"]}')
+
+    lineas += [
+        f"# HELP {prefijo}_etapa_errores_total Excepciones lanzadas por cada etapa",
+        f"# TYPE {prefijo}_etapa_errores_total counter",
+    ]
+    for etapa, (d, _, _) in etapas.items():
+        lineas.append(f'{prefijo}_etapa_errores_total{{etapa="{_escapar(etapa)}"}} {d["errores"]}')
+
+    lineas += [
+        f"# HELP {prefijo}_etapa_sentinelas_total Valores de reserva devueltos por cada etapa",
+        f"# TYPE {prefijo}_etapa_sentinelas_total counter",
+    ]
+    for etapa, (_, _, sentinelas) in etapas.items():
+        for valor, n in sorted(sentinelas.items()):
+            lineas.append(f'{prefijo}_etapa_sentinelas_total{{etapa="{_escapar(etapa)}",valor="{_escapar(valor)}"}} {n}')
+
+    return "\n".join(lineas) + "\n"
+
+
+# Sirve /metrics en formato Prometheus desde un hilo en segundo plano
+def servir_prometheus(puerto=9464, direccion="0.0.0.0"):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = exportar_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((direccion, puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    return servidor
@@ -0,0 +1,432 @@
+import os
+import re
+import sys
+import time
+import random
+
+from normalizacion import (
+    ATTRIBUTE_POLICY,
+    CasePolicy,
+    NORMALIZADORES,
+    VERSION_NUM_RE,
+    CANONICA_V1,
+    CANONICA_V2,
+    normalizar_mac,
+    normalizar_hash_hex,
+    normalizar_version,
+    plan_normalizacion,
+    canonicar,
+    calcular_his,
+    calcular_his_v2
+)
+from inventario import hash_entrada, hash_inventario, VERSION_V1
+
+# ==================================================
+# MUTACIONES DE ATRIBUTOS E INVARIANTES DEL HIS
+# ==================================================
+
+# Genera miles de perturbaciones sistemáticas de cada atributo (cambios de
+# mayúsculas, separadores, espacios, prefijo 0x, versiones, ediciones del
+# inventario de software) y comprueba que el HIS cambia o no según lo que
+# esperan ATTRIBUTE_POLICY y el normalizador del atributo. Sustituye a los
+# casos escritos a mano de cambioAtributos.py y cambioAPP_OS.py.
+
+INVARIANTE = "invariante"
+SENSIBLE = "sensible"
+
+# Atributos de ejemplo (los de cambioAtributos.py)
+RAW_BASE = {
+    "cpu_id": "BFEBFBFF000806C1",
+    "serial_number": "NXA0MEB00A1160D9C73400",
+    "mac_original": "0A:00:27:00:00:0E",
+    "firmware_hash": "663c81b7cfed5112d0fc382ab439ad1a62ecbd64db6518f6f8ae6f79591d34d6",
+    "os_version": "Windows-11-10.0.26200-SP0",
+    "public_key_fingerprint": "286d3173f934d9b531ca05f6fe900044e57694bb00a719020f6d5d6bd623bd9a",
+    "software_inventory_hash": "66d6431949b60908aba658a215a21ff81b73f21dccbd5d2d673592dc851f0116",
+}
+
+# Inventario de ejemplo (nombre, versión) del que sale software_inventory_hash
+PROGRAMAS_BASE = (
+    ("app", "1.0"),
+    ("prueba", "2.3"),
+    ("Microsoft Edge", "118.0.2088.76"),
+    ("7-Zip 23.01 (x64)", "23.01"),
+    ("Python 3.11.7 (64-bit)", "3.11.7150.0"),
+    ("Mozilla Firefox (x64 es-ES)", "119.0"),
+    ("Git", "2.42.0.2"),
+    ("Notepad++ (64-bit x64)", "8.5.8"),
+)
+
+# Atributo calculado a partir del inventario
+ATRIBUTO_INVENTARIO = "software_inventory_hash"
+
+# Casos que se generan y comprueban juntos en cada proceso
+TAMANO_BLOQUE = 5000
+
+# Ejemplos de violación que se guardan por (atributo, familia)
+MAX_EJEMPLOS = 5
+
+SEPARADORES = ":-._ /"
+ESPACIOS_BORDE = " \t\r\n"
+ESPACIOS_INTERNOS = " \t"
+HEX_MINUSCULAS = "0123456789abcdef"
+NUMERO_RE = re.compile(r"\d+")
+
+
+# =============================
+# TIPO DE CADA ATRIBUTO
+# =============================
+
+# Tipo de atributo según su normalizador; sin normalizador específico, según la política
+def tipo_atributo(attr):
+    normalizador = NORMALIZADORES.get(attr)
+    if normalizador is normalizar_hash_hex:
+        return "hash"
+    if normalizador is normalizar_mac:
+        return "mac"
+    if normalizador is normalizar_version:
+        return "version"
+    if normalizador is not None:
+        return None
+    if ATTRIBUTE_POLICY[attr] == CasePolicy.INSENSITIVE:
+        return "texto_insensible"
+    return "texto_sensible"
+
+
+# Zona del valor que se puede perturbar. En las versiones solo cuenta la parte
+# numérica que extrae normalizar_version: las perturbaciones de formato se hacen
+# fuera de ella y las de versión (o valor alterado), dentro.
+def _zona(valor, tipo, dentro):
+    if tipo != "version":
+        return 0, len(valor), True
+    m = VERSION_NUM_RE.search(valor)
+    if m is None:
+        return None
+    return m.start(), m.end(), dentro
+
+
+def _posiciones(valor, zona, condicion=None):
+    inicio, fin, dentro = zona
+    rango = range(inicio, fin) if dentro else [*range(0, inicio), *range(fin, len(valor))]
+    return [i for i in rango if condicion is None or condicion(valor[i])]
+
+
+def _insertar(valor, zona, rng, caracteres, k):
+    inicio, fin, dentro = zona
+    # Huecos donde insertar: entre dos caracteres de la zona (o fuera de ella)
+    huecos = list(range(inicio + 1, fin)) if dentro else [*range(0, inicio + 1), *range(fin, len(valor) + 1)]
+    if not huecos:
+        return None
+    partes = list(valor)
+    for i in sorted(rng.sample(huecos, min(k, len(huecos))), reverse=True):
+        partes.insert(i, "".join(rng.choice(caracteres) for _ in range(rng.randint(1, 2))))
+    return "".join(partes)
+
+
+# =============================
+# FAMILIAS DE PERTURBACIONES
+# =============================
+
+# Cada mutador recibe (valor, rng, zona) y devuelve el valor perturbado, o None si no aplica
+
+# Invierte mayúsculas/minúsculas de un subconjunto no vacío de letras
+def mutar_mayusculas(valor, rng, zona):
+    letras = _posiciones(valor, zona, str.isalpha)
+    if not letras:
+        return None
+    elegidas = [i for i in letras if rng.random() < 0.5] or [rng.choice(letras)]
+    partes = list(valor)
+    for i in elegidas:
+        partes[i] = partes[i].swapcase()
+    return "".join(partes)
+
+
+# Inserta separadores y cambia los que ya hay por otros
+def mutar_separadores(valor, rng, zona):
+    existentes = _posiciones(valor, zona, lambda c: c in SEPARADORES)
+    if existentes and rng.random() < 0.5:
+        partes = list(valor)
+        for i in existentes:
+            partes[i] = rng.choice(SEPARADORES.replace(partes[i], ""))
+        return "".join(partes)
+    return _insertar(valor, zona, rng, SEPARADORES, rng.randint(1, 4))
+
+
+# Espacios, tabuladores y saltos de línea alrededor del valor
+def mutar_espacios_borde(valor, rng, zona):
+    delante = "".join(rng.choice(ESPACIOS_BORDE) for _ in range(rng.randint(0, 3)))
+    detras = "".join(rng.choice(ESPACIOS_BORDE) for _ in range(rng.randint(0 if delante else 1, 3)))
+    return delante + valor + detras
+
+
+# Espacios y tabuladores dentro del valor
+def mutar_espacios_internos(valor, rng, zona):
+    return _insertar(valor, zona, rng, ESPACIOS_INTERNOS, rng.randint(1, 3))
+
+
+def mutar_prefijo_0x(valor, rng, zona):
+    if valor[:2] in ("0x", "0X"):
+        return None
+    return rng.choice(("0x", "0X")) + valor
+
+
+# Sube uno de los números de la versión
+def mutar_version(valor, rng, zona):
+    inicio, fin, _ = zona
+    numeros = list(NUMERO_RE.finditer(valor, inicio, fin))
+    if not numeros:
+        return None
+    m = rng.choice(numeros)
+    return f"{valor[:m.start()]}{int(m.group()) + rng.randint(1, 99)}{valor[m.end():]}"
+
+
+# Cambia un carácter por otro distinto de su misma clase (hexadecimal, dígito o letra)
+def mutar_alterado(valor, rng, zona):
+    posiciones = _posiciones(valor, zona, str.isalnum)
+    if not posiciones:
+        return None
+    i = rng.choice(posiciones)
+    c = valor[i]
+    if c.isdigit():
+        alfabeto = "0123456789"
+    elif c.lower() in HEX_MINUSCULAS:
+        alfabeto = HEX_MINUSCULAS
+    else:
+        alfabeto = "abcdefghijklmnopqrstuvwxyz"
+    nuevo = rng.choice(alfabeto.replace(c.lower(), ""))
+    return valor[:i] + (nuevo.upper() if c.isupper() else nuevo) + valor[i + 1:]
+
+
+# familia -> (mutador, se aplica dentro de la zona de versión, {tipo: resultado esperado}).
+# Si el tipo del atributo no aparece, la familia no se aplica a ese atributo.
+FAMILIAS = {
+    "mayusculas": (mutar_mayusculas, False, {
+        "hash": INVARIANTE, "mac": INVARIANTE, "version": INVARIANTE,
+        "texto_insensible": INVARIANTE, "texto_sensible": SENSIBLE,
+    }),
+    "separadores": (mutar_separadores, False, {
+        "hash": INVARIANTE, "mac": INVARIANTE, "version": INVARIANTE,
+        "texto_insensible": SENSIBLE, "texto_sensible": SENSIBLE,
+    }),
+    "espacios_borde": (mutar_espacios_borde, False, {
+        "hash": INVARIANTE, "mac": INVARIANTE, "version": INVARIANTE,
+        "texto_insensible": INVARIANTE, "texto_sensible": INVARIANTE,
+    }),
+    "espacios_internos": (mutar_espacios_internos, False, {
+        "hash": INVARIANTE, "mac": INVARIANTE, "version": INVARIANTE,
+        "texto_insensible": SENSIBLE, "texto_sensible": SENSIBLE,
+    }),
+    "prefijo_0x": (mutar_prefijo_0x, False, {"hash": INVARIANTE}),
+    "version": (mutar_version, True, {"version": SENSIBLE}),
+    "alterado": (mutar_alterado, True, {
+        "hash": SENSIBLE, "mac": SENSIBLE, "version": SENSIBLE,
+        "texto_insensible": SENSIBLE, "texto_sensible": SENSIBLE,
+    }),
+}
+
+
+# =============================
+# FAMILIAS DEL INVENTARIO
+# =============================
+
+# Estas perturbaciones editan la lista de programas y recalculan
+# software_inventory_hash como lo hace el colector (nombre y versión sin
+# espacios alrededor). Devuelven (índice, nombre, versión) del programa
+# editado, o la lista completa reordenada.
+
+def mutar_inventario_nombre(programas, rng):
+    i = rng.randrange(len(programas))
+    nombre, version = programas[i]
+    nuevo = mutar_mayusculas(nombre, rng, (0, len(nombre), True))
+    return None if nuevo is None else (i, nuevo, version)
+
+
+def mutar_inventario_version(programas, rng):
+    i = rng.randrange(len(programas))
+    nombre, version = programas[i]
+    nueva = mutar_version(version, rng, (0, len(version), True))
+    return None if nueva is None else (i, nombre, nueva)
+
+
+def mutar_inventario_espacios(programas, rng):
+    i = rng.randrange(len(programas))
+    nombre, version = programas[i]
+    return i, mutar_espacios_borde(nombre, rng, None), mutar_espacios_borde(version, rng, None)
+
+
+def mutar_inventario_orden(programas, rng):
+    orden = list(programas)
+    rng.shuffle(orden)
+    return orden
+
+
+FAMILIAS_INVENTARIO = {
+    "inventario_nombre": (mutar_inventario_nombre, SENSIBLE),
+    "inventario_version": (mutar_inventario_version, SENSIBLE),
+    "inventario_espacios": (mutar_inventario_espacios, INVARIANTE),
+    "inventario_orden": (mutar_inventario_orden, INVARIANTE),
+}
+
+
+def valor_inventario(programas, version=VERSION_V1):
+    return hash_inventario([hash_entrada(n.strip(), v.strip()) for n, v in programas], version)
+
+
+# =============================
+# EJECUCIÓN
+# =============================
+
+# Comprueba un bloque de casos (se ejecuta en cada proceso). Los casos se generan
+# aquí a partir de la semilla, y se trabaja sobre un único diccionario
+# normalizado en el que solo se sustituye el atributo perturbado.
+def _ejecutar_bloque(trabajo):
+    raw, programas, attr, familia, semilla, n, canonica, max_ejemplos = trabajo
+    rng = random.Random(semilla)
+    normalizador = dict(plan_normalizacion())[attr]
+    normalizados = {a: f(raw.get(a, "")) for a, f in plan_normalizacion()}
+
+    if canonica == CANONICA_V2:
+        his = calcular_his_v2
+    else:
+        def his(norm):
+            return calcular_his(canonicar(norm))
+    his_base = his(normalizados)
+
+    if familia in FAMILIAS_INVENTARIO:
+        mutador, esperado = FAMILIAS_INVENTARIO[familia]
+        hashes_base = [hash_entrada(n.strip(), v.strip()) for n, v in programas]
+    else:
+        mutador, dentro, esperados = FAMILIAS[familia]
+        esperado = esperados[tipo_atributo(attr)]
+        valor_base = raw.get(attr, "")
+        zona = _zona(valor_base, tipo_atributo(attr), dentro)
+
+    casos = violaciones = 0
+    ejemplos = []
+    for _ in range(n):
+        if familia in FAMILIAS_INVENTARIO:
+            cambio = mutador(programas, rng)
+            if cambio is None:
+                continue
+            if isinstance(cambio, list):
+                original, mutado = programas, cambio
+                valor = hash_inventario([hash_entrada(a.strip(), b.strip()) for a, b in cambio])
+            else:
+                i, nombre, version = cambio
+                original, mutado = programas[i], (nombre, version)
+                hashes = list(hashes_base)
+                hashes[i] = hash_entrada(nombre.strip(), version.strip())
+                valor = hash_inventario(hashes)
+        else:
+            if zona is None:
+                break
+            valor = mutador(valor_base, rng, zona)
+            if valor is None or valor == valor_base:
+                continue
+            original, mutado = valor_base, valor
+
+        casos += 1
+        normalizados[attr] = normalizador(valor)
+        cambia = his(normalizados) != his_base
+        if cambia != (esperado == SENSIBLE):
+            violaciones += 1
+            if len(ejemplos) < max_ejemplos:
+                ejemplos.append({"original": original, "mutado": mutado})
+    return attr, familia, esperado, casos, violaciones, ejemplos
+
+
+# Trabajos (atributo, familia, bloque) con una semilla distinta cada uno
+def trabajos_mutacion(raw=RAW_BASE, programas=PROGRAMAS_BASE, casos=10_000, semilla=0,
+                      canonica=CANONICA_V1, tamano_bloque=TAMANO_BLOQUE, max_ejemplos=MAX_EJEMPLOS):
+    raw = dict(raw)
+    programas = tuple(programas or ())
+    if programas:
+        raw[ATRIBUTO_INVENTARIO] = valor_inventario(programas)
+
+    combinaciones = []
+    for attr, _ in plan_normalizacion():
+        tipo = tipo_atributo(attr)
+        combinaciones += [(attr, f) for f, (_, _, esperados) in FAMILIAS.items() if tipo in esperados]
+        if attr == ATRIBUTO_INVENTARIO and programas:
+            combinaciones += [(attr, f) for f in FAMILIAS_INVENTARIO]
+
+    trabajos = []
+    for attr, familia in combinaciones:
+        for i, inicio in enumerate(range(0, casos, tamano_bloque)):
+            # Semilla en texto: random la convierte igual en todos los procesos
+            trabajos.append((raw, programas, attr, familia, f"{semilla}:{attr}:{familia}:{i}",
+                             min(tamano_bloque, casos - inicio), canonica, max_ejemplos))
+    return trabajos
+
+
+# Ejecuta 'casos' perturbaciones de cada familia en cada atributo al que se aplica,
+# repartidas entre 'procesos' procesos. Devuelve el resumen por (atributo, familia).
+def ejecutar_mutaciones(raw=RAW_BASE, programas=PROGRAMAS_BASE, casos=10_000, procesos=1, semilla=0,
+                        canonica=CANONICA_V1, tamano_bloque=TAMANO_BLOQUE, max_ejemplos=MAX_EJEMPLOS):
+    trabajos = trabajos_mutacion(raw, programas, casos, semilla, canonica, tamano_bloque, max_ejemplos)
+
+    t0 = time.perf_counter()
+    if procesos <= 1:
+        resultados = [_ejecutar_bloque(trabajo) for trabajo in trabajos]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = list(pool.map(_ejecutar_bloque, trabajos))
+    segundos = time.perf_counter() - t0
+
+    familias = {}
+    for attr, familia, esperado, casos_bloque, violaciones, ejemplos in resultados:
+        r = familias.setdefault((attr, familia), {
+            "atributo": attr, "familia": familia, "esperado": esperado,
+            "casos": 0, "violaciones": 0, "ejemplos": [],
+        })
+        r["casos"] += casos_bloque
+        r["violaciones"] += violaciones
+        r["ejemplos"] += ejemplos[:max_ejemplos - len(r["ejemplos"])]
+
+    total = sum(r["casos"] for r in familias.values())
+    return {
+        "canonica": canonica,
+        "casos": total,
+        "violaciones": sum(r["violaciones"] for r in familias.values()),
+        "segundos": segundos,
+        "casos_s": total / segundos if segundos > 0 else 0.0,
+        "familias": list(familias.values()),
+    }
+
+
+# Informe de texto del resumen: una línea por (atributo, familia) y los ejemplos de violación
+def informe(resumen, solo_violaciones=False):
+    lineas = [f"{'atributo':24s} {'familia':20s} {'esperado':10s} {'casos':>8s} {'violaciones':>11s}"]
+    for r in resumen["familias"]:
+        if solo_violaciones and not r["violaciones"]:
+            continue
+        lineas.append(f"{r['atributo']:24s} {r['familia']:20s} {r['esperado']:10s} "
+                      f"{r['casos']:8d} {r['violaciones']:11d}")
+        for ejemplo in r["ejemplos"]:
+            lineas.append(f"    {ejemplo['original']!r} -> {ejemplo['mutado']!r}")
+    lineas.append(f"\n{resumen['casos']} casos, {resumen['violaciones']} violaciones "
+                  f"(forma canónica v{resumen['canonica']}) en {resumen['segundos']:.2f} s "
+                  f"({resumen['casos_s'] * 60:.0f} casos/min)")
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Perturbaciones de atributos e invariantes del HIS")
+    parser.add_argument("--casos", type=int, default=10_000, help="Casos por atributo y familia")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--canonica", type=int, choices=(CANONICA_V1, CANONICA_V2), default=CANONICA_V1)
+    parser.add_argument("--solo-violaciones", action="store_true")
+    args = parser.parse_args(argv)
+
+    resumen = ejecutar_mutaciones(casos=args.casos, procesos=args.procesos, semilla=args.semilla,
+                                  canonica=args.canonica)
+    print(informe(resumen, args.solo_violaciones))
+    return 1 if resumen["violaciones"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,12 @@
 import re
+import sys
+import struct
 import hashlib
+import functools
 from enum import Enum, auto
 
+from metricas import instrumentar
+
 # =============================
 # POLÍTICA DE CASE
 # =============================
@@ -27,6 +32,11 @@ ATTRIBUTE_POLICY = {
 HEX_CHARS_RE = re.compile(r'[^0-9A-F]', re.IGNORECASE)
 VERSION_NUM_RE = re.compile(r"(\d+-\d+(?:\.\d+)*)")
 
+# Caracteres hexadecimales válidos (en ambos cases)
+HEX_CHARS = frozenset("0123456789abcdefABCDEF")
+# Tabla para str.translate que elimina los separadores habituales de MACs y hashes
+TABLA_SEPARADORES = str.maketrans("", "", " \t\n\r\v\f:-.")
+
 # Elimina los espacios en blanco alrededor y convierte a cadena
 def limpiar_basico(s):
     if s is None:
@@ -45,20 +55,25 @@ def normalizar_case(val, policy: CasePolicy):
 # NORMALIZADORES ESPECÍFICOS
 # =============================
 
+# Deja solo los caracteres hexadecimales. Los separadores se quitan con
+# str.translate y solo se recurre a la expresión regular si queda algún
+# carácter no hexadecimal.
+def _solo_hex(s):
+    s = s.translate(TABLA_SEPARADORES)
+    if not HEX_CHARS.issuperset(s):
+        s = HEX_CHARS_RE.sub('', s)
+    return s
+
 # Elimina separadores, pasa a mayúsculas
 def normalizar_mac(mac):
-    s = limpiar_basico(mac)
-    s = HEX_CHARS_RE.sub('', s)
-    return s.upper()
+    return _solo_hex(limpiar_basico(mac)).upper()
 
 # Elimina prefijo 0x, separadores, pasa a mayúsculas
 def normalizar_hash_hex(h):
     s = limpiar_basico(h)
-    if s.lower().startswith("0x"):
+    if s[:2] in ("0x", "0X"):
         s = s[2:]
-    s = re.sub(r'[\s:-]', '', s)
-    s = HEX_CHARS_RE.sub('', s)
-    return s.upper()
+    return _solo_hex(s).upper()
 
 # Extrae la parte numérica de la versión
 def normalizar_version(v):
@@ -67,64 +82,247 @@ def normalizar_version(v):
     return m.group(1) if m else ""
 
 
+# =============================
+# REGISTRO COMPACTO
+# =============================
+
+# Atributos de un registro compacto (los de ATTRIBUTE_POLICY al importar el módulo)
+CAMPOS = tuple(ATTRIBUTE_POLICY)
+# Los mismos en el orden de la forma canónica
+_CAMPOS_ORDENADOS = tuple(sorted(CAMPOS))
+
+
+class Atributos:
+    """
+    Registro con los atributos de un dispositivo en __slots__, en lugar de un
+    diccionario: ocupa bastante menos y se lee como un diccionario de solo
+    lectura (registro["cpu_id"], get, keys, items...), así que se puede pasar
+    a normalizar_atributos, canonicar o calcular_his_v2. normalizar_atributos
+    devuelve otro Atributos cuando recibe uno.
+    """
+
+    __slots__ = CAMPOS
+
+    def __init__(self, *valores, **por_nombre):
+        if len(valores) > len(CAMPOS):
+            raise TypeError(f"Atributos admite como mucho {len(CAMPOS)} valores ({len(valores)} dados)")
+        for campo, valor in zip(CAMPOS, valores):
+            setattr(self, campo, valor)
+        if por_nombre:
+            repetidos = [campo for campo in CAMPOS[:len(valores)] if campo in por_nombre]
+            if repetidos:
+                raise TypeError(f"Atributos repetidos: {', '.join(repetidos)}")
+        for campo in CAMPOS[len(valores):]:
+            setattr(self, campo, por_nombre.pop(campo, ""))
+        if por_nombre:
+            raise TypeError(f"Atributos desconocidos: {', '.join(sorted(por_nombre))}")
+
+    # Crea el registro a partir de un diccionario (claves en cualquier case)
+    @classmethod
+    def desde_dict(cls, datos):
+        if not all(map(str.islower, datos)):
+            datos = {k.lower(): v for k, v in datos.items()}
+        return cls(*[datos.get(campo, "") for campo in CAMPOS])
+
+    def a_dict(self):
+        return {campo: getattr(self, campo) for campo in CAMPOS}
+
+    def __getitem__(self, campo):
+        # Solo los campos: registro["keys"] no debe devolver el método
+        if campo not in CAMPOS:
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def get(self, campo, defecto=None):
+        return getattr(self, campo, defecto) if campo in CAMPOS else defecto
+
+    def keys(self):
+        return CAMPOS
+
+    def values(self):
+        return [getattr(self, campo) for campo in CAMPOS]
+
+    # Pares (atributo, valor); ya vienen en el orden de la forma canónica
+    def items(self):
+        return [(campo, getattr(self, campo)) for campo in _CAMPOS_ORDENADOS]
+
+    def __iter__(self):
+        return iter(CAMPOS)
+
+    def __len__(self):
+        return len(CAMPOS)
+
+    def __contains__(self, campo):
+        return campo in CAMPOS
+
+    def __eq__(self, otro):
+        if isinstance(otro, Atributos):
+            return self.values() == otro.values()
+        if isinstance(otro, dict):
+            return self.a_dict() == otro
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Atributos({', '.join(f'{c}={getattr(self, c)!r}' for c in CAMPOS)})"
+
+
 # =============================
 # NORMALIZACIÓN PRINCIPAL
 # =============================
 
+# Normalizadores específicos por atributo. Los atributos que no aparecen
+# aquí se normalizan con normalizar_case según su política de ATTRIBUTE_POLICY.
+NORMALIZADORES = {
+    # MACs: se limpian de separadores (:, -, .) y se pasan a mayúsculas
+    "mac_original": normalizar_mac,
+
+    # Hashes hexadecimales: se eliminan prefijo 0x y caracteres extra
+    "firmware_hash": normalizar_hash_hex,
+    "public_key_fingerprint": normalizar_hash_hex,
+    "software_inventory_hash": normalizar_hash_hex,
+
+    # La versión del sistema operativo se extrae de la cadena completa
+    "os_version": normalizar_version,
+}
+
+# Equivalentes a normalizar_case con la política ya fijada
+_NORMALIZADOR_CASE = {
+    CasePolicy.SENSITIVE: limpiar_basico,
+    CasePolicy.INSENSITIVE: lambda val: limpiar_basico(val).upper(),
+}
+
+# Plan de normalización precompilado: tupla de (atributo, función normalizadora)
+_PLAN = ()
+
+# Atributos memoizados {atributo: tamaño máximo de su caché} y sus normalizadores
+# con caché (ver activar_memoizacion)
+_MEMOIZACION = {}
+_MEMOIZADOS = {}
+
+# Si el plan cubre exactamente los campos de Atributos, normalizar un Atributos
+# devuelve otro Atributos; si se han registrado otros atributos, un diccionario
+_PLAN_EN_REGISTRO = False
+
+
+# Construye el plan a partir de ATTRIBUTE_POLICY y NORMALIZADORES.
+# Debe volver a llamarse si se modifica alguno de los dos directamente.
+def compilar_plan():
+    global _PLAN, _PLAN_EN_REGISTRO
+    plan = []
+    _MEMOIZADOS.clear()
+    for attr, policy in ATTRIBUTE_POLICY.items():
+        normalizador = NORMALIZADORES.get(attr) or _NORMALIZADOR_CASE[policy]
+        if attr in _MEMOIZACION:
+            normalizador = _MEMOIZADOS[attr] = _memoizar(normalizador, _MEMOIZACION[attr])
+        plan.append((attr, normalizador))
+    _PLAN = tuple(plan)
+    _PLAN_EN_REGISTRO = tuple(attr for attr, _ in _PLAN) == CAMPOS
+
+
+# Añade (o redefine) un atributo con su política y, opcionalmente, su normalizador
+def registrar_atributo(attr, policy: CasePolicy, normalizador=None):
+    ATTRIBUTE_POLICY[attr] = policy
+    if normalizador is not None:
+        NORMALIZADORES[attr] = normalizador
+    compilar_plan()
+
+
+# Devuelve el plan de normalización vigente
+def plan_normalizacion():
+    return _PLAN
+
+
+# =============================
+# MEMOIZACIÓN (OPCIONAL)
+# =============================
+
+# En una flota muchos valores en crudo se repiten en miles de dispositivos (la
+# misma versión de SO, el mismo firmware o el mismo inventario). Con la
+# memoización activa, el normalizador de esos atributos pasa por una caché LRU
+# acotada por valor en crudo, y el resultado se interna para que todos los
+# registros con el mismo valor normalizado compartan una sola cadena.
+# Está desactivada por defecto. Con ella activa los valores en crudo de esos
+# atributos tienen que ser hashables (los colectores siempre devuelven cadenas).
+
+MEMOIZAR_POR_DEFECTO = ("os_version", "firmware_hash", "software_inventory_hash")
+MAXIMO_MEMOIZACION = 4096
+
+
+def _memoizar(normalizador, maximo):
+    # typed=True: 1 y "1" (o 1 y 1.0) no comparten entrada, porque str() los distingue
+    # wraps: se puede llegar al normalizador original siguiendo __wrapped__
+    @functools.lru_cache(maxsize=maximo, typed=True)
+    @functools.wraps(normalizador)
+    def memoizado(valor):
+        normalizado = normalizador(valor)
+        return sys.intern(normalizado) if type(normalizado) is str else normalizado
+    return memoizado
+
+
+# Activa la memoización de los atributos indicados con una caché de como mucho
+# 'maximo' valores cada uno (se vacían las cachés anteriores)
+def activar_memoizacion(maximo=MAXIMO_MEMOIZACION, atributos=MEMOIZAR_POR_DEFECTO):
+    _MEMOIZACION.clear()
+    _MEMOIZACION.update((attr, maximo) for attr in atributos)
+    compilar_plan()
+
+
+def desactivar_memoizacion():
+    _MEMOIZACION.clear()
+    compilar_plan()
+
+
+# Aciertos, fallos y ocupación de la caché de cada atributo memoizado
+def estadisticas_memoizacion():
+    estadisticas = {}
+    for attr, memoizado in _MEMOIZADOS.items():
+        info = memoizado.cache_info()
+        consultas = info.hits + info.misses
+        estadisticas[attr] = {
+            "aciertos": info.hits,
+            "fallos": info.misses,
+            "tasa_aciertos": info.hits / consultas if consultas else 0.0,
+            "tamano": info.currsize,
+            "maximo": info.maxsize,
+        }
+    return estadisticas
+
+
 # Normaliza todos los atributos según las reglas definidas
+@instrumentar("normalizacion")
 def normalizar_atributos(raw):
-    # Se convierten todas las claves a minúsculas para acceso consistente
-    rd = {k.lower(): v for k, v in raw.items()}
-    
-    # Diccionario donde se guardarán los valores normalizados
-    norm = {}
+    if type(raw) is Atributos:
+        if _PLAN_EN_REGISTRO:
+            return Atributos(*[normalizador(getattr(raw, attr)) for attr, normalizador in _PLAN])
+        return {attr: normalizador(raw.get(attr, "")) for attr, normalizador in _PLAN}
+
+    # Se convierten las claves a minúsculas solo si alguna no lo está ya
+    rd = raw if all(map(str.islower, raw)) else {k.lower(): v for k, v in raw.items()}
+
+    # Si un atributo no existe se usa cadena vacía
+    return {attr: normalizador(rd.get(attr, "")) for attr, normalizador in _PLAN}
 
-    # Se recorre cada atributo y su política de case
-    for attr, policy in ATTRIBUTE_POLICY.items():
-        # Se obtiene el valor del atributo y si no existe usamos cadena vacía
-        val = rd.get(attr, "")
-    
-        # Normalización específica según tipo de atributo
-
-        if attr == "mac_original":
-            # MACs son case-insensitive y deben limpiarse de separadores (:, -, .)
-            # El resultado se convierte a mayúsculas para consistencia
-            norm[attr] = normalizar_mac(val)
-
-        elif attr in {
-            "firmware_hash",
-            "public_key_fingerprint",
-            "software_inventory_hash"
-        }:
-            # Hashes hexadecimales son case-insensitive y deben limpiarse de caracteres extra
-            norm[attr] = normalizar_hash_hex(val)
-
-        elif attr == "os_version":
-            # La versión del sistema operativo se extrae de la cadena completa
-            # Se eliminan sufijos irrelevantes y se obtiene un formato determinista
-            norm[attr] = normalizar_version(val)
-
-        else:
-            # Para todos los demás atributos sensibles al case (SENSITIVE),
-            # se aplica la política definida:
-            # - SENSITIVE: se conserva original
-            # - INSENSITIVE: se convierte a mayúsculas
-            norm[attr] = normalizar_case(val, policy)
-    return norm
+
+compilar_plan()
 
 
 # =============================
 # CANONICALIZACIÓN
 # =============================
 
-# Esta función convierte el diccionario normalizado en una cadena canonizada única y ordenada
-def canonicar(normalized_dict, sep='|', kvsep='='):
-    def limpiar_valor(v):
-        return str(v).replace('\n', '').replace('\r', '').replace('\t', '').strip()
+# Quita los saltos de línea y tabuladores de un valor antes de canonizarlo
+def limpiar_valor_canonico(v):
+    return str(v).replace('\n', '').replace('\r', '').replace('\t', '').strip()
 
+
+# Esta función convierte el diccionario normalizado (o un Atributos) en una cadena canonizada única y ordenada
+@instrumentar("canonicalizacion")
+def canonicar(normalized_dict, sep='|', kvsep='='):
     parts = []
-    for k in sorted(normalized_dict.keys()):
-        parts.append(f"{k}{kvsep}{limpiar_valor(normalized_dict[k])}")
+    for k, v in sorted(normalized_dict.items()):
+        parts.append(f"{k}{kvsep}{limpiar_valor_canonico(v)}")
 
     return sep.join(parts)
 
@@ -134,7 +332,79 @@ def canonicar(normalized_dict, sep='|', kvsep='='):
 # =============================
 
 # Calcula el HIS a partir de la cadena canonizada
+@instrumentar("his")
 def calcular_his(cadena_canonizada):
     h = hashlib.sha256()
     h.update((cadena_canonizada or "").encode("utf-8"))
     return h.hexdigest().upper()
+
+
+# =============================
+# FORMA CANÓNICA V2 (BINARIA)
+# =============================
+
+# Versiones de la forma canónica. La v1 es la cadena 'clave=valor|...' de
+# canonicar + calcular_his y sigue siendo la que se usa por defecto.
+CANONICA_V1 = 1
+CANONICA_V2 = 2
+
+# La v2 empieza por esta etiqueta y después, para cada atributo en orden de nombre:
+#   longitud(clave) + clave + longitud(valor) + valor
+# con las longitudes como uint32 big endian y el texto en UTF-8. Al ir cada campo
+# precedido de su longitud, ningún valor puede confundirse con un separador.
+ETIQUETA_V2 = b"IOTZT-HIS\x00\x02"
+_LONGITUD = struct.Struct(">I").pack
+
+# Hasher con la etiqueta ya procesada; cada HIS v2 parte de una copia
+_SHA256_V2 = hashlib.sha256(ETIQUETA_V2)
+
+# Clave de cada atributo ya codificada con su longitud
+_CLAVES_V2 = {}
+
+
+def _clave_v2(k):
+    codificada = _CLAVES_V2.get(k)
+    if codificada is None:
+        kb = k.encode("utf-8")
+        codificada = _CLAVES_V2[k] = _LONGITUD(len(kb)) + kb
+    return codificada
+
+
+# Trozos de la forma canónica v2, en el orden en que se pasan al hash
+def campos_v2(normalized_dict):
+    yield ETIQUETA_V2
+    for k, v in sorted(normalized_dict.items()):
+        v = str(v).encode("utf-8")
+        yield _clave_v2(k)
+        yield _LONGITUD(len(v))
+        yield v
+
+
+# Forma canónica v2 completa (para depurar o para otras implementaciones)
+def canonicar_v2(normalized_dict):
+    return b"".join(campos_v2(normalized_dict))
+
+
+# HIS v2 en binario (32 bytes). Los campos se pasan al hash uno a uno, sin
+# construir la cadena canónica ni el texto hexadecimal.
+@instrumentar("his_v2")
+def calcular_his_v2(normalized_dict):
+    h = _SHA256_V2.copy()
+    actualizar = h.update
+    for k, v in sorted(normalized_dict.items()):
+        v = str(v).encode("utf-8")
+        actualizar(_clave_v2(k))
+        actualizar(_LONGITUD(len(v)))
+        actualizar(v)
+    return h.digest()
+
+
+# HIS de unos atributos en crudo con la versión de forma canónica pedida.
+# v1 devuelve el texto hexadecimal de siempre; v2, los 32 bytes del digest.
+def generar_his_version(raw, version=CANONICA_V1):
+    normalizados = normalizar_atributos(raw)
+    if version == CANONICA_V2:
+        return calcular_his_v2(normalizados)
+    if version == CANONICA_V1:
+        return calcular_his(canonicar(normalizados))
+    raise ValueError(f"Versión de forma canónica desconocida: {version}")
@@ -0,0 +1,263 @@
+import sys
+import time
+import hashlib
+
+import numpy as np
+
+from normalizacion import (
+    normalizar_atributos,
+    normalizar_mac,
+    normalizar_hash_hex,
+    limpiar_basico,
+    plan_normalizacion
+)
+
+# Filas que se procesan juntas en las operaciones sobre puntos de código.
+# Acota la memoria temporal (matriz filas x longitud máxima).
+TAMANO_BLOQUE = 65536
+
+# Tabla de búsqueda de espacios en blanco (los mismos que elimina str.strip).
+# El último espacio Unicode es U+3000, así que basta con cubrir hasta ahí.
+_MAX_ESPACIO = 0x3000
+_TABLA_ESPACIOS = np.array([chr(c).isspace() for c in range(_MAX_ESPACIO + 1)], dtype=bool)
+
+# Caracteres que limpia canonicar() en cada valor
+_CONTROL_CANONICO = (ord("\t"), ord("\n"), ord("\r"))
+
+
+# =============================
+# CONVERSIÓN DE COLUMNAS
+# =============================
+
+# Convierte una columna a un array de cadenas Unicode (None -> "", como limpiar_basico)
+def _a_texto(columna):
+    arr = np.asarray(columna)
+    if arr.dtype.kind == "U":
+        return arr
+    if arr.size == 0:
+        return np.zeros(0, dtype="<U1")
+    return np.array(["" if v is None else str(v) for v in arr.tolist()])
+
+
+# Vista (filas x caracteres) de los puntos de código de un array de cadenas.
+# Las cadenas más cortas quedan rellenas con ceros al final. Es una vista:
+# las operaciones que modifican la matriz trabajan sobre una copia.
+def _puntos_codigo(arr):
+    ancho = arr.dtype.itemsize // 4
+    if ancho == 0:
+        return np.zeros((len(arr), 0), dtype=np.uint32)
+    return np.ascontiguousarray(arr).view(np.uint32).reshape(len(arr), ancho)
+
+
+# Operación inversa a _puntos_codigo (los ceros finales desaparecen)
+def _a_cadenas(cp):
+    filas, ancho = cp.shape
+    if ancho == 0:
+        return np.zeros(filas, dtype="<U1")
+    return np.ascontiguousarray(cp).view(np.dtype(("U", ancho))).reshape(filas)
+
+
+# =============================
+# OPERACIONES VECTORIZADAS
+# =============================
+
+# Desplaza a la izquierda los caracteres marcados en 'mantener' y descarta el resto.
+# Solo se reordenan las filas en las que realmente se elimina algún carácter.
+def _compactar(cp, mantener):
+    cambia = (mantener != (cp != 0)).any(axis=1)
+    if not cambia.any():
+        return cp
+    sub, sub_mantener = cp[cambia], mantener[cambia]
+    filas, ancho = sub.shape
+    destino = np.cumsum(sub_mantener, axis=1) - 1
+    indice_fila = np.broadcast_to(np.arange(filas)[:, None], (filas, ancho))
+    compactadas = np.zeros_like(sub)
+    compactadas[indice_fila[sub_mantener], destino[sub_mantener]] = sub[sub_mantener]
+    cp = cp.copy()
+    cp[cambia] = compactadas
+    return cp
+
+
+def _es_espacio(cp):
+    return (cp <= _MAX_ESPACIO) & _TABLA_ESPACIOS[np.minimum(cp, _MAX_ESPACIO)]
+
+
+# Equivalente vectorizado de str.strip() (o de str.lstrip() si solo_izquierda).
+# Primero se miran solo los extremos de cada fila: si ninguna empieza ni
+# termina en espacio no hay nada que hacer.
+def _strip(cp, solo_izquierda=False):
+    filas, ancho = cp.shape
+    if ancho == 0:
+        return cp
+    longitud = np.count_nonzero(cp, axis=1)
+    con_espacios = _es_espacio(cp[:, 0])
+    if not solo_izquierda:
+        con_espacios |= _es_espacio(cp[np.arange(filas), np.maximum(longitud - 1, 0)])
+    con_espacios &= longitud > 0
+    if not con_espacios.any():
+        return cp
+
+    sub = cp[con_espacios]
+    util = ~(_es_espacio(sub) | (sub == 0))
+    hay = util.any(axis=1)
+    inicio = np.argmax(util, axis=1)
+    posiciones = np.arange(ancho)
+    mantener = (posiciones >= inicio[:, None]) & hay[:, None] & (sub != 0)
+    if not solo_izquierda:
+        fin = ancho - np.argmax(util[:, ::-1], axis=1)
+        mantener &= posiciones < fin[:, None]
+    cp = cp.copy()
+    cp[con_espacios] = _compactar(sub, mantener)
+    return cp
+
+
+# Equivalente vectorizado de normalizar_mac / normalizar_hash_hex:
+# se eliminan los caracteres no hexadecimales y se pasa a mayúsculas
+def _solo_hex(cp, prefijo_0x):
+    if prefijo_0x:
+        # El prefijo 0x solo cuenta tras quitar los espacios iniciales
+        cp = _strip(cp, solo_izquierda=True)
+        if cp.shape[1] >= 2:
+            con_prefijo = (cp[:, 0] == ord("0")) & ((cp[:, 1] == ord("x")) | (cp[:, 1] == ord("X")))
+            if con_prefijo.any():
+                # Se desplazan esas filas dos posiciones a la izquierda
+                cp = cp.copy()
+                cp[con_prefijo, :-2] = cp[con_prefijo, 2:]
+                cp[con_prefijo, -2:] = 0
+    es_minus = (cp >= ord("a")) & (cp <= ord("f"))
+    es_hex = es_minus | ((cp >= ord("0")) & (cp <= ord("9"))) | ((cp >= ord("A")) & (cp <= ord("F")))
+    cp = np.subtract(cp, np.uint32(32), out=cp.copy(), where=es_minus)
+    return _compactar(cp, es_hex)
+
+
+# Limpieza de valores de canonicar(): quita tabuladores y saltos de línea y hace strip
+def _limpiar_valor(cp):
+    mantener = cp != 0
+    for c in _CONTROL_CANONICO:
+        mantener &= cp != c
+    return _strip(_compactar(cp, mantener))
+
+
+# Aplica una operación sobre puntos de código a una columna, por bloques de filas
+def _por_bloques(arr, operacion, tamano_bloque):
+    if len(arr) == 0:
+        return np.zeros(0, dtype="<U1")
+    partes = [
+        _a_cadenas(operacion(_puntos_codigo(arr[i:i + tamano_bloque])))
+        for i in range(0, len(arr), tamano_bloque)
+    ]
+    return np.concatenate(partes) if len(partes) > 1 else partes[0].copy()
+
+
+# Para normalizadores sin equivalente vectorizado (p. ej. normalizar_version):
+# se normaliza una sola vez cada valor distinto y se reparte el resultado
+def _por_valores_unicos(arr, normalizador):
+    if len(arr) == 0:
+        return np.zeros(0, dtype="<U1")
+    unicos, inverso = np.unique(arr, return_inverse=True)
+    normalizados = np.array([normalizador(v) for v in unicos.tolist()])
+    return normalizados[inverso.reshape(-1)]
+
+
+# Equivalentes vectorizados de los normalizadores escalares conocidos
+_OPERACIONES = {
+    normalizar_mac: lambda cp: _solo_hex(cp, prefijo_0x=False),
+    normalizar_hash_hex: lambda cp: _solo_hex(cp, prefijo_0x=True),
+    limpiar_basico: _strip,
+}
+
+
+def _normalizar_columna(arr, normalizador, tamano_bloque):
+    # Los normalizadores memoizados (activar_memoizacion) envuelven al original
+    original = normalizador
+    while hasattr(original, "__wrapped__"):
+        original = original.__wrapped__
+    operacion = _OPERACIONES.get(original)
+    if operacion is not None:
+        return _por_bloques(arr, operacion, tamano_bloque)
+    return _por_valores_unicos(arr, normalizador)
+
+
+# =============================
+# API COLUMNAR
+# =============================
+
+# Normaliza un diccionario {atributo: columna}. Devuelve {atributo: array de cadenas}
+# con el mismo resultado que normalizar_atributos aplicado fila a fila.
+def normalizar_columnas(columnas, tamano_bloque=TAMANO_BLOQUE):
+    cols = {k.lower(): _a_texto(v) for k, v in columnas.items()}
+
+    longitudes = {len(v) for v in cols.values()}
+    if len(longitudes) > 1:
+        raise ValueError("Todas las columnas deben tener el mismo número de filas")
+    filas = longitudes.pop() if longitudes else 0
+
+    norm = {}
+    for attr, normalizador in plan_normalizacion():
+        if attr in cols:
+            norm[attr] = _normalizar_columna(cols[attr], normalizador, tamano_bloque)
+        else:
+            # Columna ausente: igual que un atributo que falta en el diccionario
+            norm[attr] = np.full(filas, normalizador(""))
+    return norm
+
+
+# Equivalente columnar de canonicar() con los separadores por defecto
+def canonicar_columnas(normalizadas, tamano_bloque=TAMANO_BLOQUE):
+    canonicas = None
+    for k in sorted(normalizadas):
+        valor = _por_bloques(np.asarray(normalizadas[k]), _limpiar_valor, tamano_bloque)
+        campo = np.char.add(f"{k}=", valor)
+        canonicas = campo if canonicas is None else np.char.add(np.char.add(canonicas, "|"), campo)
+    return canonicas
+
+
+# Calcula el HIS de cada cadena canónica (mismo formato que calcular_his)
+def calcular_his_columnas(canonicas):
+    sha256 = hashlib.sha256
+    return np.array(
+        [sha256(c.encode("utf-8")).hexdigest().upper() for c in canonicas.tolist()],
+        dtype="<U64"
+    )
+
+
+# Cadena completa columnar: columnas en crudo -> HIS de cada fila
+def generar_his_columnas(columnas, tamano_bloque=TAMANO_BLOQUE):
+    normalizadas = normalizar_columnas(columnas, tamano_bloque)
+    return calcular_his_columnas(canonicar_columnas(normalizadas, tamano_bloque))
+
+
+# =============================
+# BENCHMARK
+# =============================
+
+# Compara la normalización columnar con el bucle fila a fila sobre 'n' registros sintéticos
+def ejecutar_benchmark(n=1_000_000):
+    from lotes import registros_sinteticos
+
+    filas = list(registros_sinteticos(n))
+    columnas = {attr: np.array([r[attr] for r in filas]) for attr in filas[0]}
+
+    t0 = time.perf_counter()
+    por_filas = [normalizar_atributos(r) for r in filas]
+    t_filas = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    columnar = normalizar_columnas(columnas)
+    t_columnar = time.perf_counter() - t0
+
+    # Se comprueba la equivalencia exacta con el camino fila a fila
+    for attr, valores in columnar.items():
+        assert valores.tolist() == [r[attr] for r in por_filas], attr
+
+    return {"filas": n, "fila_a_fila_s": t_filas, "columnar_s": t_columnar,
+            "mejora": t_filas / t_columnar if t_columnar > 0 else 0.0}
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    res = ejecutar_benchmark(n)
+    print(f"Filas:        {res['filas']}")
+    print(f"Fila a fila:  {res['fila_a_fila_s']:.3f} s")
+    print(f"Columnar:     {res['columnar_s']:.3f} s")
+    print(f"Mejora:       {res['mejora']:.1f}x")
@@ -0,0 +1,59 @@
+import os
+import sys
+import importlib
+
+# =============================
+# BACKENDS DE RECOLECCIÓN
+# =============================
+
+# Módulo que implementa los colectores de cada plataforma. Cada módulo expone
+# COLECTORES = {atributo: función} con los mismos nombres de atributo.
+# Solo se importa el backend que se usa.
+BACKENDS = {
+    "windows": "atributos",
+    "linux": "backend_linux",
+}
+
+# Variable de entorno para forzar un backend concreto
+VARIABLE_BACKEND = "IOTZT_BACKEND"
+
+
+# Backend que corresponde al sistema actual
+def backend_por_defecto():
+    nombre = os.environ.get(VARIABLE_BACKEND)
+    if nombre:
+        return nombre
+    return "windows" if sys.platform == "win32" else "linux"
+
+
+# Añade un backend nuevo (nombre del módulo que define COLECTORES)
+def registrar_backend(nombre, modulo):
+    BACKENDS[nombre] = modulo
+
+
+# Devuelve el módulo del backend pedido (se importa en este momento)
+def obtener_backend(nombre=None):
+    nombre = nombre or backend_por_defecto()
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {nombre} (disponibles: {', '.join(sorted(BACKENDS))})")
+    return importlib.import_module(BACKENDS[nombre])
+
+
+# Devuelve los colectores {atributo: función} del backend pedido
+def obtener_colectores(nombre=None):
+    return obtener_backend(nombre).COLECTORES
+
+
+# Obtiene todos los atributos en crudo con el backend pedido
+def recoger_atributos(nombre=None):
+    return {attr: colector() for attr, colector in obtener_colectores(nombre).items()}
+
+
+if __name__ == "__main__":
+    import time
+    t0 = time.perf_counter()
+    raw = recoger_atributos(sys.argv[1] if len(sys.argv) > 1 else None)
+    duracion = time.perf_counter() - t0
+    for k, v in raw.items():
+        print(f"{k}: {v}")
+    print(f"\nRecogidos en {duracion * 1000:.1f} ms")
@@ -0,0 +1,74 @@
+import time
+import threading
+
+from sentinelas import SENTINELAS
+
+# Plazo por defecto (segundos) para cada colector
+TIMEOUT_POR_DEFECTO = 10.0
+
+# Estados posibles de cada colector en el informe
+OK = "ok"
+ERROR = "error"
+TIMEOUT = "timeout"
+
+
+# =============================
+# RECOLECCIÓN CONCURRENTE
+# =============================
+
+# Ejecuta todos los colectores {atributo: colector} a la vez, cada uno en su hilo.
+#
+# Cada colector tiene un plazo ('timeouts' por atributo o 'timeout' general)
+# contado desde el inicio. Si no termina a tiempo, o lanza una excepción, se usa
+# su valor de reserva de 'sentinelas'. Los hilos son daemon: un colector colgado
+# (p. ej. una consulta WMI) no impide terminar el proceso.
+#
+# 'inicializador' se llama al empezar cada hilo (WMI necesita CoInitialize).
+#
+# Devuelve (atributos en crudo, informe) donde el informe indica, por atributo,
+# el estado (ok / error / timeout), los segundos empleados y el valor de reserva usado.
+def recoger_concurrente(colectores, timeout=TIMEOUT_POR_DEFECTO, timeouts=None,
+                        sentinelas=SENTINELAS, inicializador=None):
+    timeouts = timeouts or {}
+    resultados = {}
+    inicio = time.perf_counter()
+
+    def ejecutar(attr, colector):
+        try:
+            if inicializador is not None:
+                inicializador()
+            estado, valor = OK, colector()
+        except Exception as e:
+            estado, valor = ERROR, e
+        resultados[attr] = (estado, valor, time.perf_counter() - inicio)
+
+    hilos = {}
+    for attr, colector in colectores.items():
+        hilo = threading.Thread(target=ejecutar, args=(attr, colector),
+                                name=f"colector-{attr}", daemon=True)
+        hilo.start()
+        hilos[attr] = hilo
+
+    # Se espera a cada hilo como mucho hasta su plazo, empezando por el más corto
+    plazos = {attr: timeouts.get(attr, timeout) for attr in colectores}
+    for attr in sorted(hilos, key=plazos.get):
+        restante = plazos[attr] - (time.perf_counter() - inicio)
+        hilos[attr].join(max(restante, 0))
+
+    raw = {}
+    informe = {}
+    for attr in colectores:
+        resultado = resultados.get(attr)
+        reserva = sentinelas.get(attr, "")
+        if resultado is None:
+            # Sigue en ejecución: se abandona y se usa el valor de reserva
+            raw[attr] = reserva
+            informe[attr] = {"estado": TIMEOUT, "segundos": plazos[attr], "reserva": reserva}
+        elif resultado[0] == ERROR:
+            raw[attr] = reserva
+            informe[attr] = {"estado": ERROR, "segundos": resultado[2], "reserva": reserva,
+                             "error": repr(resultado[1])}
+        else:
+            raw[attr] = resultado[1]
+            informe[attr] = {"estado": OK, "segundos": resultado[2], "reserva": None}
+    return raw, informe
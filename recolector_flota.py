@@ -0,0 +1,601 @@
+import sys
+import json
+import time
+import random
+import asyncio
+from collections import OrderedDict
+
+from lotes import generar_his, registros_sinteticos
+from benchmark import percentil
+from servidor_verificacion import MAX_LINEA, ERROR, verificar
+
+# ==================================================
+# RECOLECCIÓN DE ATRIBUTOS DESDE AGENTES REMOTOS
+# ==================================================
+
+# Para los dispositivos que no pueden enviar sus informes, el verificador los
+# pide. Cada dispositivo ejecuta un agente que responde con sus atributos en
+# crudo (los de atributos.py / el backend de su plataforma), con el mismo
+# formato que el servidor de verificación: un JSON por línea en cada sentido.
+#
+#   {"id": 1, "op": "atributos"}
+#   {"id": 1, "resultado": "atributos", "dispositivo": "disp-1", "atributos": {...}}
+#
+# El recolector mantiene las conexiones abiertas entre rondas (pool), limita
+# las peticiones en vuelo, aplica un plazo por dispositivo, reintenta los
+# fallos de red y pasa cada respuesta por el pipeline del HIS.
+
+PUERTO_AGENTE = 7879
+
+# Peticiones en vuelo a la vez y plazo por intento (s)
+MAX_CONCURRENCIA = 256
+TIMEOUT_POR_DEFECTO = 5.0
+# Reintentos tras el primer intento; la espera entre ellos se duplica
+REINTENTOS = 2
+ESPERA_REINTENTO = 0.1
+# Conexiones inactivas que guarda el pool (en total); por encima se cierran las más antiguas
+MAX_INACTIVAS = 4096
+
+ATRIBUTOS = "atributos"
+_PETICION = b'{"op": "atributos"}\n'
+
+
+class ErrorAgente(Exception):
+    pass
+
+
+# Dirección de un agente a partir de "host[:puerto]", "[ipv6][:puerto]" o "unix:/ruta".
+# Sin puerto se usa PUERTO_AGENTE; una IPv6 sin corchetes no puede llevar puerto.
+def direccion_de(texto):
+    if texto.startswith("unix:"):
+        return texto[len("unix:"):]
+    if texto.startswith("["):
+        host, cierre, resto = texto[1:].partition("]")
+        if not cierre or (resto and not resto.startswith(":")):
+            raise ValueError(f"Dirección no válida: {texto}")
+        puerto = resto[1:]
+    elif texto.count(":") == 1:
+        host, _, puerto = texto.partition(":")
+    else:
+        host, puerto = texto, ""
+    return (host or "127.0.0.1", int(puerto) if puerto else PUERTO_AGENTE)
+
+
+async def _conectar(direccion):
+    if isinstance(direccion, str):
+        return await asyncio.open_unix_connection(direccion, limit=MAX_LINEA)
+    return await asyncio.open_connection(direccion[0], direccion[1], limit=MAX_LINEA)
+
+
+async def _cerrar_escritor(escritor):
+    try:
+        escritor.close()
+        await escritor.wait_closed()
+    except (ConnectionError, OSError):
+        pass
+
+
+# =============================
+# POOL DE CONEXIONES
+# =============================
+
+class PoolConexiones:
+    """
+    Conexiones abiertas con los agentes, por dirección, para reutilizarlas en
+    la siguiente ronda en lugar de volver a conectar. Solo se guardan las
+    conexiones que han terminado bien su última petición; si hay más de
+    'max_inactivas', se cierran las de las direcciones usadas hace más tiempo.
+    Las conexiones son de un bucle de eventos: si se usa el pool desde otro
+    (otro asyncio.run), se abandonan las que quedaban.
+    """
+
+    def __init__(self, max_inactivas=MAX_INACTIVAS):
+        self.max_inactivas = max_inactivas
+        self.inactivas = OrderedDict()
+        self.total_inactivas = 0
+        self.nuevas = 0
+        self.reutilizadas = 0
+        self._bucle = None
+
+    def _comprobar_bucle(self):
+        bucle = asyncio.get_running_loop()
+        if bucle is self._bucle:
+            return
+        for libres in self.inactivas.values():
+            for _, escritor in libres:
+                try:
+                    escritor.close()
+                except RuntimeError:
+                    # Su bucle ya está cerrado y con él el socket
+                    pass
+        self.inactivas.clear()
+        self.total_inactivas = 0
+        self._bucle = bucle
+
+    # Devuelve (conexión, reutilizada)
+    async def obtener(self, direccion):
+        self._comprobar_bucle()
+        libres = self.inactivas.get(direccion)
+        while libres:
+            lector, escritor = libres.pop()
+            self.total_inactivas -= 1
+            if not libres:
+                del self.inactivas[direccion]
+            if not escritor.is_closing() and not lector.at_eof():
+                self.reutilizadas += 1
+                return (lector, escritor), True
+            escritor.close()
+
+        conexion = await _conectar(direccion)
+        self.nuevas += 1
+        return conexion, False
+
+    def devolver(self, direccion, conexion):
+        self._comprobar_bucle()
+        self.inactivas.setdefault(direccion, []).append(conexion)
+        self.inactivas.move_to_end(direccion)
+        self.total_inactivas += 1
+        while self.total_inactivas > self.max_inactivas:
+            antigua, libres = next(iter(self.inactivas.items()))
+            libres.pop(0)[1].close()
+            self.total_inactivas -= 1
+            if not libres:
+                del self.inactivas[antigua]
+
+    def descartar(self, conexion):
+        conexion[1].close()
+
+    async def cerrar(self):
+        self._comprobar_bucle()
+        escritores = [escritor for libres in self.inactivas.values() for _, escritor in libres]
+        self.inactivas.clear()
+        self.total_inactivas = 0
+        await asyncio.gather(*(_cerrar_escritor(e) for e in escritores))
+
+
+# =============================
+# RECOLECTOR
+# =============================
+
+class RecolectorFlota:
+    """
+    Pide los atributos a muchos agentes a la vez y calcula el HIS de cada uno.
+
+    - Como mucho 'max_concurrencia' peticiones en vuelo (el resto espera turno;
+      las esperas entre reintentos no ocupan turno).
+    - Cada intento tiene un plazo de 'timeout' segundos, conexión incluida.
+    - Los fallos de red, las respuestas cortadas y los plazos vencidos se
+      reintentan hasta 'reintentos' veces; una respuesta de error del agente
+      no. Si una conexión reutilizada resulta estar cerrada se vuelve a
+      conectar sin gastar un reintento.
+    - Con 'registro' (RegistroDispositivos o IndiceHIS) además se verifica el
+      HIS, igual que en el servidor de verificación.
+
+    Se puede usar en varios asyncio.run seguidos; cerrar() cierra las
+    conexiones del pool y debe llamarse antes de que termine cada bucle.
+    """
+
+    def __init__(self, max_concurrencia=MAX_CONCURRENCIA, timeout=TIMEOUT_POR_DEFECTO, reintentos=REINTENTOS,
+                 espera_reintento=ESPERA_REINTENTO, registro=None, guardar_atributos=False, pool=None):
+        self.max_concurrencia = max_concurrencia
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.espera_reintento = espera_reintento
+        self.registro = registro
+        self.guardar_atributos = guardar_atributos
+        self.pool = pool or PoolConexiones()
+
+        self.dispositivos = 0
+        self.errores = 0
+        self.reintentos_hechos = 0
+        self.timeouts = 0
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+
+    # Una petición por una conexión del pool; la conexión vuelve al pool solo si todo ha ido bien
+    async def _peticion(self, direccion):
+        conexion, reutilizada = await self.pool.obtener(direccion)
+        lector, escritor = conexion
+        try:
+            escritor.write(_PETICION)
+            await escritor.drain()
+            linea = await lector.readline()
+            if not linea:
+                raise ConnectionError("El agente ha cerrado la conexión")
+            respuesta = json.loads(linea)
+        except BaseException as e:
+            self.pool.descartar(conexion)
+            if reutilizada and isinstance(e, ConnectionError):
+                return await self._peticion(direccion)
+            raise
+        self.pool.devolver(direccion, conexion)
+
+        if not isinstance(respuesta, dict) or respuesta.get("resultado") != ATRIBUTOS:
+            error = respuesta.get("error") if isinstance(respuesta, dict) else None
+            raise ErrorAgente(error or f"Respuesta inesperada: {respuesta!r}")
+        if not isinstance(respuesta.get("atributos"), dict):
+            raise ErrorAgente("Respuesta sin atributos")
+        return respuesta
+
+    async def _intento(self, direccion, semaforo):
+        async with semaforo:
+            self.en_vuelo += 1
+            self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+            try:
+                return await asyncio.wait_for(self._peticion(direccion), self.timeout)
+            finally:
+                self.en_vuelo -= 1
+
+    # Atributos y HIS de un dispositivo. 'semaforo' limita las peticiones en vuelo
+    # compartidas con otros dispositivos (recoger crea uno por llamada, dentro
+    # de su bucle de eventos, para que el recolector sirva en varios asyncio.run)
+    async def recoger_dispositivo(self, dispositivo, direccion, semaforo=None):
+        if semaforo is None:
+            semaforo = asyncio.Semaphore(self.max_concurrencia)
+
+        t0 = time.perf_counter()
+        intentos = 0
+        respuesta = None
+        while True:
+            intentos += 1
+            try:
+                respuesta = await self._intento(direccion, semaforo)
+                # Una dirección mal asignada (o un agente suplantado) respondería
+                # con los atributos de otro equipo: no se atribuyen a este
+                if respuesta.get("dispositivo") != dispositivo:
+                    raise ErrorAgente(f"Responde el dispositivo {respuesta.get('dispositivo')!r}, "
+                                      f"no {dispositivo!r}")
+                error = None
+                break
+            except ErrorAgente as e:
+                error = str(e)
+                break
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                error = "timeout"
+            except (OSError, ValueError) as e:
+                error = str(e) or type(e).__name__
+            if intentos > self.reintentos:
+                break
+            self.reintentos_hechos += 1
+            await asyncio.sleep(self.espera_reintento * 2 ** (intentos - 1))
+
+        self.dispositivos += 1
+        resultado = {"dispositivo": dispositivo, "his": None, "intentos": intentos,
+                     "segundos": time.perf_counter() - t0, "error": error}
+        if error is not None:
+            self.errores += 1
+            return resultado
+
+        raw = respuesta["atributos"]
+        if self.registro is not None:
+            verificado = verificar(self.registro, dispositivo, raw)
+            resultado["his"] = verificado["his"]
+            resultado["resultado"] = verificado["resultado"]
+        else:
+            resultado["his"] = generar_his(raw)
+        if self.guardar_atributos:
+            resultado["atributos"] = raw
+        return resultado
+
+    # Recoge todos los dispositivos {dispositivo: dirección}; resultados en el mismo orden
+    async def recoger(self, dispositivos):
+        semaforo = asyncio.Semaphore(self.max_concurrencia)
+        return await asyncio.gather(*(self.recoger_dispositivo(d, direccion, semaforo)
+                                      for d, direccion in dict(dispositivos).items()))
+
+    async def cerrar(self):
+        await self.pool.cerrar()
+
+    def estadisticas(self):
+        return {
+            "dispositivos": self.dispositivos,
+            "errores": self.errores,
+            "reintentos": self.reintentos_hechos,
+            "timeouts": self.timeouts,
+            "conexiones_nuevas": self.pool.nuevas,
+            "conexiones_reutilizadas": self.pool.reutilizadas,
+            "max_en_vuelo": self.max_en_vuelo,
+        }
+
+
+# =============================
+# AGENTE DEL DISPOSITIVO
+# =============================
+
+class AgenteDispositivo:
+    """
+    Servidor asyncio (TCP o socket Unix) que responde con los atributos en
+    crudo del dispositivo. 'proveedor' es una función sin argumentos que
+    devuelve {atributo: valor} (por defecto, agente.recoger con el backend
+    del sistema); se ejecuta en un hilo porque los colectores bloquean.
+    """
+
+    def __init__(self, proveedor=None, dispositivo=None):
+        if proveedor is None:
+            from agente import recoger
+            proveedor = recoger
+        if dispositivo is None:
+            import socket
+            dispositivo = socket.gethostname()
+        self.proveedor = proveedor
+        self.dispositivo = dispositivo
+        self.peticiones = 0
+        self._servidor = None
+
+    async def atributos(self):
+        return await asyncio.get_running_loop().run_in_executor(None, self.proveedor)
+
+    async def iniciar(self, host="127.0.0.1", puerto=PUERTO_AGENTE, unix=None):
+        if unix:
+            self._servidor = await asyncio.start_unix_server(self._atender, path=unix, limit=MAX_LINEA)
+        else:
+            self._servidor = await asyncio.start_server(self._atender, host, puerto, limit=MAX_LINEA)
+        return self._servidor
+
+    # Dirección real de escucha, tal como la usa el recolector
+    def direccion(self):
+        direccion = self._servidor.sockets[0].getsockname()
+        return direccion if isinstance(direccion, str) else tuple(direccion[:2])
+
+    async def cerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+
+    # Respuesta a una petición ya decodificada; None para no responder
+    async def responder(self, peticion):
+        op = peticion.get("op")
+        if op == ATRIBUTOS:
+            respuesta = {"resultado": ATRIBUTOS, "dispositivo": self.dispositivo,
+                         "atributos": await self.atributos()}
+        else:
+            respuesta = {"resultado": ERROR, "error": f"Operación no permitida: {op}"}
+        if "id" in peticion:
+            respuesta["id"] = peticion["id"]
+        return respuesta
+
+    async def _atender(self, lector, escritor):
+        try:
+            while True:
+                try:
+                    linea = await lector.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    escritor.write(b'{"resultado": "error", "error": "Linea demasiado larga"}\n')
+                    break
+                if not linea:
+                    break
+                if not linea.strip():
+                    continue
+
+                self.peticiones += 1
+                try:
+                    peticion = json.loads(linea)
+                    if not isinstance(peticion, dict):
+                        raise ValueError("La petición debe ser un objeto JSON")
+                    respuesta = await self.responder(peticion)
+                except Exception as e:
+                    respuesta = {"resultado": ERROR, "error": str(e)}
+                if respuesta is None:
+                    break
+                escritor.write(json.dumps(respuesta).encode("utf-8") + b"\n")
+                await escritor.drain()
+        except ConnectionError:
+            pass
+        finally:
+            await _cerrar_escritor(escritor)
+
+
+# =============================
+# FLOTA SIMULADA
+# =============================
+
+class AgenteSimulado(AgenteDispositivo):
+    """
+    Agente de pruebas con unos atributos fijos y fallos inyectados:
+    - 'latencia' + un valor aleatorio en [0, 'variacion') segundos por petición
+    - con probabilidad 'fallos' corta la conexión sin responder
+    - si es 'mudo' lee las peticiones pero no responde nunca
+    """
+
+    def __init__(self, raw, dispositivo, latencia=0.0, variacion=0.0, fallos=0.0, mudo=False, semilla=0):
+        super().__init__(lambda: raw, dispositivo)
+        self.raw = raw
+        self.latencia = latencia
+        self.variacion = variacion
+        self.fallos = fallos
+        self.mudo = mudo
+        self._aleatorio = random.Random(semilla)
+
+    async def atributos(self):
+        espera = self.latencia + self.variacion * self._aleatorio.random()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        return self.raw
+
+    async def responder(self, peticion):
+        if self.fallos and self._aleatorio.random() < self.fallos:
+            return None
+        return await super().responder(peticion)
+
+    async def _atender(self, lector, escritor):
+        if not self.mudo:
+            return await super()._atender(lector, escritor)
+        # Sigue leyendo (para ver cuándo cierra el cliente) pero no contesta
+        try:
+            while await lector.readline():
+                self.peticiones += 1
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            await _cerrar_escritor(escritor)
+
+
+class FlotaSimulada:
+    """
+    'n' agentes simulados en este proceso ("disp-0", "disp-1"...), cada uno
+    con su puerto y los atributos de lotes.registros_sinteticos. Una fracción
+    'mudos' de ellos no responde nunca.
+    """
+
+    def __init__(self, n, latencia=0.0, variacion=0.0, fallos=0.0, mudos=0.0, semilla=0):
+        aleatorio = random.Random(semilla)
+        silenciosos = set(aleatorio.sample(range(n), int(n * mudos)))
+        self.agentes = [
+            AgenteSimulado(raw, f"disp-{i}", latencia, variacion, fallos, i in silenciosos, semilla + i)
+            for i, raw in enumerate(registros_sinteticos(n))
+        ]
+
+    async def iniciar(self, host="127.0.0.1"):
+        await asyncio.gather(*(agente.iniciar(host, 0) for agente in self.agentes))
+        return self
+
+    # {dispositivo: dirección} para RecolectorFlota.recoger
+    def direcciones(self):
+        return {agente.dispositivo: agente.direccion() for agente in self.agentes}
+
+    # HIS esperado de cada dispositivo
+    def his_esperados(self):
+        return {agente.dispositivo: generar_his(agente.raw) for agente in self.agentes}
+
+    async def cerrar(self):
+        await asyncio.gather(*(agente.cerrar() for agente in self.agentes))
+
+
+# Informe de una ronda: dispositivos/s y latencia por dispositivo (ms)
+def informe_ronda(resultados, segundos, estadisticas):
+    latencias = sorted(r["segundos"] for r in resultados)
+    return {
+        "dispositivos": len(resultados),
+        "segundos": segundos,
+        "dispositivos_s": len(resultados) / segundos if segundos > 0 else 0.0,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p95_ms": percentil(latencias, 95) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "max_ms": latencias[-1] * 1000 if latencias else 0.0,
+        **estadisticas,
+    }
+
+
+# Arranca una flota simulada y la recoge 'rondas' veces con el mismo recolector
+# (a partir de la segunda ronda se reutilizan las conexiones). Devuelve un informe por ronda.
+async def recoleccion_local(dispositivos=1000, rondas=2, latencia=0.01, variacion=0.0, fallos=0.0, mudos=0.0,
+                            max_concurrencia=MAX_CONCURRENCIA, timeout=TIMEOUT_POR_DEFECTO, reintentos=REINTENTOS,
+                            espera_reintento=ESPERA_REINTENTO):
+    flota = await FlotaSimulada(dispositivos, latencia, variacion, fallos, mudos).iniciar()
+    recolector = RecolectorFlota(max_concurrencia, timeout, reintentos, espera_reintento)
+    try:
+        esperados = flota.his_esperados()
+        informes = []
+        for _ in range(rondas):
+            antes = recolector.estadisticas()
+            t0 = time.perf_counter()
+            resultados = await recolector.recoger(flota.direcciones())
+            segundos = time.perf_counter() - t0
+
+            despues = recolector.estadisticas()
+            ronda = {k: despues[k] - antes[k] for k in despues if k != "max_en_vuelo"}
+            ronda["max_en_vuelo"] = despues["max_en_vuelo"]
+            ronda["his_distintos"] = sum(1 for r in resultados
+                                         if r["his"] is not None and r["his"] != esperados[r["dispositivo"]])
+            informes.append(informe_ronda(resultados, segundos, ronda))
+        return informes
+    finally:
+        await recolector.cerrar()
+        await flota.cerrar()
+
+
+# =============================
+# EJECUCIÓN
+# =============================
+
+async def _servir_agente(args):
+    from functools import partial
+    from agente import recoger
+
+    agente = AgenteDispositivo(partial(recoger, args.backend), args.dispositivo)
+    await agente.iniciar(args.host, args.puerto, args.unix)
+    print(f"Agente {agente.dispositivo} en {args.unix or agente.direccion()}", file=sys.stderr)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await agente.cerrar()
+
+
+async def _recoger(args):
+    with open(args.dispositivos, encoding="utf-8") as archivo:
+        dispositivos = {d: direccion_de(texto) for d, texto in json.load(archivo).items()}
+
+    registro = None
+    if args.registro:
+        from servidor_verificacion import RegistroDispositivos
+        registro = RegistroDispositivos.cargar(args.registro)
+
+    recolector = RecolectorFlota(args.concurrencia, args.timeout, args.reintentos, registro=registro,
+                                 guardar_atributos=args.atributos)
+    try:
+        for resultado in await recolector.recoger(dispositivos):
+            print(json.dumps(resultado, ensure_ascii=False))
+    finally:
+        await recolector.cerrar()
+    print(json.dumps(recolector.estadisticas()), file=sys.stderr)
+    return 1 if recolector.errores else 0
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recolección de atributos desde agentes remotos")
+    sub = parser.add_subparsers(dest="orden", required=True)
+
+    p = sub.add_parser("agente", help="Sirve los atributos de este dispositivo")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--puerto", type=int, default=PUERTO_AGENTE)
+    p.add_argument("--unix", help="Ruta de un socket Unix (en lugar de TCP)")
+    p.add_argument("--backend", help="Backend de recolección (por defecto, el del sistema)")
+    p.add_argument("--dispositivo", help="Identificador del dispositivo (por defecto, el nombre del equipo)")
+
+    for nombre, ayuda in (("recoger", "Recoge los atributos y el HIS de una lista de agentes"),
+                          ("simular", "Recoge una flota simulada en este proceso")):
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument("--concurrencia", type=int, default=MAX_CONCURRENCIA, help="Peticiones en vuelo")
+        p.add_argument("--timeout", type=float, default=TIMEOUT_POR_DEFECTO, help="Plazo por intento (s)")
+        p.add_argument("--reintentos", type=int, default=REINTENTOS)
+
+    p = sub.choices["recoger"]
+    p.add_argument("dispositivos", help='Fichero JSON {dispositivo: "host:puerto" o "unix:/ruta"}')
+    p.add_argument("--registro", help="Verifica contra este fichero JSON {dispositivo: HIS}")
+    p.add_argument("--atributos", action="store_true", help="Incluye los atributos en crudo en la salida")
+
+    p = sub.choices["simular"]
+    p.add_argument("--dispositivos", type=int, default=1000)
+    p.add_argument("--rondas", type=int, default=2)
+    p.add_argument("--latencia", type=float, default=0.01, help="Latencia de cada agente (s)")
+    p.add_argument("--variacion", type=float, default=0.0, help="Latencia aleatoria añadida (s)")
+    p.add_argument("--fallos", type=float, default=0.0, help="Probabilidad de cortar la conexión")
+    p.add_argument("--mudos", type=float, default=0.0, help="Fracción de agentes que no responden")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.orden == "agente":
+            asyncio.run(_servir_agente(args))
+            return 0
+        if args.orden == "recoger":
+            return asyncio.run(_recoger(args))
+    except KeyboardInterrupt:
+        return 0
+
+    informes = asyncio.run(recoleccion_local(args.dispositivos, args.rondas, args.latencia, args.variacion,
+                                             args.fallos, args.mudos, args.concurrencia, args.timeout,
+                                             args.reintentos))
+    for i, informe in enumerate(informes, 1):
+        print(f"ronda {i}: {informe['dispositivos']} dispositivos en {informe['segundos']:.2f} s "
+              f"({informe['dispositivos_s']:.0f}/s)  p50={informe['p50_ms']:.1f} ms  "
+              f"p99={informe['p99_ms']:.1f} ms  conexiones nuevas={informe['conexiones_nuevas']} "
+              f"reutilizadas={informe['conexiones_reutilizadas']}  reintentos={informe['reintentos']}  "
+              f"errores={informe['errores']}  HIS distintos={informe['his_distintos']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
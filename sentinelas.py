@@ -0,0 +1,23 @@
+# =============================
+# VALORES DE ERROR DE LOS COLECTORES
+# =============================
+
+# Valor que devuelve cada colector cuando no puede obtener su atributo.
+# También se usa como valor de reserva si el colector falla o tarda demasiado.
+SENTINELAS = {
+    "cpu_id": "ID_CPU_NO_ENCONTRADO",
+    "serial_number": "NUMERO_SERIE_NO_ENCONTRADA",
+    "mac_original": "MAC_DESCONOCIDA",
+    "firmware_hash": "HASH_FW_NO_CALCULADO",
+    "os_version": "OS_NO_DETECTADO",
+    "public_key_fingerprint": "CLAVE_PUBLICA_NO_EXISTE",
+    "software_inventory_hash": "HASH_SOFTWARE_NO_CALCULADO",
+}
+
+# Todos los valores de error posibles (algunos colectores tienen más de uno)
+VALORES_ERROR = frozenset(SENTINELAS.values()) | {"ERROR_AL_LEER_CLAVE"}
+
+
+# Indica si un valor devuelto por un colector es un valor de error
+def es_sentinela(valor):
+    return isinstance(valor, str) and valor in VALORES_ERROR
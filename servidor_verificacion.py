@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+from lotes import generar_his, registros_sinteticos
+from metricas import instrumentar
+
+# ==================================================
+# SERVIDOR DE VERIFICACIÓN DEL HIS
+# ==================================================
+
+# Protocolo: una petición JSON por línea y una respuesta JSON por línea, en el
+# mismo orden. Una conexión puede enviar varias peticiones sin esperar respuesta.
+#
+#   {"id": 1, "dispositivo": "disp-1", "atributos": {...}}
+#   {"id": 1, "dispositivo": "disp-1", "resultado": "valido", "his": "..."}
+#
+# Operaciones ("op"): "verificar" (por defecto), "enrolar" (si está permitido)
+# y "estadisticas".
+
+PUERTO_POR_DEFECTO = 7878
+MAX_CONEXIONES = 10000
+# Longitud máxima de una línea (petición) en bytes
+MAX_LINEA = 64 * 1024
+
+# Resultados de una verificación
+VALIDO = "valido"
+NO_COINCIDE = "no_coincide"
+NO_ENROLADO = "no_enrolado"
+ERROR = "error"
+OCUPADO = "ocupado"
+
+
+# =============================
+# REGISTRO DE DISPOSITIVOS
+# =============================
+
+class RegistroDispositivos:
+    """
+    HIS enrolado de cada dispositivo {id del dispositivo: HIS}, opcionalmente
+    guardado en un fichero JSON.
+    """
+
+    def __init__(self, enrolados=None, ruta=None):
+        self.ruta = ruta
+        self.enrolados = dict(enrolados or {})
+
+    @classmethod
+    def cargar(cls, ruta):
+        try:
+            with open(ruta, encoding="utf-8") as archivo:
+                return cls(json.load(archivo), ruta)
+        except FileNotFoundError:
+            return cls(ruta=ruta)
+
+    def guardar(self):
+        if not self.ruta:
+            return
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(self.enrolados, archivo)
+        os.replace(temporal, self.ruta)
+
+    def enrolar(self, dispositivo, his):
+        self.enrolados[dispositivo] = his
+
+    def __len__(self):
+        return len(self.enrolados)
+
+    def __contains__(self, dispositivo):
+        return dispositivo in self.enrolados
+
+    def get(self, dispositivo):
+        return self.enrolados.get(dispositivo)
+
+
+# Registro con 'n' dispositivos sintéticos ("disp-0", "disp-1"...) para pruebas de carga
+def registro_sintetico(n):
+    return RegistroDispositivos({f"disp-{i}": generar_his(raw) for i, raw in enumerate(registros_sinteticos(n))})
+
+
+# =============================
+# VERIFICACIÓN
+# =============================
+
+# Calcula el HIS de un informe y lo compara con el enrolado. 'registro' puede ser
+# un RegistroDispositivos (HIS por dispositivo) o un indice_his.IndiceHIS (solo
+# se comprueba que el HIS esté enrolado, sea cual sea el dispositivo).
+@instrumentar("verificacion")
+def verificar(registro, dispositivo, atributos):
+    his = generar_his(atributos)
+    if not hasattr(registro, "get"):
+        resultado = VALIDO if his in registro else NO_ENROLADO
+        return {"dispositivo": dispositivo, "resultado": resultado, "his": his}
+
+    enrolado = registro.get(dispositivo)
+    if enrolado is None:
+        resultado = NO_ENROLADO
+    elif enrolado == his:
+        resultado = VALIDO
+    else:
+        resultado = NO_COINCIDE
+    return {"dispositivo": dispositivo, "resultado": resultado, "his": his}
+
+
+class ServidorVerificacion:
+    """
+    Servidor asyncio (TCP o socket Unix) que verifica informes de atributos en crudo.
+
+    Control de carga:
+    - Como mucho 'max_conexiones' conexiones abiertas; las demás reciben
+      {"resultado": "ocupado"} y se cierran.
+    - Cada conexión se atiende petición a petición y no se lee la siguiente
+      hasta que la respuesta anterior cabe en el búfer de salida, así que un
+      cliente que envía más rápido de lo que se le responde acaba frenado por TCP.
+    """
+
+    def __init__(self, registro, max_conexiones=MAX_CONEXIONES, permitir_enrolamiento=False):
+        self.registro = registro
+        self.max_conexiones = max_conexiones
+        self.permitir_enrolamiento = permitir_enrolamiento
+        self.conexiones = 0
+        self.rechazadas = 0
+        self.resultados = {}
+        self._servidor = None
+
+    async def iniciar(self, host="127.0.0.1", puerto=PUERTO_POR_DEFECTO, unix=None):
+        if unix:
+            self._servidor = await asyncio.start_unix_server(self._atender, path=unix, limit=MAX_LINEA)
+        else:
+            self._servidor = await asyncio.start_server(self._atender, host, puerto, limit=MAX_LINEA,
+                                                        backlog=min(self.max_conexiones, 4096))
+        return self._servidor
+
+    # Dirección real de escucha (útil con puerto 0)
+    def direccion(self):
+        return self._servidor.sockets[0].getsockname()
+
+    async def cerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+
+    def estadisticas(self):
+        return {
+            "enrolados": len(self.registro),
+            "conexiones": self.conexiones,
+            "rechazadas": self.rechazadas,
+            "resultados": dict(self.resultados),
+        }
+
+    # Respuesta a una petición ya decodificada
+    def responder(self, peticion):
+        op = peticion.get("op", "verificar")
+        if op == "verificar":
+            respuesta = verificar(self.registro, peticion.get("dispositivo"), peticion.get("atributos") or {})
+        elif op == "enrolar" and self.permitir_enrolamiento and hasattr(self.registro, "enrolar"):
+            his = generar_his(peticion.get("atributos") or {})
+            self.registro.enrolar(peticion["dispositivo"], his)
+            respuesta = {"dispositivo": peticion["dispositivo"], "resultado": "enrolado", "his": his}
+        elif op == "estadisticas":
+            respuesta = {"resultado": "estadisticas", "estadisticas": self.estadisticas()}
+        else:
+            respuesta = {"resultado": ERROR, "error": f"Operación no permitida: {op}"}
+        if "id" in peticion:
+            respuesta["id"] = peticion["id"]
+        return respuesta
+
+    async def _atender(self, lector, escritor):
+        if self.conexiones >= self.max_conexiones:
+            self.rechazadas += 1
+            escritor.write(b'{"resultado": "ocupado"}\n')
+            await _cerrar_escritor(escritor)
+            return
+
+        self.conexiones += 1
+        try:
+            while True:
+                try:
+                    linea = await lector.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    escritor.write(b'{"resultado": "error", "error": "Linea demasiado larga"}\n')
+                    break
+                except ConnectionError:
+                    break
+                if not linea:
+                    break
+                if not linea.strip():
+                    continue
+
+                try:
+                    peticion = json.loads(linea)
+                    if not isinstance(peticion, dict):
+                        raise ValueError("La petición debe ser un objeto JSON")
+                    respuesta = self.responder(peticion)
+                except Exception as e:
+                    respuesta = {"resultado": ERROR, "error": str(e)}
+
+                resultado = respuesta["resultado"]
+                self.resultados[resultado] = self.resultados.get(resultado, 0) + 1
+                escritor.write(json.dumps(respuesta).encode("utf-8") + b"\n")
+                # Solo espera si el búfer de salida supera su límite
+                await escritor.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.conexiones -= 1
+            await _cerrar_escritor(escritor)
+
+
+async def _cerrar_escritor(escritor):
+    try:
+        escritor.close()
+        await escritor.wait_closed()
+    except ConnectionError:
+        pass
+
+
+# =============================
+# EJECUCIÓN
+# =============================
+
+async def _servir(args):
+    if args.sinteticos:
+        registro = registro_sintetico(args.sinteticos)
+    elif args.indice:
+        from indice_his import IndiceHIS
+        registro = IndiceHIS(args.indice)
+    else:
+        registro = RegistroDispositivos.cargar(args.registro)
+
+    if args.metricas_puerto:
+        import metricas
+        metricas.activar()
+        metricas.servir_prometheus(args.metricas_puerto)
+
+    servidor = ServidorVerificacion(registro, args.max_conexiones, args.permitir_enrolamiento)
+    await servidor.iniciar(args.host, args.puerto, args.unix)
+    print(f"Verificando {len(registro)} dispositivos en {args.unix or servidor.direccion()}", file=sys.stderr)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.cerrar()
+        if args.permitir_enrolamiento and hasattr(registro, "guardar"):
+            registro.guardar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de verificación del HIS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO)
+    parser.add_argument("--unix", help="Ruta de un socket Unix (en lugar de TCP)")
+    parser.add_argument("--registro", default="dispositivos_enrolados.json",
+                        help="Fichero JSON {dispositivo: HIS}")
+    parser.add_argument("--indice", help="Índice binario de HIS enrolados (indice_his.py) en lugar del registro")
+    parser.add_argument("--sinteticos", type=int, metavar="N",
+                        help="Usa N dispositivos sintéticos en lugar del fichero de registro")
+    parser.add_argument("--max-conexiones", type=int, default=MAX_CONEXIONES)
+    parser.add_argument("--permitir-enrolamiento", action="store_true")
+    parser.add_argument("--metricas-puerto", type=int, help="Publica /metrics de Prometheus en este puerto")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_servir(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
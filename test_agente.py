@@ -0,0 +1,125 @@
+import json
+import signal
+
+import agente
+from agente import AgenteContinuo
+from cache_atributos import CacheAtributos
+from normalizacion import normalizar_atributos, canonicar, calcular_his
+
+
+class Reloj:
+    """
+    Reloj virtual: dormir() solo hace avanzar el tiempo.
+    """
+    def __init__(self):
+        self.ahora = 1000.0
+        self.esperas = []
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+class Backend:
+    """
+    Backend falso: cada colector devuelve el valor actual de 'valores' y
+    cuenta cuántas veces se le llama.
+    """
+    def __init__(self, **valores):
+        self.valores = valores
+        self.llamadas = {attr: 0 for attr in valores}
+        self.colectores = {attr: self._colector(attr) for attr in valores}
+
+    def _colector(self, attr):
+        def colector():
+            self.llamadas[attr] += 1
+            return self.valores[attr]
+        return colector
+
+
+def nuevo_agente(backend, reloj, eventos, **kwargs):
+    cache = CacheAtributos(ruta=None, ttl={"cpu_id": 3600, "mac_original": 300, "software_inventory_hash": 0},
+                           invalidacion={}, reloj=reloj, arranque="A")
+    return AgenteContinuo(backend.colectores, cache, reloj=reloj, dormir=reloj.dormir,
+                          al_cambiar=eventos.append, **kwargs)
+
+
+# ============================
+# TESTS AGENTE CONTINUO
+# ============================
+
+def test_solo_recoge_lo_caducado_y_avisa_si_cambia_el_his():
+    """
+    Los atributos con la caché vigente no se vuelven a recoger, y solo hay
+    evento cuando cambia el HIS (no cuando se recoge el mismo valor). La
+    caché solo se guarda cuando cambia alguna de sus entradas.
+    """
+    reloj = Reloj()
+    eventos = []
+    backend = Backend(cpu_id="BFEBFBFF000806C1", mac_original="0a:00:27:00:00:0e",
+                      software_inventory_hash="AB" * 32)
+    demonio = nuevo_agente(backend, reloj, eventos, intervalo=60, intervalo_maximo=60)
+    guardados = []
+    demonio.cache.guardar = lambda: guardados.append(reloj())
+
+    demonio.ejecutar(ciclos=5)
+    assert backend.llamadas == {"cpu_id": 1, "mac_original": 1, "software_inventory_hash": 5}
+    # El inventario (TTL 0) se recoge en cada ciclo pero no reescribe la caché
+    assert guardados == [1000.0]
+    assert len(eventos) == 1 and eventos[0]["his_anterior"] is None
+    assert eventos[0]["his"] == calcular_his(canonicar(normalizar_atributos(backend.valores)))
+
+    # La MAC cambia solo de formato: se recoge pero el HIS es el mismo
+    backend.valores["mac_original"] = "0A-00-27-00-00-0E"
+    reloj.dormir(300)
+    demonio.ejecutar(ciclos=1)
+    assert backend.llamadas["mac_original"] == 2 and len(eventos) == 1
+    assert len(guardados) == 2
+
+    backend.valores["software_inventory_hash"] = "CD" * 32
+    demonio.ejecutar(ciclos=1)
+    assert len(eventos) == 2
+    assert eventos[1]["atributos"] == ["software_inventory_hash"]
+    assert eventos[1]["his_anterior"] == eventos[0]["his"]
+
+    stats = demonio.estadisticas()
+    assert (stats["ciclos"], stats["cambios"], stats["recogidos"], stats["omitidos"]) == (7, 2, 10, 11)
+
+
+def test_espera_adaptativa():
+    """
+    Sin cambios la espera se duplica hasta el máximo, pero no pasa del
+    vencimiento de la caché; tras un cambio vuelve al intervalo inicial.
+    """
+    reloj = Reloj()
+    eventos = []
+    backend = Backend(cpu_id="BFEBFBFF000806C1", mac_original="0a:00:27:00:00:0e")
+    demonio = nuevo_agente(backend, reloj, eventos, intervalo=10, intervalo_maximo=1000, intervalo_minimo=1)
+
+    demonio.ejecutar(ciclos=7)
+    # La MAC (TTL 300 s) caduca en t=300: la quinta espera se recorta a 150 s
+    assert reloj.esperas == [10, 20, 40, 80, 150, 300]
+
+    reloj.esperas.clear()
+    backend.valores["cpu_id"] = "BFEBFBFF000806C2"
+    demonio.cache.vaciar("cpu_id")
+    demonio.ejecutar(ciclos=3)
+    assert reloj.esperas == [10, 20]
+    assert len(eventos) == 2
+
+
+def test_demonio_desde_la_linea_de_comandos(capsys):
+    """
+    --demonio escribe el evento inicial en JSON y las estadísticas en stderr,
+    y al terminar deja los manejadores de señales como estaban.
+    """
+    anteriores = signal.getsignal(signal.SIGINT), signal.getsignal(signal.SIGTERM)
+    assert agente.main(["--backend", "linux", "--demonio", "--ciclos", "1"]) == 0
+    assert (signal.getsignal(signal.SIGINT), signal.getsignal(signal.SIGTERM)) == anteriores
+    salida = capsys.readouterr()
+    evento = json.loads(salida.out)
+    assert evento["his_anterior"] is None and len(evento["his"]) == 64
+    assert json.loads(salida.err)["ciclos"] == 1
@@ -0,0 +1,77 @@
+import os
+import sys
+import subprocess
+
+import agente
+
+
+# Tiempo máximo de importación acumulado de agente.py (microsegundos). Hoy ronda
+# los 20 ms; el margen es para máquinas lentas, pero importar el backend, WMI,
+# pandas o cryptography al arrancar lo superaría.
+PRESUPUESTO_US = 75_000
+
+# Módulos que solo se deben cargar cuando se usan
+PESADOS = ("wmi", "winreg", "pythoncom", "pandas", "matplotlib", "numpy", "cryptography",
+           "concurrent", "multiprocessing", "json", "platform", "argparse", "csv")
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def ejecutar(codigo, *opciones):
+    return subprocess.run([sys.executable, *opciones, "-c", codigo], cwd=DIRECTORIO,
+                          capture_output=True, text=True, check=True)
+
+
+def tiempo_importacion(modulo):
+    """
+    Tiempo acumulado (us) de 'import modulo' según -X importtime.
+    """
+    salida = ejecutar(f"import {modulo}", "-X", "importtime").stderr
+    for linea in salida.splitlines():
+        partes = [p.strip() for p in linea.split("|")]
+        if len(partes) == 3 and partes[2] == modulo:
+            return int(partes[1])
+    raise AssertionError(f"{modulo} no aparece en la salida de -X importtime")
+
+
+def modulos_cargados(codigo):
+    salida = ejecutar(codigo + "; import sys; print('\\n'.join(sys.modules))").stdout
+    return {m.split(".")[0] for m in salida.split()}
+
+
+# ============================
+# TESTS ARRANQUE
+# ============================
+
+def test_presupuesto_de_importacion():
+    """
+    Importar el agente cabe en el presupuesto (mejor de tres ejecuciones,
+    para que una ejecución lenta puntual no haga fallar el test).
+    """
+    mejor = min(tiempo_importacion("agente") for _ in range(3))
+    assert mejor < PRESUPUESTO_US, f"import agente: {mejor / 1000:.1f} ms"
+
+
+def test_modulos_pesados_solo_al_usarlos():
+    """
+    Ni el agente ni los backends ni el benchmark de software cargan módulos
+    pesados o de una plataforma concreta al importarse; el agente tampoco
+    carga el backend hasta que recoge.
+    """
+    cargados = modulos_cargados("import agente")
+    assert not cargados & set(PESADOS)
+    assert not cargados & {"atributos", "backend_linux", "inventario", "recoleccion", "cache_atributos"}
+
+    cargados = modulos_cargados("import atributos, backend_linux, benchmark_software_hash")
+    assert not cargados & set(PESADOS)
+
+
+def test_agente_calcula_el_his(capsys):
+    """
+    El agente da el mismo HIS que el pipeline completo.
+    """
+    from plataforma import recoger_atributos
+    from normalizacion import generar_his_version
+
+    assert agente.main(["--backend", "linux"]) == 0
+    assert capsys.readouterr().out.strip() == generar_his_version(recoger_atributos("linux"))
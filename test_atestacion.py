@@ -0,0 +1,147 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import atestacion
+from atestacion import (
+    VerificadorAtestaciones,
+    crear_atestacion,
+    claves_desde_manifiesto,
+    cargar_clave_privada,
+    ruta_clave_privada,
+    VALIDA,
+    FIRMA_INVALIDA,
+    REPETIDA,
+    CADUCADA,
+    DESCONOCIDO,
+    MAL_FORMADA,
+    CLAVE_INVALIDA
+)
+from genera_clave_publica import provisionar, identificadores, PLANTILLA_PUBLICA
+
+
+HIS = "AB" * 32
+
+
+class Reloj:
+    """
+    Reloj virtual para simular el paso del tiempo.
+    """
+    def __init__(self, ahora=1_700_000_000.0):
+        self.ahora = ahora
+
+    def __call__(self):
+        return self.ahora
+
+
+def aprovisionar(tmp_path, algoritmo, n=3):
+    salida = str(tmp_path / algoritmo)
+    provisionar(identificadores(n), salida, algoritmo)
+    privadas = {d: cargar_clave_privada(ruta_clave_privada(
+        str(tmp_path / algoritmo / PLANTILLA_PUBLICA.format(dispositivo=d)))) for d in identificadores(n)}
+    return claves_desde_manifiesto(salida), privadas
+
+
+# ============================
+# TESTS ATESTACIONES
+# ============================
+
+def test_firma_y_verificacion_con_claves_aprovisionadas(tmp_path):
+    """
+    Las claves de genera_clave_publica.py firman y verifican con los tres
+    algoritmos; una firma de otro dispositivo o un HIS cambiado no valen.
+    """
+    reloj = Reloj()
+    for algoritmo in ("ed25519", "p256", "rsa2048"):
+        claves, privadas = aprovisionar(tmp_path, algoritmo, n=2)
+        verificador = VerificadorAtestaciones(claves, reloj=reloj)
+        marca = int(reloj() * 1000)
+
+        buena = crear_atestacion(privadas["disp-000000"], "disp-000000", HIS, marca=marca)
+        ajena = crear_atestacion(privadas["disp-000001"], "disp-000000", HIS, marca=marca)
+        cambiada = dict(crear_atestacion(privadas["disp-000000"], "disp-000000", HIS, marca=marca), his="CD" * 32)
+
+        assert verificador.verificar_lote([buena, ajena, cambiada]) == [VALIDA, FIRMA_INVALIDA, FIRMA_INVALIDA]
+
+
+def test_repeticion_ventana_y_errores(tmp_path):
+    """
+    Un nonce ya aceptado se rechaza (también dentro del mismo lote, tras una
+    firma correcta y no antes de comprobarla), igual que
+    las atestaciones fuera de la ventana, de dispositivos desconocidos o mal formadas.
+    """
+    claves, privadas = aprovisionar(tmp_path, "ed25519", n=1)
+    clave = privadas["disp-000000"]
+    reloj = Reloj()
+    verificador = VerificadorAtestaciones(claves, ventana=300, reloj=reloj)
+    ahora = int(reloj() * 1000)
+
+    a = crear_atestacion(clave, "disp-000000", HIS, marca=ahora)
+    assert verificador.verificar(a) == VALIDA
+    assert verificador.verificar(a) == REPETIDA
+
+    b = crear_atestacion(clave, "disp-000000", HIS, marca=ahora)
+    assert verificador.verificar_lote([b, b]) == [VALIDA, REPETIDA]
+
+    # Una firma falsa con el mismo nonce delante no bloquea a la legítima
+    c = crear_atestacion(clave, "disp-000000", HIS, marca=ahora)
+    falsa = dict(c, his="CD" * 32)
+    assert verificador.verificar_lote([falsa, c, c]) == [FIRMA_INVALIDA, VALIDA, REPETIDA]
+
+    vieja = crear_atestacion(clave, "disp-000000", HIS, marca=ahora - 301_000)
+    assert verificador.verificar(vieja) == CADUCADA
+    assert verificador.verificar(dict(a, dispositivo="otro")) == DESCONOCIDO
+    assert verificador.verificar({"dispositivo": "disp-000000"}) == MAL_FORMADA
+
+    # Pasada la ventana el nonce se olvida, pero la marca también ha caducado
+    reloj.ahora += 301
+    assert verificador.verificar(a) == CADUCADA
+    assert verificador._nonces == {}
+
+    # Una marca adelantada sigue aceptándose hasta marca + ventana, y el nonce
+    # se recuerda hasta entonces: no se puede repetir al olvidarse antes
+    base = reloj.ahora
+    adelantada = crear_atestacion(clave, "disp-000000", HIS, marca=int((base + 250) * 1000))
+    assert verificador.verificar(adelantada) == VALIDA
+    for segundos in (100, 301, 549):
+        reloj.ahora = base + segundos
+        assert verificador.verificar(adelantada) == REPETIDA
+    reloj.ahora = base + 551
+    assert verificador.verificar(adelantada) == CADUCADA
+
+
+def test_campos_de_tipo_incorrecto_y_clave_enrolada_rota(tmp_path):
+    """
+    Un campo con un tipo inesperado o una clave enrolada que no se puede
+    interpretar solo afectan a su atestación, no al resto del lote.
+    """
+    claves, privadas = aprovisionar(tmp_path, "ed25519", n=2)
+    claves["disp-000001"] = b"-----BEGIN PUBLIC KEY-----\nroto\n-----END PUBLIC KEY-----\n"
+    reloj = Reloj()
+    marca = int(reloj() * 1000)
+    buena = crear_atestacion(privadas["disp-000000"], "disp-000000", HIS, marca=marca)
+    rota = crear_atestacion(privadas["disp-000001"], "disp-000001", HIS, marca=marca)
+
+    lote = [dict(buena, dispositivo=5), dict(buena, his=None), dict(buena, nonce=["x"]),
+            dict(buena, marca=float("inf")), rota, buena]
+    resultados = VerificadorAtestaciones(claves, reloj=reloj).verificar_lote(lote)
+    assert resultados == [MAL_FORMADA] * 4 + [CLAVE_INVALIDA, VALIDA]
+
+
+def test_lote_en_pool_con_cache_de_claves(tmp_path):
+    """
+    En un pool de procesos el resultado es el mismo, y cada clave pública se
+    interpreta una sola vez por proceso.
+    """
+    claves, privadas = aprovisionar(tmp_path, "ed25519", n=4)
+    reloj = Reloj()
+    marca = int(reloj() * 1000)
+    lote = [crear_atestacion(privadas[d], d, HIS, marca=marca) for d in sorted(privadas) for _ in range(10)]
+    lote[5] = dict(lote[5], his="00" * 32)
+
+    atestacion._CLAVES.clear()
+    local = VerificadorAtestaciones(claves, reloj=reloj).verificar_lote(lote)
+    assert local.count(VALIDA) == 39 and local[5] == FIRMA_INVALIDA
+    assert len(atestacion._CLAVES) == 4
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        en_pool = VerificadorAtestaciones(claves, reloj=reloj).verificar_lote(lote, pool=pool, tamano_bloque=7)
+    assert en_pool == local
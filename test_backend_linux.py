@@ -0,0 +1,118 @@
+import sys
+import struct
+import sqlite3
+import subprocess
+
+import backend_linux
+from inventario import hash_entrada, hash_inventario
+from plataforma import obtener_colectores
+
+
+# ============================
+# UTILIDAD DE TEST
+# ============================
+
+def escribir(raiz, ruta, contenido):
+    archivo = raiz / ruta
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    archivo.write_text(contenido)
+
+
+def cabecera_rpm(etiquetas):
+    """
+    Construye una cabecera RPM mínima con etiquetas de tipo STRING.
+    """
+    indices = b""
+    datos = b""
+    for etiqueta, valor in etiquetas.items():
+        indices += struct.pack(">IIII", etiqueta, 6, len(datos), 1)
+        datos += valor.encode() + b"\x00"
+    return struct.pack(">II", len(etiquetas), len(datos)) + indices + datos
+
+
+# ============================
+# TESTS BACKEND LINUX
+# ============================
+
+def test_cpu_id_formato_processor_id(tmp_path):
+    """
+    En x86 se reconstruye el ProcessorId de Windows a partir de /proc/cpuinfo.
+    """
+    flags = ("fpu vme de pse tsc msr pae mce cx8 apic sep mtrr pge mca cmov pat pse36 "
+             "clflush dts acpi mmx fxsr sse sse2 ss ht tm pbe")
+    escribir(tmp_path, "proc/cpuinfo",
+             f"vendor_id\t: GenuineIntel\ncpu family\t: 6\nmodel\t\t: 140\nstepping\t: 1\nflags\t\t: {flags}\n")
+
+    assert backend_linux.get_id_procesador(str(tmp_path)) == "BFEBFBFF000806C1"
+
+
+def test_mac_solo_adaptadores_fisicos(tmp_path):
+    """
+    Se ignoran las interfaces virtuales (sin 'device') y las MAC a cero.
+    """
+    escribir(tmp_path, "sys/class/net/lo/address", "00:00:00:00:00:00\n")
+    escribir(tmp_path, "sys/class/net/docker0/address", "02:42:ac:11:00:02\n")
+    escribir(tmp_path, "sys/class/net/eth0/address", "0a:00:27:00:00:0e\n")
+    (tmp_path / "sys/class/net/eth0/device").mkdir()
+
+    assert backend_linux.get_mac_principal(str(tmp_path)) == "0a:00:27:00:00:0e"
+
+
+def test_inventario_dpkg(tmp_path):
+    """
+    Solo cuentan los paquetes instalados y el hash usa el formato 'nombre:version'.
+    """
+    escribir(tmp_path, "var/lib/dpkg/status",
+             "Package: bash\nStatus: install ok installed\nVersion: 5.2-2\nDescription: shell\n Package: falso\n\n"
+             "Package: viejo\nStatus: deinstall ok config-files\nVersion: 1.0\n\n"
+             "Package: apt\nVersion: 2.6.1\nStatus: install ok installed\n")
+
+    assert backend_linux.paquetes_dpkg(str(tmp_path)) == [("bash", "5.2-2"), ("apt", "2.6.1")]
+    assert backend_linux.crear_hash_software_instalado(str(tmp_path)) == hash_inventario(
+        [hash_entrada("bash", "5.2-2"), hash_entrada("apt", "2.6.1")])
+
+
+def test_inventario_rpm_sqlite(tmp_path):
+    """
+    Se leen nombre, versión y release de las cabeceras de rpmdb.sqlite.
+    """
+    ruta = tmp_path / "var/lib/rpm/rpmdb.sqlite"
+    ruta.parent.mkdir(parents=True)
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("CREATE TABLE Packages (hnum INTEGER PRIMARY KEY, blob BLOB)")
+    conexion.execute("INSERT INTO Packages (blob) VALUES (?)",
+                     (cabecera_rpm({1000: "bash", 1001: "5.2.15", 1002: "3.fc39"}),))
+    conexion.commit()
+    conexion.close()
+
+    assert backend_linux.paquetes_instalados(str(tmp_path)) == [("bash", "5.2.15-3.fc39")]
+
+
+def test_backend_sin_importar_los_demas():
+    """
+    Elegir el backend de Linux no importa el de Windows (ni wmi/winreg).
+    """
+    codigo = ("import sys, plataforma; plataforma.obtener_colectores('linux'); "
+              "print('atributos' in sys.modules or 'wmi' in sys.modules)")
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+
+    assert salida.stdout.strip() == "False"
+    assert set(obtener_colectores("linux")) == set(backend_linux.COLECTORES)
+
+
+def test_inventario_reutiliza_escaneo_si_no_cambia_la_base(tmp_path, monkeypatch):
+    """
+    Mientras la base de datos de paquetes no cambia no se vuelve a leer.
+    """
+    escribir(tmp_path, "var/lib/dpkg/status", "Package: bash\nStatus: install ok installed\nVersion: 5.2-2\n")
+    ruta_escaneo = str(tmp_path / "escaneo.json")
+    primero = backend_linux.crear_hash_software_instalado(str(tmp_path), ruta_escaneo=ruta_escaneo)
+
+    # Sin caché en memoria, el escaneo guardado en disco basta para no releer
+    backend_linux._ESCANEOS.clear()
+    monkeypatch.setattr(backend_linux, "paquetes_instalados", lambda raiz: 1 / 0)
+    assert backend_linux.crear_hash_software_instalado(str(tmp_path), ruta_escaneo=ruta_escaneo) == primero
+
+    monkeypatch.undo()
+    escribir(tmp_path, "var/lib/dpkg/status", "Package: bash\nStatus: install ok installed\nVersion: 5.2-3\n")
+    assert backend_linux.crear_hash_software_instalado(str(tmp_path), ruta_escaneo=ruta_escaneo) != primero
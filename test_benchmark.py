@@ -0,0 +1,48 @@
+import json
+
+from benchmark import percentil, comparar, ejecutar, main
+
+
+# ============================
+# TESTS BANCO DE PRUEBAS
+# ============================
+
+def test_percentiles_con_interpolacion():
+    """
+    Los percentiles interpolan entre los valores ordenados.
+    """
+    valores = [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    assert percentil(valores, 50) == 3.0
+    assert percentil(valores, 95) == 4.8
+    assert percentil([7.0], 99) == 7.0
+
+
+def test_comparar_detecta_regresiones():
+    """
+    Solo se marcan las etapas cuya mediana empeora más que la tolerancia.
+    """
+    base = {"etapas": {"his": {"p50_us": 1.0}, "pipeline": {"p50_us": 10.0}}}
+    actual = {"etapas": {"his": {"p50_us": 1.5}, "pipeline": {"p50_us": 10.5}, "nueva": {"p50_us": 3.0}}}
+
+    regresiones = comparar(actual, base, tolerancia=0.2)
+
+    assert [r["etapa"] for r in regresiones] == ["his"]
+
+
+def test_ejecucion_y_salida_json(tmp_path):
+    """
+    El informe JSON contiene las etapas pedidas y el código de salida indica regresión.
+    """
+    informe = ejecutar(["his", "colector_linux_get_mac_principal"], repeticiones=3, calentamiento=1)
+    assert set(informe["etapas"]) == {"his", "colector_linux_get_mac_principal"}
+    assert informe["etapas"]["his"]["p50_us"] > 0
+
+    base = tmp_path / "base.json"
+    base.write_text(json.dumps({"etapas": {"his": {"p50_us": 1e-9}}}))
+    salida = tmp_path / "salida.json"
+
+    codigo = main(["--etapas", "his", "--repeticiones", "3", "--base", str(base), "--salida", str(salida)])
+
+    assert codigo == 1
+    assert json.loads(salida.read_text())["regresiones"][0]["etapa"] == "his"
@@ -0,0 +1,143 @@
+import json
+
+from cache_atributos import CacheAtributos, recoger_con_cache
+
+
+# ============================
+# UTILIDAD DE TEST
+# ============================
+
+class Reloj:
+    """
+    Reloj virtual para simular el paso del tiempo.
+    """
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+def contador(valor):
+    """
+    Colector falso que cuenta cuántas veces se le llama.
+    """
+    def colector():
+        colector.llamadas += 1
+        return valor
+    colector.llamadas = 0
+    return colector
+
+
+# ============================
+# TESTS CACHÉ DE ATRIBUTOS
+# ============================
+
+def test_acierto_hasta_que_caduca_el_ttl(tmp_path):
+    """
+    Un atributo se sirve de la caché hasta que vence su TTL.
+    """
+    reloj = Reloj()
+    cache = CacheAtributos(str(tmp_path / "c.json"), ttl={"cpu_id": 60}, reloj=reloj, arranque="A")
+    cpu = contador("BFEBFBFF000806C1")
+
+    cache.obtener("cpu_id", cpu)
+    cache.obtener("cpu_id", cpu)
+    reloj.ahora += 60
+    cache.obtener("cpu_id", cpu)
+
+    assert cpu.llamadas == 2
+    assert cache.estadisticas()["aciertos"] == 1
+
+
+def test_reinicio_y_archivo_invalidan(tmp_path):
+    """
+    Un cambio de arranque o del archivo vigilado invalida la entrada.
+    La caché persiste entre instancias mientras no cambie nada.
+    """
+    ruta = str(tmp_path / "c.json")
+    clave = tmp_path / "clave.pub"
+    clave.write_text("A")
+    ttl = {"cpu_id": 3600, "public_key_fingerprint": 3600}
+    vigilados = {"public_key_fingerprint": str(clave)}
+    colectores = {"cpu_id": contador("CPU"), "public_key_fingerprint": contador("ab")}
+
+    recoger_con_cache(colectores, CacheAtributos(ruta, ttl=ttl, archivos_vigilados=vigilados, arranque="A"))
+    recoger_con_cache(colectores, CacheAtributos(ruta, ttl=ttl, archivos_vigilados=vigilados, arranque="A"))
+    assert [c.llamadas for c in colectores.values()] == [1, 1]
+
+    clave.write_text("BB")
+    recoger_con_cache(colectores, CacheAtributos(ruta, ttl=ttl, archivos_vigilados=vigilados, arranque="B"))
+    assert [c.llamadas for c in colectores.values()] == [2, 2]
+
+
+def test_sentinelas_no_se_cachean_y_vaciar():
+    """
+    Los valores de error no se guardan y vaciar() fuerza una nueva lectura.
+    """
+    cache = CacheAtributos(None, ttl={"cpu_id": 3600, "serial_number": 3600}, arranque="A")
+    fallido = contador("ID_CPU_NO_ENCONTRADO")
+    serie = contador("SERIE")
+
+    cache.obtener("cpu_id", fallido)
+    cache.obtener("cpu_id", fallido)
+    cache.obtener("serial_number", serie)
+    cache.vaciar()
+    cache.obtener("serial_number", serie)
+
+    assert fallido.llamadas == 2
+    assert serie.llamadas == 2
+
+
+def test_entradas_mal_formadas_se_descartan(tmp_path):
+    """
+    Al cargar se descartan las entradas sin los campos esperados y un archivo
+    cuya raíz no es un objeto se trata como una caché vacía.
+    """
+    ruta = tmp_path / "cache.json"
+    buena = {"valor": "CPU", "guardado": 900.0, "duracion": 0.5, "senales": {"arranque": "A"}}
+    ruta.write_text(json.dumps({
+        "cpu_id": buena,
+        "serial_number": "SERIE",
+        "mac_original": {"valor": "MAC"},
+        "os_version": dict(buena, guardado="ayer"),
+        "firmware_hash": dict(buena, senales=None),
+    }))
+    ttl = dict.fromkeys(("cpu_id", "serial_number", "mac_original", "os_version", "firmware_hash"), 3600)
+    cache = CacheAtributos(str(ruta), ttl=ttl, invalidacion={"cpu_id": ("arranque",)},
+                           reloj=Reloj(), arranque="A")
+
+    assert list(cache.entradas) == ["cpu_id"]
+    serie = contador("SERIE")
+    assert cache.obtener("serial_number", serie) == "SERIE" and serie.llamadas == 1
+    assert cache.obtener("cpu_id", contador("OTRA")) == "CPU"
+
+    ruta.write_text(json.dumps(["cpu_id"]))
+    assert CacheAtributos(str(ruta), arranque="A").entradas == {}
+
+
+def test_guardar_mientras_otros_hilos_almacenan(tmp_path):
+    """
+    Un colector abandonado por timeout puede seguir almacenando desde su hilo
+    mientras se guarda la caché sin que guardar falle.
+    """
+    import threading
+
+    atributos = [f"attr_{i}" for i in range(300)]
+    cache = CacheAtributos(str(tmp_path / "cache.json"), ttl={a: 3600 for a in atributos}, arranque="A")
+    parar = threading.Event()
+
+    def colector_abandonado():
+        while not parar.is_set():
+            for attr in atributos:
+                cache.almacenar(attr, "valor")
+            cache.vaciar()
+
+    hilo = threading.Thread(target=colector_abandonado, daemon=True)
+    hilo.start()
+    try:
+        for _ in range(200):
+            cache.guardar()
+    finally:
+        parar.set()
+        hilo.join()
@@ -0,0 +1,70 @@
+import pytest
+
+from normalizacion import (
+    CAMPOS,
+    Atributos,
+    normalizar_atributos,
+    canonicar,
+    calcular_his,
+    calcular_his_v2
+)
+from columnas_atributos import ColumnasAtributos, ejecutar_benchmark
+from lotes import registros_flota, registros_sinteticos
+
+
+REGISTROS = list(registros_sinteticos(200))
+
+
+# ============================
+# TESTS REGISTRO COMPACTO
+# ============================
+
+def test_atributos_equivale_al_diccionario():
+    """
+    Un Atributos se normaliza, canoniza y hashea igual que el diccionario del
+    que sale (v1 y v2), y normalizar uno devuelve otro Atributos.
+    """
+    for raw in REGISTROS:
+        registro = Atributos.desde_dict({k.upper(): v for k, v in raw.items()})
+        normalizado = normalizar_atributos(registro)
+        esperado = normalizar_atributos(raw)
+
+        assert type(normalizado) is Atributos and normalizado == esperado
+        assert canonicar(normalizado) == canonicar(esperado)
+        assert calcular_his_v2(normalizado) == calcular_his_v2(esperado)
+
+
+def test_atributos_se_lee_como_diccionario():
+    """
+    Acceso por clave, get, iteración y conversión de ida y vuelta; los campos
+    que faltan quedan vacíos, y los desconocidos, repetidos o de más se rechazan.
+    """
+    registro = Atributos(cpu_id="BFEBFBFF000906EA")
+    assert registro["cpu_id"] == "BFEBFBFF000906EA" and registro["serial_number"] == ""
+    assert registro.get("otro", "x") == "x" and "otro" not in registro
+    assert list(registro) == list(CAMPOS) and len(registro) == len(CAMPOS)
+    assert Atributos.desde_dict(registro.a_dict()) == registro
+    for clave in ("otro", "keys", "a_dict", "__class__", 3):
+        with pytest.raises(KeyError):
+            registro[clave]
+    with pytest.raises(TypeError, match="desconocidos"):
+        Atributos(otro="x")
+    with pytest.raises(TypeError, match="como mucho"):
+        Atributos(*range(len(CAMPOS) + 1))
+    with pytest.raises(TypeError, match="repetidos: cpu_id"):
+        Atributos("A", cpu_id="B")
+
+
+def test_columnas_dan_el_mismo_his_que_por_registro():
+    """
+    El almacén por columnas da, fila a fila, los mismos normalizados y el
+    mismo HIS que el pipeline por registro, y el benchmark lo comprueba
+    para las tres representaciones.
+    """
+    columnas = ColumnasAtributos.desde_registros(REGISTROS)
+    assert len(columnas) == len(REGISTROS)
+    assert list(columnas.normalizar()) == [normalizar_atributos(r) for r in REGISTROS]
+    assert columnas.generar_his() == [calcular_his(canonicar(normalizar_atributos(r))) for r in REGISTROS]
+
+    res = ejecutar_benchmark(registros=list(registros_flota(500)))
+    assert res["columnas"]["bytes_crudo"] < res["atributos"]["bytes_crudo"] < res["dict"]["bytes_crudo"]
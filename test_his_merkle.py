@@ -0,0 +1,80 @@
+from normalizacion import normalizar_atributos
+from lotes import registros_sinteticos
+from his_merkle import ArbolHIS, prueba_de_cambios, verificar_prueba, orden_atributos
+
+
+RAW = next(iter(registros_sinteticos(1)))
+
+
+# ============================
+# TESTS ÁRBOL DE MERKLE
+# ============================
+
+def test_actualizacion_parcial_igual_a_reconstruir():
+    """
+    Recalcular solo los caminos de las hojas cambiadas da la misma raíz que
+    construir el árbol de nuevo, también con un número impar de hojas.
+    """
+    norm = normalizar_atributos(RAW)
+    arbol = ArbolHIS(norm)
+    assert len(arbol.atributos) == 7 and arbol.atributos == orden_atributos()
+
+    cambios = {"mac_original": "000000000001", "os_version": "10-0.26100"}
+    arbol.actualizar(cambios)
+    assert arbol.raiz == ArbolHIS(dict(norm, **cambios)).raiz
+
+    # Guardar el árbol enrolado y cargarlo no cambia la raíz
+    assert ArbolHIS.desde_dict(arbol.a_dict()).raiz == arbol.raiz
+
+    cinco = ArbolHIS({"a": "1", "b": "2", "c": "3", "d": "4", "e": "5"}, atributos="abcde")
+    cinco.actualizar({"e": "50"})
+    assert cinco.raiz == ArbolHIS({"a": "1", "b": "2", "c": "3", "d": "4", "e": "50"}, atributos="abcde").raiz
+
+
+def test_verificador_informa_del_atributo_cambiado():
+    """
+    El dispositivo solo envía la hoja que ha cambiado y sus hermanos, y el
+    verificador sabe qué atributo es.
+    """
+    enrolado = ArbolHIS.desde_raw(RAW)
+
+    sin_cambios = prueba_de_cambios(enrolado, normalizar_atributos(RAW))
+    assert sin_cambios["hojas"] == {} and sin_cambios["hermanos"] == []
+    assert verificar_prueba(enrolado, sin_cambios)["valido"]
+
+    # Un cambio que la normalización elimina no es un cambio
+    variante = dict(RAW, mac_original=RAW["mac_original"].upper())
+    assert prueba_de_cambios(enrolado, normalizar_atributos(variante))["hojas"] == {}
+
+    prueba = prueba_de_cambios(enrolado, normalizar_atributos(dict(RAW, mac_original="00:00:00:00:00:01")))
+    assert list(prueba["hojas"]) == ["mac_original"]
+    assert len(prueba["hermanos"]) == 3
+
+    resultado = verificar_prueba(enrolado, prueba)
+    assert resultado == {"valido": False, "integra": True, "cambiados": ["mac_original"], "sin_declarar": []}
+
+
+def test_cambios_ocultos_y_pruebas_manipuladas():
+    """
+    Si el dispositivo oculta un cambio, el hermano que lo cubre no coincide con
+    el enrolado; si manipula la prueba, no llega a la raíz declarada.
+    """
+    enrolado = ArbolHIS.desde_raw(RAW)
+    norm = normalizar_atributos(dict(RAW, mac_original="00:00:00:00:00:01", cpu_id="OTRA"))
+    actual = ArbolHIS(norm)
+
+    # Solo declara la MAC aunque también ha cambiado cpu_id
+    oculta = actual.prueba({"mac_original": norm["mac_original"]})
+    resultado = verificar_prueba(enrolado, oculta)
+    assert resultado["integra"] and not resultado["valido"]
+    assert resultado["cambiados"] == ["mac_original"]
+    assert "cpu_id" in resultado["sin_declarar"]
+
+    # Declara un valor distinto del que ha usado para calcular la raíz
+    falsa = dict(oculta, hojas={"mac_original": "0A0027000000"})
+    assert not verificar_prueba(enrolado, falsa)["integra"]
+
+    # Faltan hermanos
+    incompleta = dict(oculta, hermanos=oculta["hermanos"][:-1])
+    assert verificar_prueba(enrolado, incompleta) == \
+        {"valido": False, "integra": False, "cambiados": [], "sin_declarar": []}
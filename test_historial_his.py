@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from historial_his import (
+    EscritorHistorial,
+    LectorHistorial,
+    FormatoHistorialError,
+    entradas_sinteticas
+)
+
+
+ENTRADAS = list(entradas_sinteticas(1000, dispositivos=40))
+
+
+def escribir(ruta, entradas, **kwargs):
+    with EscritorHistorial(ruta, **kwargs) as escritor:
+        for dispositivo, his, normalizados, marca in entradas:
+            escritor.anadir(dispositivo, his, normalizados, marca)
+
+
+# ============================
+# TESTS HISTORIAL DE HIS
+# ============================
+
+def test_ida_y_vuelta_y_busquedas(tmp_path):
+    """
+    Se recupera todo lo escrito, en orden; las búsquedas por dispositivo y
+    por tiempo dan lo mismo que filtrar la lista completa.
+    """
+    ruta = str(tmp_path / "historial.bin")
+    escribir(ruta, ENTRADAS, registros_por_bloque=64)
+
+    esperadas = [(m, d, h.hex().upper(), n) for d, h, n, m in ENTRADAS]
+    with LectorHistorial(ruta) as lector:
+        assert len(lector) == 1000 and len(lector.bloques) == 16
+        assert list(lector.recorrer()) == esperadas
+
+        desde, hasta = esperadas[300][0], esperadas[549][0]
+        assert list(lector.recorrer("disp-7", desde, hasta)) == \
+            [e for e in esperadas if e[1] == "disp-7" and desde <= e[0] <= hasta]
+        assert list(lector.recorrer(desde=desde, hasta=hasta)) == esperadas[300:550]
+        assert lector.ultima("disp-7") == [e for e in esperadas if e[1] == "disp-7"][-1]
+        assert lector.ultima("no-existe") is None
+        assert list(lector.recorrer("no-existe")) == []
+
+        # Las cadenas repetidas se guardan una sola vez
+        assert len(lector.cadenas) == len(set(lector.cadenas))
+    assert os.path.getsize(ruta) < 1000 * 72
+
+
+def test_reapertura_y_bloque_a_medias(tmp_path):
+    """
+    Se puede seguir añadiendo a un historial existente; un bloque cortado al
+    final se ignora al leer y se descarta al volver a escribir.
+    """
+    ruta = str(tmp_path / "historial.bin")
+    escribir(ruta, ENTRADAS[:500], registros_por_bloque=100)
+    tamano = os.path.getsize(ruta)
+    escribir(ruta, ENTRADAS[500:], registros_por_bloque=100)
+
+    with open(ruta, "r+b") as archivo:
+        archivo.truncate(os.path.getsize(ruta) - 10)
+    with LectorHistorial(ruta) as lector:
+        assert len(lector) == 900
+
+    escribir(ruta, ENTRADAS[900:])
+    with LectorHistorial(ruta) as lector:
+        assert [e[0] for e in lector.recorrer()] == [m for _, _, _, m in ENTRADAS]
+        assert lector.fin_valido == os.path.getsize(ruta) > tamano
+
+    with pytest.raises(FormatoHistorialError):
+        EscritorHistorial(ruta, atributos=["cpu_id"])
+
+
+def test_fichero_no_valido_y_cabecera_a_medias(tmp_path):
+    """
+    Un fichero que no es un historial se rechaza. Uno vacío o cortado dentro
+    de la cabecera (que se escribe al crear el fichero) se lee como un
+    historial vacío y se puede volver a escribir.
+    """
+    (tmp_path / "otro.bin").write_bytes(b"HISIDX1\x00" + b"\x00" * 8)
+    with pytest.raises(FormatoHistorialError):
+        LectorHistorial(str(tmp_path / "otro.bin"))
+
+    ruta = str(tmp_path / "historial.bin")
+    escritor = EscritorHistorial(ruta)
+    with open(ruta, "rb") as archivo:
+        cabecera = archivo.read()
+    escritor.cerrar()
+    assert cabecera.startswith(b"HISLOG1\x00") and len(cabecera) > 12
+
+    for corte in range(len(cabecera)):
+        with open(ruta, "wb") as archivo:
+            archivo.write(cabecera[:corte])
+        with LectorHistorial(ruta) as lector:
+            assert len(lector) == 0 and lector.fin_valido == 0
+        escribir(ruta, ENTRADAS[:3])
+        with LectorHistorial(ruta) as lector:
+            assert [e[0] for e in lector.recorrer()] == [m for _, _, _, m in ENTRADAS[:3]]
@@ -0,0 +1,97 @@
+import base64
+import hashlib
+
+import pytest
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+import huella_clave
+import backend_linux
+from huella_clave import CacheHuellas, ErrorClave, MODO_BRUTO, MODO_SPKI, calcular_huella, huellas_directorio
+
+
+def clave_pem():
+    publica = ed25519.Ed25519PrivateKey.generate().public_key()
+    pem = publica.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    der = publica.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return pem, der
+
+
+# ============================
+# TESTS HUELLA DE CLAVES
+# ============================
+
+def test_cache_por_inodo_tamano_y_fecha(tmp_path, monkeypatch):
+    """
+    La huella se calcula una vez mientras el fichero no cambia; en modo bruto
+    es el SHA-256 del fichero, también cuando se lee con mmap.
+    """
+    pem, _ = clave_pem()
+    ruta = tmp_path / "mi_clave_publica.pub"
+    ruta.write_bytes(pem)
+    cache = CacheHuellas()
+
+    assert cache.huella(str(ruta)) == hashlib.sha256(pem).hexdigest()
+    assert cache.huella(str(ruta)) == hashlib.sha256(pem).hexdigest()
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+
+    # Otro contenido (otro tamaño) invalida la entrada
+    ruta.write_bytes(pem + b"\n")
+    assert cache.huella(str(ruta)) == hashlib.sha256(pem + b"\n").hexdigest()
+    assert cache.fallos == 2
+
+    monkeypatch.setattr(huella_clave, "UMBRAL_MMAP", 1)
+    assert calcular_huella(str(ruta)) == hashlib.sha256(pem + b"\n").hexdigest()
+
+
+def test_modo_spki_ignora_el_formato(tmp_path):
+    """
+    En modo SPKI da igual el salto de línea, el ajuste del base64 o que la
+    clave esté en DER; en modo bruto no.
+    """
+    pem, der = clave_pem()
+    cuerpo = base64.b64encode(der)
+    variantes = {
+        "original.pub": pem,
+        "crlf.pub": pem.replace(b"\n", b"\r\n"),
+        "una_linea.pub": b"-----BEGIN PUBLIC KEY-----" + cuerpo + b"-----END PUBLIC KEY-----",
+        "con_texto.pem": b"Clave del dispositivo 1\n" + pem,
+        "binaria.der": der,
+    }
+    for nombre, datos in variantes.items():
+        (tmp_path / nombre).write_bytes(datos)
+
+    esperada = hashlib.sha256(der).hexdigest()
+    assert {calcular_huella(str(tmp_path / n), MODO_SPKI) for n in variantes} == {esperada}
+    assert len({calcular_huella(str(tmp_path / n), MODO_BRUTO) for n in variantes}) == len(variantes)
+
+    # Un fichero de texto que empieza por '0' (el byte 0x30 del DER) no es DER
+    (tmp_path / "hex.pub").write_bytes(b"0x" + der.hex().encode())
+    with pytest.raises(ErrorClave):
+        calcular_huella(str(tmp_path / "hex.pub"), MODO_SPKI)
+
+
+def test_directorio_en_paralelo_y_ruta_configurable(tmp_path, monkeypatch):
+    """
+    Se calculan las huellas de todo un directorio con varios procesos, los
+    ficheros no válidos se informan como error, y la ruta de la clave del
+    dispositivo se puede cambiar con la variable de entorno.
+    """
+    for i in range(6):
+        (tmp_path / f"disp-{i}").mkdir()
+        (tmp_path / f"disp-{i}" / "mi_clave_publica.pub").write_bytes(clave_pem()[0])
+    (tmp_path / "rota.pub").write_bytes(b"-----BEGIN PUBLIC KEY-----\n%%%\n-----END PUBLIC KEY-----\n")
+    (tmp_path / "notas.txt").write_text("no es una clave")
+
+    filas = huellas_directorio(str(tmp_path), MODO_SPKI, procesos=2, tamano_bloque=2)
+    assert len(filas) == 7
+    assert sum(1 for _, huella, _ in filas if huella) == 6
+    assert [r for r, _, e in filas if e] == [str(tmp_path / "rota.pub")]
+
+    ruta = tmp_path / "disp-0" / "mi_clave_publica.pub"
+    monkeypatch.setenv(huella_clave.VARIABLE_RUTA, str(ruta))
+    assert backend_linux.ruta_clave_publica() == str(ruta)
+    assert backend_linux.huella_clave_publica() == hashlib.sha256(ruta.read_bytes()).hexdigest()
+    monkeypatch.setenv(huella_clave.VARIABLE_RUTA, str(tmp_path / "no_existe.pub"))
+    assert backend_linux.huella_clave_publica() == "CLAVE_PUBLICA_NO_EXISTE"
@@ -0,0 +1,77 @@
+from normalizacion import normalizar_atributos
+from lotes import registros_sinteticos
+from indice_atributos import IndiceAtributos
+
+
+NORMALIZADOS = [normalizar_atributos(r) for r in registros_sinteticos(50)]
+
+
+def indice_con(n=50, **kwargs):
+    indice = IndiceAtributos(**kwargs)
+    for i, norm in enumerate(NORMALIZADOS[:n]):
+        indice.insertar(f"disp-{i}", norm)
+    return indice
+
+
+# ============================
+# TESTS ÍNDICE POR ATRIBUTO
+# ============================
+
+def test_reidentifica_dispositivo_con_atributos_cambiados():
+    """
+    Un dispositivo con la MAC y la versión del SO cambiadas se encuentra por
+    los otros 5 atributos; con k mayor que las coincidencias no aparece.
+    """
+    indice = indice_con()
+    derivado = dict(NORMALIZADOS[7], mac_original="000000000001", os_version="10-0.99999")
+
+    mejores = indice.candidatos(derivado, minimo=4)
+    assert mejores[0][0] == "disp-7"
+    assert mejores[0][2] == ["cpu_id", "firmware_hash", "public_key_fingerprint",
+                             "serial_number", "software_inventory_hash"]
+    assert mejores[0][1] == 2.0 + 1.0 + 3.0 + 3.0 + 1.0
+    assert indice.candidatos(derivado, minimo=6) == []
+
+
+def test_pesos_configurables():
+    """
+    Con pesos distintos cambia el orden de los candidatos.
+    """
+    pesos = {"mac_original": 10.0, "cpu_id": 1.0}
+    indice = IndiceAtributos(pesos=pesos, atributos=("mac_original", "cpu_id"))
+    indice.insertar("por_mac", {"mac_original": "AA", "cpu_id": "X"})
+    indice.insertar("por_cpu", {"mac_original": "BB", "cpu_id": "Y"})
+
+    consulta = {"mac_original": "AA", "cpu_id": "Y"}
+    assert [c[0] for c in indice.candidatos(consulta)] == ["por_mac", "por_cpu"]
+
+    indice.pesos = {"mac_original": 1.0, "cpu_id": 10.0}
+    assert [c[0] for c in indice.candidatos(consulta)] == ["por_cpu", "por_mac"]
+
+
+def test_altas_bajas_y_valores_frecuentes():
+    """
+    Las bajas quitan al dispositivo de todas sus entradas; los valores más
+    frecuentes que el límite no generan candidatos pero sí puntúan.
+    """
+    indice = indice_con(10, max_frecuencia=3)
+    comun = {"os_version": "10-0.19045"}
+    for i in range(5):
+        indice.insertar(f"disp-{i}", dict(NORMALIZADOS[i], **comun))
+    assert indice.frecuencia("os_version", "10-0.19045") == 5
+
+    # Solo la versión del SO coincide con todos: es demasiado frecuente para buscar
+    assert indice.candidatos(comun) == []
+    # Pero suma cuando el candidato sale por otro atributo
+    consulta = dict(comun, cpu_id=NORMALIZADOS[2]["cpu_id"])
+    assert indice.candidatos(consulta) == [("disp-2", 2.5, ["cpu_id", "os_version"])]
+
+    assert indice.eliminar("disp-2") and not indice.eliminar("disp-2")
+    assert "disp-2" not in indice and len(indice) == 9
+    assert indice.candidatos(consulta) == []
+    assert indice.frecuencia("os_version", "10-0.19045") == 4
+
+    # El hueco del dispositivo eliminado se reutiliza
+    indice.insertar("nuevo", NORMALIZADOS[2])
+    assert indice.candidatos(NORMALIZADOS[2], minimo=7)[0][0] == "nuevo"
+    assert indice.estadisticas()["dispositivos"] == 10
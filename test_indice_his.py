@@ -0,0 +1,83 @@
+import pickle
+import random
+
+import pytest
+
+from lotes import generar_his, registros_sinteticos
+from indice_his import IndiceHIS, FormatoIndiceError, construir_indice, TAMANO_CABECERA, TAMANO_HIS
+from servidor_verificacion import verificar, VALIDO, NO_ENROLADO
+
+
+# ============================
+# TESTS ÍNDICE DE HIS
+# ============================
+
+def test_construccion_externa_ordena_y_elimina_repetidos(tmp_path):
+    """
+    Con tramos pequeños se mezclan varios ficheros; el resultado es el mismo
+    que ordenar todo en memoria y no quedan temporales.
+    """
+    aleatorio = random.Random(1)
+    his = [aleatorio.randbytes(32).hex().upper() for _ in range(2000)]
+    entrada = his + his[:500]
+    aleatorio.shuffle(entrada)
+
+    ruta = str(tmp_path / "enrolados.idx")
+    n = construir_indice(entrada, ruta, tamano_tramo=300)
+
+    assert n == 2000
+    assert list(tmp_path.iterdir()) == [tmp_path / "enrolados.idx"]
+    assert (tmp_path / "enrolados.idx").stat().st_size == TAMANO_CABECERA + 2000 * TAMANO_HIS
+    with IndiceHIS(ruta) as indice:
+        assert list(indice) == sorted(his)
+
+
+def test_busquedas(tmp_path):
+    """
+    Se encuentran todos los HIS enrolados (en hex o binario, mayúsculas o
+    minúsculas) y ninguno de los que no lo están, incluidos los extremos;
+    un fichero truncado o vacío da FormatoIndiceError.
+    """
+    aleatorio = random.Random(2)
+    his = [aleatorio.randbytes(32) for _ in range(5000)]
+    # Prefijos repetidos para forzar la comparación completa
+    his += [b"\x00" * 8 + aleatorio.randbytes(24) for _ in range(5)]
+    ruta = str(tmp_path / "enrolados.idx")
+    construir_indice(his, ruta)
+
+    indice = IndiceHIS(ruta)
+    assert all(h in indice for h in his)
+    assert his[0].hex() in indice and his[1].hex().upper() in indice
+    ausentes = [aleatorio.randbytes(32) for _ in range(1000)] + [b"\x00" * 32, b"\xff" * 32]
+    assert not any(h in indice for h in ausentes)
+    assert "no es un HIS" not in indice
+
+    # Otro proceso recibe la ruta y abre su propio mmap
+    copia = pickle.loads(pickle.dumps(indice))
+    assert his[10] in copia and len(copia) == len(indice)
+    indice.cerrar()
+    copia.cerrar()
+
+    vacio = str(tmp_path / "vacio.idx")
+    construir_indice([], vacio)
+    assert his[0] not in IndiceHIS(vacio)
+
+    (tmp_path / "roto.idx").write_bytes(b"HISIDX1\x00" + b"\x05" + b"\x00" * 7)
+    (tmp_path / "corto.idx").write_bytes(b"HISIDX1")
+    (tmp_path / "sin_datos.idx").write_bytes(b"")
+    for nombre in ("roto.idx", "corto.idx", "sin_datos.idx"):
+        with pytest.raises(FormatoIndiceError):
+            IndiceHIS(str(tmp_path / nombre))
+
+
+def test_servidor_verifica_contra_indice(tmp_path):
+    """
+    El verificador acepta el índice como registro de HIS enrolados.
+    """
+    registros = list(registros_sinteticos(10))
+    ruta = str(tmp_path / "enrolados.idx")
+    construir_indice((generar_his(r) for r in registros), ruta)
+
+    with IndiceHIS(ruta) as indice:
+        assert verificar(indice, "disp-3", registros[3])["resultado"] == VALIDO
+        assert verificar(indice, "disp-3", dict(registros[3], cpu_id="X"))["resultado"] == NO_ENROLADO
@@ -0,0 +1,241 @@
+import json
+import hashlib
+
+import pytest
+
+from inventario import (
+    VERSION_V1,
+    VERSION_V2,
+    InventarioIncremental,
+    hash_entrada,
+    hash_inventario,
+    actualizar_estado,
+    cargar_estado_y_escaneo,
+    escanear_registro
+)
+
+
+PROGRAMAS = [("app", "1.0"), ("prueba", "2.3"), ("editor", "7.1")]
+
+
+# ============================
+# TESTS HASH DE INVENTARIO
+# ============================
+
+def test_v1_igual_que_algoritmo_original():
+    """
+    La versión 1 reproduce exactamente el hash de inventario original.
+    """
+    hashes = [hashlib.sha256(f"{n}:{v}".encode()).hexdigest() for n, v in PROGRAMAS]
+    hashes.sort()
+    original = hashlib.sha256("|".join(hashes).encode()).hexdigest()
+
+    assert hash_inventario([hash_entrada(n, v) for n, v in PROGRAMAS]) == original
+
+
+def test_v2_no_depende_del_orden_y_distinto_de_v1():
+    """
+    El hash v2 es independiente del orden y no coincide con el v1.
+    """
+    hashes = [hash_entrada(n, v) for n, v in PROGRAMAS]
+
+    v2 = hash_inventario(hashes, VERSION_V2)
+
+    assert v2 == hash_inventario(list(reversed(hashes)), VERSION_V2)
+    assert v2 != hash_inventario(hashes, VERSION_V1)
+
+
+def test_v2_incremental_igual_que_reconstruccion(tmp_path):
+    """
+    Instalar y desinstalar un programa sobre el estado guardado da el mismo
+    hash que recalcular el inventario completo.
+    """
+    ruta = tmp_path / "inventario.json"
+    hashes = [hash_entrada(n, v) for n, v in PROGRAMAS]
+    InventarioIncremental.desde_hashes(hashes).guardar(ruta)
+
+    nuevo = hash_entrada("navegador", "120.0")
+    obtenido = actualizar_estado(ruta, anadidos=[nuevo], eliminados=[hashes[0]])
+
+    assert obtenido == hash_inventario(hashes[1:] + [nuevo], VERSION_V2)
+    assert InventarioIncremental.cargar(ruta).hash() == obtenido
+
+
+def test_v2_entradas_duplicadas_cuentan():
+    """
+    Es un multiconjunto: una entrada repetida cambia el hash.
+    """
+    h = hash_entrada("app", "1.0")
+
+    assert hash_inventario([h], VERSION_V2) != hash_inventario([h, h], VERSION_V2)
+
+
+def test_v2_suma_por_carriles_y_guardado_atomico(tmp_path):
+    """
+    El acumulador v2 es la suma módulo 2^16 de cada uno de los 1024 carriles
+    de SHAKE128; se guarda sin dejar temporales y un estado con el acumulador
+    antiguo de 512 bits se rechaza.
+    """
+    hashes = [hash_entrada(n, v) for n, v in PROGRAMAS]
+    carriles = [0] * 1024
+    for h in hashes:
+        salida = hashlib.shake_128(h.encode("ascii")).digest(2048)
+        for i in range(1024):
+            carriles[i] = (carriles[i] + int.from_bytes(salida[2 * i:2 * i + 2], "big")) % 65536
+    estado = InventarioIncremental.desde_hashes(hashes)
+    assert estado.acumulador.to_bytes(2048, "big") == b"".join(c.to_bytes(2, "big") for c in carriles)
+
+    ruta = tmp_path / "inventario.json"
+    estado.guardar(ruta)
+    assert [p.name for p in tmp_path.iterdir()] == ["inventario.json"]
+    assert InventarioIncremental.cargar(ruta).hash() == estado.hash()
+
+    ruta.write_text(json.dumps({"version": VERSION_V2, "acumulador": "0" * 128, "entradas": 3}))
+    with pytest.raises(ValueError, match="acumulador"):
+        InventarioIncremental.cargar(ruta)
+
+
+# ============================
+# REGISTRO FALSO
+# ============================
+
+class ClaveFalsa:
+    def __init__(self, marca=1, valores=None, subclaves=None):
+        self.marca = marca
+        self.valores = valores or {}
+        self.subclaves = subclaves or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class RegistroFalso:
+    """
+    Proveedor con la misma interfaz que winreg que cuenta las lecturas de valores.
+    """
+    HKEY_LOCAL_MACHINE = "HKLM"
+    HKEY_CURRENT_USER = "HKCU"
+
+    def __init__(self, programas):
+        self.lecturas = 0
+        subclaves = {
+            f"{{{i}}}": ClaveFalsa(valores={"DisplayName": n, "DisplayVersion": v})
+            for i, (n, v) in enumerate(programas)
+        }
+        subclaves["sin_nombre"] = ClaveFalsa(valores={"DisplayVersion": "1"})
+        self.uninstall = ClaveFalsa(subclaves=subclaves)
+
+    def OpenKey(self, padre, ruta):
+        if padre == "HKLM" and ruta == r"Software\Microsoft\Windows\CurrentVersion\Uninstall":
+            return self.uninstall
+        if isinstance(padre, ClaveFalsa) and ruta in padre.subclaves:
+            return padre.subclaves[ruta]
+        raise FileNotFoundError(ruta)
+
+    def QueryInfoKey(self, clave):
+        return len(clave.subclaves), len(clave.valores), clave.marca
+
+    def EnumKey(self, clave, i):
+        return list(clave.subclaves)[i]
+
+    def QueryValueEx(self, clave, nombre):
+        self.lecturas += 1
+        if nombre not in clave.valores:
+            raise FileNotFoundError(nombre)
+        return clave.valores[nombre], 1
+
+
+# ============================
+# TESTS ESCANEO CON DETECCIÓN DE CAMBIOS
+# ============================
+
+def test_escaneo_sin_cambios_no_lee_valores():
+    """
+    Si ninguna subclave ha cambiado se reutilizan todos los hashes sin leer valores,
+    y el resultado es el mismo que el de un escaneo completo.
+    """
+    registro = RegistroFalso(PROGRAMAS)
+    hashes, estado, _ = escanear_registro(registro)
+    lecturas_completas = registro.lecturas
+
+    hashes2, _, stats = escanear_registro(registro, estado)
+
+    assert sorted(hashes) == sorted(hash_entrada(n, v) for n, v in PROGRAMAS)
+    assert hashes2 == hashes
+    assert lecturas_completas > 0
+    assert registro.lecturas == lecturas_completas
+    assert stats["leidas"] == 0
+
+
+def test_escaneo_relee_solo_la_subclave_modificada():
+    """
+    Una actualización en la propia subclave (nueva fecha de escritura) se detecta
+    leyendo solo esa subclave.
+    """
+    registro = RegistroFalso(PROGRAMAS)
+    _, estado, _ = escanear_registro(registro)
+
+    subclave = registro.uninstall.subclaves["{0}"]
+    subclave.valores["DisplayVersion"] = "1.1"
+    subclave.marca += 1
+    hashes, _, stats = escanear_registro(registro, estado)
+
+    assert stats["leidas"] == 1
+    assert hash_entrada("app", "1.1") in hashes
+    assert hash_entrada("app", "1.0") not in hashes
+
+
+def test_confiar_en_raiz_omite_la_enumeracion():
+    """
+    Con confiar_en_raiz, una ruta cuya clave padre no ha cambiado no se recorre.
+    """
+    registro = RegistroFalso(PROGRAMAS)
+    hashes, estado, _ = escanear_registro(registro)
+
+    hashes2, _, stats = escanear_registro(registro, estado, confiar_en_raiz=True)
+
+    assert stats["rutas_omitidas"] == 1
+    assert stats["subclaves"] == 0
+    assert sorted(hashes2) == sorted(hashes)
+
+
+def test_estado_v2_se_actualiza_con_el_escaneo_guardado_con_el(tmp_path):
+    """
+    crear_hash_software_instalado con v2 guarda el estado junto a su escaneo y
+    después solo aplica las altas y bajas; coincide con una reconstrucción
+    completa aunque entre medias una ejecución v1 haga avanzar 'ruta_escaneo'.
+    """
+    from atributos import COLECTORES, RUTA_ESTADO_INVENTARIO, crear_hash_software_instalado
+
+    registro = RegistroFalso(PROGRAMAS)
+    rutas = {"ruta_estado": str(tmp_path / "estado" / "inventario.json"),
+             "ruta_escaneo": str(tmp_path / "escaneo.json")}
+    crear_hash_software_instalado(version=VERSION_V2, registro=registro, **rutas)
+
+    del registro.uninstall.subclaves["{1}"]
+    registro.uninstall.marca += 1
+    # La ejecución v1 actualiza el escaneo pero no el estado v2
+    crear_hash_software_instalado(registro=registro, ruta_escaneo=rutas["ruta_escaneo"])
+    registro.lecturas = 0
+    obtenido = crear_hash_software_instalado(version=VERSION_V2, registro=registro, **rutas)
+
+    esperado = hash_inventario([hash_entrada("app", "1.0"), hash_entrada("editor", "7.1")], VERSION_V2)
+    assert obtenido == esperado and registro.lecturas == 0
+    estado, escaneo = cargar_estado_y_escaneo(rutas["ruta_estado"])
+    assert estado.entradas == 2 and "{1}" not in escaneo[next(iter(escaneo))]["subclaves"]
+    assert [p.name for p in (tmp_path / "estado").iterdir()] == ["inventario.json"]
+
+    # Un estado que no cuadra con su escaneo se descarta y se reconstruye
+    with open(rutas["ruta_estado"], encoding="utf-8") as archivo:
+        datos = json.load(archivo)
+    datos["entradas"] = 5
+    with open(rutas["ruta_estado"], "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo)
+    assert cargar_estado_y_escaneo(rutas["ruta_estado"]) == (None, {})
+    assert crear_hash_software_instalado(version=VERSION_V2, registro=registro, **rutas) == esperado
+
+    # El colector por defecto usa las rutas de estado del agente
+    assert COLECTORES["software_inventory_hash"].__wrapped__.keywords["ruta_estado"] == RUTA_ESTADO_INVENTARIO
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+from lotes import (
+    generar_his,
+    calcular_his_lote,
+    registros_sinteticos,
+    trocear,
+    leer_csv,
+    leer_jsonl,
+    main,
+    ErrorEntrada
+)
+
+
+# ============================
+# TESTS PROCESAMIENTO POR LOTES
+# ============================
+
+def test_lote_secuencial_igual_que_registro_individual():
+    """
+    El HIS por lotes debe ser idéntico al de la cadena registro a registro.
+    """
+    registros = list(registros_sinteticos(50))
+
+    esperado = [generar_his(r) for r in registros]
+
+    assert list(calcular_his_lote(registros)) == esperado
+
+
+def test_lote_en_paralelo_conserva_orden():
+    """
+    Con un pool de procesos y bloques pequeños, el resultado sigue
+    en el mismo orden que la entrada.
+    """
+    registros = list(registros_sinteticos(257))
+
+    esperado = [generar_his(r) for r in registros]
+    obtenido = list(calcular_his_lote(iter(registros), procesos=2, tamano_bloque=16))
+
+    assert obtenido == esperado
+
+
+def test_trocear_respeta_tamano():
+    """
+    Los bloques tienen como máximo el tamaño pedido y no se pierde ningún elemento.
+    """
+    bloques = list(trocear(range(10), 4))
+
+    assert bloques == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_lectores_jsonl_y_csv_equivalentes():
+    """
+    El mismo registro leído desde JSONL o desde CSV produce el mismo HIS.
+    """
+    jsonl = io.StringIO('{"cpu_id": "abc123", "mac_original": "aa:bb"}\n\n')
+    texto_csv = io.StringIO("cpu_id,mac_original\nabc123,aa:bb\n")
+
+    his_jsonl = list(calcular_his_lote(leer_jsonl(jsonl)))
+    his_csv = list(calcular_his_lote(leer_csv(texto_csv)))
+
+    assert his_jsonl == his_csv
+    assert len(his_jsonl) == 1
+
+
+def test_lineas_no_validas_con_numero_de_linea(tmp_path, capsys):
+    """
+    Una fila CSV con campos de más o una línea JSONL que no es un objeto se
+    rechazan indicando la línea, también desde la línea de comandos.
+    """
+    with pytest.raises(ErrorEntrada, match="línea 3"):
+        list(leer_csv(io.StringIO("cpu_id,mac_original\na,b\nc,d,e\n")))
+    with pytest.raises(ErrorEntrada, match="línea 2: se esperaba un objeto JSON, no list"):
+        list(leer_jsonl(io.StringIO('{"cpu_id": "a"}\n[1, 2]\n')))
+    with pytest.raises(ErrorEntrada, match="línea 1: JSON no válido"):
+        list(leer_jsonl(io.StringIO("{roto\n")))
+
+    entrada = tmp_path / "entrada.jsonl"
+    entrada.write_text('{"cpu_id": "a"}\n"texto"\n')
+    assert main([str(entrada), "--salida", str(tmp_path / "his.txt")]) == 1
+    assert "línea 2" in capsys.readouterr().err
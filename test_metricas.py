@@ -0,0 +1,88 @@
+import pytest
+
+import metricas
+from metricas import instrumentar, instrumentar_colectores
+from normalizacion import normalizar_atributos, canonicar, calcular_his
+
+
+@pytest.fixture(autouse=True)
+def metricas_limpias():
+    metricas.reiniciar()
+    yield
+    metricas.desactivar()
+    metricas.reiniciar()
+
+
+RAW = {
+    "cpu_id": "BFEBFBFF000806EC",
+    "serial_number": "NXA0MEB00A1160D9C73400",
+    "mac_original": "0A-00-27-00-00-0E",
+    "firmware_hash": "HASH_FW_NO_CALCULADO",
+    "os_version": "Windows-10-10.0.19045-SP0",
+    "public_key_fingerprint": "ab" * 32,
+    "software_inventory_hash": "cd" * 32,
+}
+
+
+# ============================
+# TESTS MÉTRICAS
+# ============================
+
+def test_desactivadas_no_registran_nada():
+    """
+    Con las métricas desactivadas las etapas se ejecutan igual y no se registra nada.
+    """
+    his = calcular_his(canonicar(normalizar_atributos(RAW)))
+
+    assert len(his) == 64
+    assert metricas.exportar() == {}
+
+
+def test_etapas_del_pipeline_y_sentinelas():
+    """
+    Cada etapa cuenta sus llamadas y los colectores cuentan los valores de reserva.
+    """
+    def roto():
+        raise RuntimeError("WMI no disponible")
+
+    colectores = instrumentar_colectores({
+        "firmware_hash": lambda: "HASH_FW_NO_CALCULADO",
+        "cpu_id": lambda: "BFEBFBFF000806EC",
+        "serial_number": roto,
+    })
+
+    metricas.activar()
+    for _ in range(3):
+        calcular_his(canonicar(normalizar_atributos(RAW)))
+    colectores["firmware_hash"]()
+    colectores["cpu_id"]()
+    with pytest.raises(RuntimeError):
+        colectores["serial_number"]()
+
+    datos = metricas.exportar()
+    assert {e: datos[e]["llamadas"] for e in ("normalizacion", "canonicalizacion", "his")} == \
+        {"normalizacion": 3, "canonicalizacion": 3, "his": 3}
+    assert datos["colector.firmware_hash"]["sentinelas"] == {"HASH_FW_NO_CALCULADO": 1}
+    assert datos["colector.cpu_id"]["sentinelas"] == {}
+    assert datos["colector.serial_number"]["errores"] == 1
+    assert datos["his"]["segundos_max"] >= datos["his"]["segundos_media"] > 0
+
+
+def test_formato_prometheus():
+    """
+    El histograma es acumulativo y termina en +Inf con el número de llamadas.
+    """
+    medida = instrumentar("prueba")(lambda: "MAC_DESCONOCIDA")
+    metricas.activar()
+    medida()
+    medida()
+
+    texto = metricas.exportar_prometheus()
+    lineas = texto.splitlines()
+
+    assert "# TYPE iotzt_etapa_segundos histogram" in lineas
+    assert 'iotzt_etapa_segundos_bucket{etapa="prueba",le="+Inf"} 2' in lineas
+    assert 'iotzt_etapa_segundos_count{etapa="prueba"} 2' in lineas
+    assert 'iotzt_etapa_sentinelas_total{etapa="prueba",valor="MAC_DESCONOCIDA"} 2' in lineas
+    cubos = [int(l.rsplit(" ", 1)[1]) for l in lineas if l.startswith("iotzt_etapa_segundos_bucket")]
+    assert cubos == sorted(cubos)
@@ -0,0 +1,53 @@
+from normalizacion import ATTRIBUTE_POLICY, CasePolicy, CANONICA_V1, CANONICA_V2
+from mutaciones import ejecutar_mutaciones, informe, INVARIANTE, SENSIBLE
+
+
+def por_familia(resumen):
+    return {(r["atributo"], r["familia"]): r for r in resumen["familias"]}
+
+
+# ============================
+# TESTS MUTACIONES
+# ============================
+
+def test_invariantes_de_la_politica():
+    """
+    Con la forma canónica v1 solo fallan los tabuladores dentro de los
+    atributos de texto (canonicar los elimina); con la v2 no falla nada.
+    """
+    v1 = ejecutar_mutaciones(casos=300, semilla=1)
+    fallos = {k for k, r in por_familia(v1).items() if r["violaciones"]}
+    assert fallos == {("cpu_id", "espacios_internos"), ("serial_number", "espacios_internos")}
+    for r in v1["familias"]:
+        assert all("\t" in e["mutado"] for e in r["ejemplos"])
+
+    familias = por_familia(v1)
+    assert familias[("mac_original", "separadores")]["esperado"] == INVARIANTE
+    assert familias[("os_version", "version")]["esperado"] == SENSIBLE
+    assert ("mac_original", "prefijo_0x") not in familias
+    assert familias[("software_inventory_hash", "inventario_orden")]["casos"] == 300
+
+    v2 = ejecutar_mutaciones(casos=300, semilla=1, canonica=CANONICA_V2)
+    assert v2["violaciones"] == 0 and v2["casos"] == v1["casos"]
+
+
+def test_en_paralelo_da_el_mismo_resumen():
+    """
+    Los casos salen de la semilla de cada bloque, así que el resultado no
+    depende del número de procesos.
+    """
+    uno = ejecutar_mutaciones(casos=400, semilla=7, tamano_bloque=150)
+    dos = ejecutar_mutaciones(casos=400, semilla=7, tamano_bloque=150, procesos=2)
+    assert uno["familias"] == dos["familias"]
+
+
+def test_politica_y_normalizador_en_desacuerdo(monkeypatch):
+    """
+    Si la política dice que cpu_id no distingue mayúsculas pero el plan de
+    normalización no se ha recompilado, los cambios de mayúsculas se informan.
+    """
+    monkeypatch.setitem(ATTRIBUTE_POLICY, "cpu_id", CasePolicy.INSENSITIVE)
+    resumen = ejecutar_mutaciones(casos=200, canonica=CANONICA_V1)
+    r = por_familia(resumen)[("cpu_id", "mayusculas")]
+    assert r["esperado"] == INVARIANTE and r["violaciones"] == 200
+    assert "cpu_id                   mayusculas" in informe(resumen, solo_violaciones=True)
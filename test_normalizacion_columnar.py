@@ -0,0 +1,108 @@
+import numpy as np
+
+import normalizacion_columnar
+
+from normalizacion import (
+    ATTRIBUTE_POLICY,
+    activar_memoizacion,
+    desactivar_memoizacion,
+    normalizar_atributos,
+    canonicar,
+    calcular_his
+)
+from normalizacion_columnar import (
+    normalizar_columnas,
+    generar_his_columnas
+)
+
+
+# ============================
+# UTILIDAD DE TEST
+# ============================
+
+FILAS = [
+    {
+        "cpu_id": " abc123 ",
+        "serial_number": "n123j45",
+        "os_version": "Windows-11-10.0.26200-SP0",
+        "mac_original": "aa:bb:cc:dd",
+        "firmware_hash": "0xAB cd",
+        "public_key_fingerprint": "  0Xff-ee",
+        "software_inventory_hash": "zz12\t34",
+    },
+    {
+        "cpu_id": "línea\ninterna",
+        "serial_number": None,
+        "os_version": "Linux-6.1",
+        "mac_original": "AA-BB-CC-DD",
+        "firmware_hash": "",
+        "public_key_fingerprint": "0x",
+        "software_inventory_hash": "　abc　",
+    },
+]
+
+
+def columnas_de(filas):
+    return {attr: [f[attr] for f in filas] for attr in filas[0]}
+
+
+# ============================
+# TESTS MODO COLUMNAR
+# ============================
+
+def test_columnar_coincide_con_fila_a_fila():
+    """
+    Cada columna normalizada coincide con normalizar_atributos fila a fila,
+    incluidos espacios Unicode, prefijos 0x y valores None.
+    """
+    norm = normalizar_columnas(columnas_de(FILAS), tamano_bloque=1)
+
+    for i, fila in enumerate(FILAS):
+        esperado = normalizar_atributos(fila)
+        assert {attr: norm[attr][i] for attr in esperado} == esperado
+
+
+def test_his_columnar_igual_que_calcular_his():
+    """
+    El HIS de cada fila es idéntico al del camino escalar.
+    """
+    his = generar_his_columnas(columnas_de(FILAS))
+
+    esperado = [calcular_his(canonicar(normalizar_atributos(f))) for f in FILAS]
+
+    assert his.tolist() == esperado
+
+
+def test_columna_ausente_equivale_a_atributo_ausente():
+    """
+    Si falta una columna se comporta como un atributo ausente en el diccionario.
+    """
+    norm = normalizar_columnas({"CPU_ID": np.array(["abc"])})
+
+    assert {attr: v[0] for attr, v in norm.items()} == normalizar_atributos({"cpu_id": "abc"})
+
+
+def test_memoizacion_activa_mantiene_el_camino_vectorizado(monkeypatch):
+    """
+    Con la memoización activa los normalizadores están envueltos, pero se
+    siguen usando sus equivalentes vectorizados: solo la versión del SO se
+    normaliza por valores únicos, y el resultado no cambia.
+    """
+    usados = []
+    por_valores_unicos = normalizacion_columnar._por_valores_unicos
+
+    def registrar(arr, normalizador):
+        usados.append(normalizador)
+        return por_valores_unicos(arr, normalizador)
+
+    monkeypatch.setattr(normalizacion_columnar, "_por_valores_unicos", registrar)
+    activar_memoizacion(atributos=tuple(ATTRIBUTE_POLICY))
+    try:
+        norm = normalizar_columnas(columnas_de(FILAS))
+        esperados = [normalizar_atributos(f) for f in FILAS]
+    finally:
+        desactivar_memoizacion()
+
+    assert [n.__wrapped__.__name__ for n in usados] == ["normalizar_version"]
+    for i, esperado in enumerate(esperados):
+        assert {attr: norm[attr][i] for attr in esperado} == esperado
@@ -1,10 +1,26 @@
 import hashlib
 
 from normalizacion import (
+    ATTRIBUTE_POLICY,
+    NORMALIZADORES,
+    CasePolicy,
     normalizar_atributos,
+    normalizar_mac,
+    normalizar_hash_hex,
+    registrar_atributo,
+    compilar_plan,
     canonicar,
-    calcular_his
+    calcular_his,
+    canonicar_v2,
+    calcular_his_v2,
+    generar_his_version,
+    activar_memoizacion,
+    desactivar_memoizacion,
+    estadisticas_memoizacion,
+    CANONICA_V1,
+    CANONICA_V2
 )
+from lotes import registros_flota
 
 # ============================
 # UTILIDAD DE TEST
@@ -256,3 +272,131 @@ def test_real_change_vs_no_real_change():
 
     assert generar_his(base) == generar_his(superficial)
     assert generar_his(base) != generar_his(real)
+
+
+# ============================
+# TESTS PLAN DE NORMALIZACIÓN
+# ============================
+
+def test_normalizacion_hex_con_caracteres_no_hex():
+    """
+    Los separadores y caracteres no hexadecimales se eliminan igual que antes,
+    también cuando hace falta recurrir a la expresión regular.
+    """
+    assert normalizar_mac(" aa:BB-cc.dd ") == "AABBCCDD"
+    assert normalizar_mac("aa:zz:bb") == "AABB"
+    assert normalizar_hash_hex("0XAb cd") == "ABCD"
+    assert normalizar_hash_hex("0x12_34g") == "1234"
+
+
+def test_claves_en_mayusculas_se_normalizan_igual():
+    """
+    Las claves del diccionario de entrada no dependen del case.
+    """
+    raw = {"cpu_id": "abc123", "mac_original": "aa:bb"}
+    raw_mayus = {"CPU_ID": "abc123", "Mac_Original": "aa:bb"}
+
+    assert normalizar_atributos(raw) == normalizar_atributos(raw_mayus)
+
+
+def test_registrar_atributo_nuevo():
+    """
+    Se puede añadir un atributo con su normalizador sin tocar normalizar_atributos.
+    """
+    registrar_atributo("tpm_ek", CasePolicy.INSENSITIVE, normalizar_hash_hex)
+    try:
+        norm = normalizar_atributos({"tpm_ek": "0xab:cd"})
+        assert norm["tpm_ek"] == "ABCD"
+    finally:
+        ATTRIBUTE_POLICY.pop("tpm_ek")
+        NORMALIZADORES.pop("tpm_ek")
+        compilar_plan()
+
+    assert "tpm_ek" not in normalizar_atributos({"tpm_ek": "ab"})
+
+
+# ============================
+# TESTS FORMA CANÓNICA V2
+# ============================
+
+def test_canonica_v2_no_confunde_separadores():
+    """
+    En v1 un valor con '|' y '=' puede imitar otro campo; en v2 cada campo
+    lleva su longitud y los dos diccionarios dan HIS distintos.
+    """
+    a = {"cpu_id": "X|serial_number=Y"}
+    b = {"cpu_id": "X", "serial_number": "Y"}
+
+    assert calcular_his(canonicar(a)) == calcular_his(canonicar(b))
+    assert calcular_his_v2(a) != calcular_his_v2(b)
+
+
+def test_canonica_v2_por_campos_igual_a_completa():
+    """
+    El hash calculado campo a campo coincide con el de la forma canónica completa
+    y no depende del orden de las claves.
+    """
+    norm = normalizar_atributos({
+        "cpu_id": "BFEBFBFF000806EC",
+        "mac_original": "0a:00:27:00:00:0e",
+        "os_version": "Windows-10-10.0.19045-SP0",
+    })
+    invertido = dict(reversed(list(norm.items())))
+
+    assert calcular_his_v2(norm) == hashlib.sha256(canonicar_v2(norm)).digest()
+    assert calcular_his_v2(invertido) == calcular_his_v2(norm)
+    assert len(calcular_his_v2(norm)) == 32
+
+
+def test_generar_his_version_mantiene_v1():
+    """
+    La v1 sigue siendo el texto hexadecimal de siempre y es la versión por defecto.
+    """
+    raw = {"cpu_id": "abc123", "serial_number": "SERIAL"}
+
+    assert generar_his_version(raw) == generar_his(raw)
+    assert generar_his_version(raw, CANONICA_V1) == generar_his(raw)
+    assert generar_his_version(raw, CANONICA_V2) == calcular_his_v2(normalizar_atributos(raw))
+
+
+# ============================
+# TESTS MEMOIZACIÓN
+# ============================
+
+def test_memoizacion_mismo_resultado_y_valores_internados():
+    """
+    Con la memoización activa el resultado es el mismo, los valores
+    repetidos comparten objeto y se cuentan los aciertos.
+    """
+    registros = list(registros_flota(300, versiones=3, firmwares=5, inventarios=10))
+    esperados = [normalizar_atributos(r) for r in registros]
+
+    activar_memoizacion()
+    try:
+        normalizados = [normalizar_atributos(r) for r in registros]
+        stats = estadisticas_memoizacion()
+    finally:
+        desactivar_memoizacion()
+
+    assert normalizados == esperados
+    assert stats["os_version"]["fallos"] == 3 and stats["os_version"]["aciertos"] == 297
+    assert stats["software_inventory_hash"]["tamano"] == 10
+    assert "cpu_id" not in stats
+    por_version = {}
+    for n in normalizados:
+        assert por_version.setdefault(n["os_version"], n["os_version"]) is n["os_version"]
+    assert estadisticas_memoizacion() == {}
+
+
+def test_memoizacion_acotada():
+    """
+    La caché no pasa de su tamaño máximo aunque todos los valores sean distintos.
+    """
+    activar_memoizacion(maximo=8, atributos=["cpu_id"])
+    try:
+        for i in range(100):
+            assert normalizar_atributos({"cpu_id": f" id{i} "})["cpu_id"] == f"id{i}"
+        stats = estadisticas_memoizacion()["cpu_id"]
+    finally:
+        desactivar_memoizacion()
+    assert (stats["tamano"], stats["maximo"], stats["aciertos"]) == (8, 8, 0)
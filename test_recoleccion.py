@@ -0,0 +1,74 @@
+import time
+
+from recoleccion import recoger_concurrente, OK, ERROR, TIMEOUT
+
+
+# ============================
+# UTILIDAD DE TEST
+# ============================
+
+def lento(valor, segundos):
+    """
+    Colector falso que tarda 'segundos' en devolver 'valor'.
+    """
+    def colector():
+        time.sleep(segundos)
+        return valor
+    return colector
+
+
+def roto():
+    raise RuntimeError("WMI no disponible")
+
+
+# ============================
+# TESTS RECOLECCIÓN CONCURRENTE
+# ============================
+
+def test_colectores_se_ejecutan_a_la_vez():
+    """
+    El tiempo total es el del colector más lento, no la suma de todos.
+    """
+    colectores = {f"attr{i}": lento(i, 0.2) for i in range(7)}
+
+    t0 = time.perf_counter()
+    raw, informe = recoger_concurrente(colectores, timeout=5)
+    total = time.perf_counter() - t0
+
+    assert raw == {f"attr{i}": i for i in range(7)}
+    assert all(d["estado"] == OK for d in informe.values())
+    assert total < 1.0
+
+
+def test_colector_colgado_usa_sentinela():
+    """
+    Un colector que no termina a tiempo no bloquea al resto y se sustituye
+    por su valor de reserva.
+    """
+    colectores = {"cpu_id": lento("CPU", 0.0), "firmware_hash": lento("aa", 30)}
+
+    t0 = time.perf_counter()
+    raw, informe = recoger_concurrente(colectores, timeouts={"firmware_hash": 0.2})
+
+    assert time.perf_counter() - t0 < 2
+    assert raw == {"cpu_id": "CPU", "firmware_hash": "HASH_FW_NO_CALCULADO"}
+    assert informe["firmware_hash"]["estado"] == TIMEOUT
+    assert informe["firmware_hash"]["reserva"] == "HASH_FW_NO_CALCULADO"
+
+
+def test_excepcion_usa_sentinela_e_inicializador_por_hilo():
+    """
+    Una excepción en el colector se registra como error y el inicializador
+    se ejecuta una vez en cada hilo.
+    """
+    hilos = []
+
+    raw, informe = recoger_concurrente(
+        {"serial_number": roto, "os_version": lento("Linux-6.1", 0)},
+        inicializador=lambda: hilos.append(1),
+    )
+
+    assert raw["serial_number"] == "NUMERO_SERIE_NO_ENCONTRADA"
+    assert informe["serial_number"]["estado"] == ERROR
+    assert raw["os_version"] == "Linux-6.1"
+    assert len(hilos) == 2
@@ -0,0 +1,131 @@
+import asyncio
+
+from lotes import generar_his
+from servidor_verificacion import VALIDO, NO_COINCIDE, RegistroDispositivos
+from recolector_flota import (
+    AgenteDispositivo,
+    FlotaSimulada,
+    PUERTO_AGENTE,
+    RecolectorFlota,
+    direccion_de,
+    recoleccion_local
+)
+
+
+# ============================
+# TESTS RECOLECTOR DE FLOTA
+# ============================
+
+def test_flota_simulada_con_pool_y_concurrencia():
+    """
+    Todos los dispositivos dan el HIS de sus atributos; la segunda ronda
+    reutiliza todas las conexiones y nunca hay más peticiones en vuelo que
+    el límite.
+    """
+    primera, segunda = asyncio.run(recoleccion_local(dispositivos=1000, rondas=2, latencia=0.002,
+                                                     variacion=0.003, max_concurrencia=50))
+
+    for ronda in (primera, segunda):
+        assert ronda["dispositivos"] == 1000
+        assert ronda["errores"] == ronda["his_distintos"] == ronda["reintentos"] == 0
+        assert ronda["max_en_vuelo"] == 50
+    assert (primera["conexiones_nuevas"], primera["conexiones_reutilizadas"]) == (1000, 0)
+    assert (segunda["conexiones_nuevas"], segunda["conexiones_reutilizadas"]) == (0, 1000)
+
+
+def test_reintentos_y_plazos():
+    """
+    Los cortes de conexión se reintentan hasta recuperar el dispositivo; un
+    agente que no responde agota sus intentos por plazo vencido sin retrasar
+    al resto más allá de esos plazos.
+    """
+    async def escenario():
+        flota = await FlotaSimulada(200, fallos=0.3, mudos=0.02, semilla=7).iniciar()
+        recolector = RecolectorFlota(max_concurrencia=64, timeout=0.2, reintentos=6, espera_reintento=0.001)
+        try:
+            resultados = await recolector.recoger(flota.direcciones())
+            return resultados, recolector.estadisticas(), flota.his_esperados()
+        finally:
+            await recolector.cerrar()
+            await flota.cerrar()
+
+    resultados, estadisticas, esperados = asyncio.run(escenario())
+
+    fallidos = [r for r in resultados if r["error"] is not None]
+    assert len(fallidos) == estadisticas["errores"] == 4
+    assert all(r["error"] == "timeout" and r["intentos"] == 7 and r["his"] is None for r in fallidos)
+    assert estadisticas["timeouts"] == 4 * 7
+    assert estadisticas["reintentos"] > 4 * 6
+
+    correctos = [r for r in resultados if r["error"] is None]
+    assert all(r["his"] == esperados[r["dispositivo"]] for r in correctos)
+    assert any(r["intentos"] > 1 for r in correctos)
+
+
+def test_agente_real_y_verificacion():
+    """
+    Un agente con el backend de Linux sirve los atributos del equipo; el
+    recolector los verifica contra el registro. Las operaciones
+    desconocidas reciben un error y un agente que responde con otro
+    identificador no cuenta como el dispositivo pedido.
+    """
+    from agente import recoger
+
+    raw = recoger("linux")
+
+    async def escenario():
+        agente = AgenteDispositivo(lambda: raw, "equipo")
+        otro = AgenteDispositivo(lambda: dict(raw, cpu_id="OTRA"), "otro")
+        for a in (agente, otro):
+            await a.iniciar("127.0.0.1", 0)
+        registro = RegistroDispositivos({"equipo": generar_his(raw), "otro": generar_his(raw)})
+        recolector = RecolectorFlota(registro=registro, guardar_atributos=True)
+        try:
+            host, puerto = agente.direccion()
+            resultados = await recolector.recoger({"equipo": direccion_de(f"{host}:{puerto}"),
+                                                   "otro": otro.direccion()})
+            respuesta = await agente.responder({"id": 3, "op": "borrar"})
+            [cambiado] = await recolector.recoger({"tercero": otro.direccion()})
+            return resultados + [cambiado], respuesta
+        finally:
+            await recolector.cerrar()
+            for a in (agente, otro):
+                await a.cerrar()
+
+    (equipo, otro, cambiado), respuesta = asyncio.run(escenario())
+    assert equipo["resultado"] == VALIDO and equipo["atributos"] == raw and equipo["intentos"] == 1
+    assert otro["resultado"] == NO_COINCIDE
+    assert cambiado["his"] is None and cambiado["intentos"] == 1
+    assert cambiado["error"] == "Responde el dispositivo 'otro', no 'tercero'"
+    assert respuesta == {"resultado": "error", "error": "Operación no permitida: borrar", "id": 3}
+
+
+def test_direcciones_y_recolector_en_varios_bucles(tmp_path):
+    """
+    Las direcciones admiten puerto por defecto, IPv6 entre corchetes y
+    sockets Unix; el mismo recolector sirve en varios asyncio.run.
+    """
+    assert direccion_de("equipo") == ("equipo", PUERTO_AGENTE)
+    assert direccion_de("equipo:81") == ("equipo", 81)
+    assert direccion_de("[::1]:7000") == ("::1", 7000)
+    assert direccion_de("[::1]") == ("::1", PUERTO_AGENTE)
+    assert direccion_de("::1") == ("::1", PUERTO_AGENTE)
+    assert direccion_de("unix:/run/agente.sock") == "/run/agente.sock"
+
+    ruta = str(tmp_path / "agente.sock")
+    raw = {"cpu_id": "CPU"}
+    recolector = RecolectorFlota(max_concurrencia=4)
+
+    async def ronda():
+        agente = AgenteDispositivo(lambda: raw, "equipo")
+        await agente.iniciar(unix=ruta)
+        try:
+            return await recolector.recoger({"equipo": direccion_de(f"unix:{ruta}")})
+        finally:
+            await recolector.cerrar()
+            await agente.cerrar()
+
+    for _ in range(2):
+        [resultado] = asyncio.run(ronda())
+        assert resultado["error"] is None and resultado["his"] == generar_his(raw)
+    assert recolector.estadisticas()["conexiones_nuevas"] == 2
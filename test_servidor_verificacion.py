@@ -0,0 +1,121 @@
+import json
+import asyncio
+
+from lotes import generar_his, registros_sinteticos
+from servidor_verificacion import (
+    VALIDO,
+    NO_COINCIDE,
+    NO_ENROLADO,
+    ERROR,
+    OCUPADO,
+    RegistroDispositivos,
+    ServidorVerificacion,
+    registro_sintetico,
+    verificar
+)
+from carga_verificacion import carga_local
+
+
+RAW = next(iter(registros_sinteticos(1)))
+
+
+# ============================
+# UTILIDAD DE TEST
+# ============================
+
+async def conversar(servidor, lineas):
+    """
+    Envía todas las líneas de golpe y devuelve las respuestas en orden.
+    """
+    host, puerto = servidor.direccion()[:2]
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    escritor.write(b"".join(lineas))
+    await escritor.drain()
+    respuestas = [json.loads(await lector.readline()) for _ in lineas]
+    escritor.close()
+    await escritor.wait_closed()
+    return respuestas
+
+
+# ============================
+# TESTS VERIFICACIÓN
+# ============================
+
+def test_verificar_contra_registro(tmp_path):
+    """
+    El HIS se calcula con el pipeline normal y se compara con el enrolado.
+    """
+    ruta = str(tmp_path / "enrolados.json")
+    registro = RegistroDispositivos(ruta=ruta)
+    registro.enrolar("disp-0", generar_his(RAW))
+    registro.guardar()
+    registro = RegistroDispositivos.cargar(ruta)
+
+    # Las diferencias que la normalización elimina no afectan al resultado
+    variante = dict(RAW, mac_original=RAW["mac_original"].upper().replace(":", "-"))
+    assert verificar(registro, "disp-0", variante)["resultado"] == VALIDO
+    assert verificar(registro, "disp-0", dict(RAW, cpu_id="OTRA"))["resultado"] == NO_COINCIDE
+    assert verificar(registro, "disp-9", RAW)["resultado"] == NO_ENROLADO
+
+
+def test_protocolo_por_lineas_en_orden():
+    """
+    Varias peticiones seguidas en una conexión se responden en orden y los
+    errores no cierran la conexión.
+    """
+    async def escenario():
+        servidor = ServidorVerificacion(registro_sintetico(3))
+        await servidor.iniciar("127.0.0.1", 0)
+        try:
+            lineas = [
+                json.dumps({"id": 1, "dispositivo": "disp-0", "atributos": RAW}).encode() + b"\n",
+                b"esto no es json\n",
+                json.dumps({"id": 3, "op": "enrolar", "dispositivo": "x", "atributos": RAW}).encode() + b"\n",
+                json.dumps({"id": 4, "dispositivo": "disp-1", "atributos": RAW}).encode() + b"\n",
+                json.dumps({"id": 5, "op": "estadisticas"}).encode() + b"\n",
+            ]
+            return await conversar(servidor, lineas)
+        finally:
+            await servidor.cerrar()
+
+    respuestas = asyncio.run(escenario())
+
+    assert [r["resultado"] for r in respuestas] == [VALIDO, ERROR, ERROR, NO_COINCIDE, "estadisticas"]
+    assert [r.get("id") for r in respuestas] == [1, None, 3, 4, 5]
+    assert respuestas[4]["estadisticas"]["enrolados"] == 3
+
+
+def test_limite_de_conexiones_y_carga():
+    """
+    Por encima del máximo de conexiones se responde 'ocupado'; la prueba de
+    carga local cuenta todas las peticiones.
+    """
+    async def escenario():
+        servidor = ServidorVerificacion(registro_sintetico(1), max_conexiones=1)
+        await servidor.iniciar("127.0.0.1", 0)
+        try:
+            host, puerto = servidor.direccion()[:2]
+            ocupada = await asyncio.open_connection(host, puerto)
+            # Se asegura de que la primera conexión ya se está atendiendo
+            await conversar_abierta(ocupada, {"op": "estadisticas"})
+            lector, escritor = await asyncio.open_connection(host, puerto)
+            rechazo = json.loads(await lector.readline())
+            escritor.close()
+            ocupada[1].close()
+            return rechazo, servidor.rechazadas
+        finally:
+            await servidor.cerrar()
+
+    async def conversar_abierta(conexion, peticion):
+        lector, escritor = conexion
+        escritor.write(json.dumps(peticion).encode() + b"\n")
+        return json.loads(await lector.readline())
+
+    rechazo, rechazadas = asyncio.run(escenario())
+    assert rechazo["resultado"] == OCUPADO
+    assert rechazadas == 1
+
+    informe = asyncio.run(carga_local(dispositivos=20, peticiones=10, ventana=4, alterados=0.5))
+    assert informe["peticiones"] == 200
+    assert informe["resultados"] == {VALIDO: 100, NO_COINCIDE: 100}
+    assert informe["p99_ms"] >= informe["p50_ms"] > 0